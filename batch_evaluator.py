@@ -0,0 +1,173 @@
+"""
+Cogstruction: Optimizing cog arrays in Legends of Idleon
+    Copyright (C) 2021 Michael P. Lane
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+"""
+
+import numpy as np
+
+from cog_types import Boost_Cog
+
+NUM_RATES = 4
+
+"""
+- Scores whole stacks of genomes (see `Cog_Array.genome') at once. The results agree with `Cog_Array.get_build_rate',
+`Cog_Array.get_flaggy_rate', `Cog_Array.get_total_exp_mult' and `Cog_Array.standard_obj_fxn'.
+- Each property of the cogs of `registry' is held in an ndarray with one extra trailing zero, so that indexing with
+`EMPTY_CELL == -1' contributes nothing.
+- For each `Boost_Cog' type, `tables[type_id]' is the `Influence_Table' of that type, shared with every other user of
+`empties_set'. Its `padded' gathers point past the last cell, to a column of zeros. Types that boost a whole line use
+line sums instead.
+- `flaggy_counts[type_id][cell]' is the number of flaggies influenced by a cog of that type placed at `cell'.
+- There should be one `Batch_Evaluator' per cog array template. If cogs are registered after it is built, build a new
+one.
+- `from_compiled' builds one from a `Compiled_Problem' instead, without cogs or an `Empties_Set'.
+"""
+class Batch_Evaluator:
+    def __init__(self, registry, empties_set, flaggies = None):
+        self.registry = registry
+        self.empties_set = empties_set
+        self.flaggies = frozenset(flaggies) if flaggies is not None else frozenset()
+        self.shape = empties_set.shape
+        self.total_coords = empties_set.total_coords
+        self.num_flaggies = len(self.flaggies)
+        cogs = list(registry)
+        self.build_rates = registry.get_property("build_rate")
+        self.flaggy_rates = registry.get_property("flaggy_rate")
+        self.exp_mults = registry.get_property("exp_mult")
+        self.build_rate_boosts = registry.get_property("build_rate_boost")
+        self.flaggy_rate_boosts = registry.get_property("flaggy_rate_boost")
+        self.flaggy_speed_boosts = registry.get_property("flaggy_speed_boost")
+        self.boost_types = []
+        self.type_ids = np.full(len(cogs) + 1, -1, dtype=np.intp)
+        self.tables = []
+        self.flaggy_counts = []
+        for i,cog in enumerate(cogs):
+            if isinstance(cog, Boost_Cog):
+                if type(cog) not in self.boost_types:
+                    self.boost_types.append(type(cog))
+                    self._add_influence_table(cog)
+                self.type_ids[i] = self.boost_types.index(type(cog))
+
+    """
+    A `Batch_Evaluator' that reads the arrays of `problem', see `Compiled_Problem'. It has no `registry' or
+    `empties_set'.
+    """
+    @classmethod
+    def from_compiled(cls, problem):
+        evaluator = cls.__new__(cls)
+        evaluator.registry = None
+        evaluator.empties_set = None
+        evaluator.flaggies = None
+        evaluator.shape = problem.shape
+        evaluator.total_coords = problem.total_coords
+        evaluator.num_flaggies = problem.num_flaggies
+        evaluator.build_rates = problem.arrays["build_rates"]
+        evaluator.flaggy_rates = problem.arrays["flaggy_rates"]
+        evaluator.exp_mults = problem.arrays["exp_mults"]
+        evaluator.build_rate_boosts = problem.arrays["build_rate_boosts"]
+        evaluator.flaggy_rate_boosts = problem.arrays["flaggy_rate_boosts"]
+        evaluator.flaggy_speed_boosts = problem.arrays["flaggy_speed_boosts"]
+        evaluator.boost_types = None
+        evaluator.type_ids = problem.arrays["type_ids"]
+        evaluator.tables = problem.get_tables()
+        evaluator.flaggy_counts = problem.arrays["flaggy_counts"]
+        return evaluator
+
+    """
+    - `genomes' is an int ndarray of shape `(N, empties_set.total_coords)', or a single genome.
+    - Returns three float ndarrays of shape `(N,)': the build rates, flaggy rates and exp multipliers of the genomes.
+    """
+    def evaluate(self, genomes):
+        return get_components(self.evaluate_rates(genomes))
+
+    """
+    - `genomes' is an int ndarray of shape `(N, empties_set.total_coords)', or a single genome.
+    - Returns a float ndarray of shape `(N, NUM_RATES)' whose rows are the rates vectors of the genomes, see
+    `Cog_Array.get_rates'.
+    """
+    def evaluate_rates(self, genomes):
+        genomes = np.atleast_2d(genomes)
+        N = genomes.shape[0]
+        build_rates = self._pad(self.build_rates[genomes])
+        flaggy_rates = self._pad(self.flaggy_rates[genomes])
+        rates = np.zeros((N, NUM_RATES))
+        rates[:,0] = build_rates.sum(axis=1)
+        rates[:,1] = flaggy_rates.sum(axis=1)
+        rates[:,3] = self.exp_mults[genomes].sum(axis=1)
+        type_ids = self.type_ids[genomes]
+        line_sums = {}
+        for type_id,table in enumerate(self.tables):
+            rows, cells = np.nonzero(type_ids == type_id)
+            if len(rows) == 0:
+                continue
+            cogs = genomes[rows, cells]
+            if table.line_axis is not None:
+                if table.line_axis not in line_sums:
+                    line_sums[table.line_axis] = (
+                        self._get_line_sums(build_rates, table.line_axis),
+                        self._get_line_sums(flaggy_rates, table.line_axis)
+                    )
+                line_build, line_flaggy = line_sums[table.line_axis]
+                lines = np.asarray(table.lines)[cells]
+                build_boosted = line_build[rows, lines] - build_rates[rows, cells]
+                flaggy_boosted = line_flaggy[rows, lines] - flaggy_rates[rows, cells]
+            else:
+                adj = table.padded[cells]
+                build_boosted = build_rates[rows[:,None], adj].sum(axis=1)
+                flaggy_boosted = flaggy_rates[rows[:,None], adj].sum(axis=1)
+            rates[:,0] += np.bincount(rows, self.build_rate_boosts[cogs] * build_boosted, N)
+            rates[:,1] += np.bincount(rows, self.flaggy_rate_boosts[cogs] * flaggy_boosted, N)
+            if self.num_flaggies > 0:
+                rates[:,2] += np.bincount(
+                    rows,
+                    self.flaggy_speed_boosts[cogs] * self.flaggy_counts[type_id][cells] / self.num_flaggies,
+                    N
+                )
+        return rates
+
+    """
+    Vectorized `Cog_Array.standard_obj_fxn'.
+    """
+    def standard_obj_fxn(self, genomes, build_weight, flaggy_weight, exp_weight):
+        build, flaggy, exp = self.evaluate(genomes)
+        return build * build_weight + flaggy * flaggy_weight + exp * exp_weight
+
+    """
+    Append a column of zeros, which is what the padding of `Influence_Table.padded' points to.
+    """
+    def _pad(self, rates):
+        return np.concatenate((rates, np.zeros((rates.shape[0], 1))), axis=1)
+
+    """
+    `rates' is padded by `self._pad'. Returns the sums of `rates' along `axis' of `Cog_Array.array', one row per genome.
+    """
+    def _get_line_sums(self, rates, axis):
+        N = rates.shape[0]
+        return rates[:, :self.total_coords].reshape((N,) + self.shape).sum(axis=axis+1)
+
+    def _add_influence_table(self, cog):
+        table = self.empties_set.get_influence_table(type(cog))
+        flaggy_cells = frozenset(
+            self.empties_set.get_cell(coords) for coords in self.flaggies
+            if not self.empties_set.is_out_of_bounds(coords)
+        )
+        self.tables.append(table)
+        self.flaggy_counts.append(np.array(table.get_flaggy_counts(flaggy_cells), dtype=float))
+
+"""
+- `rates' is a rates vector or a matrix of rates vectors, see `Cog_Array.get_rates'.
+- Returns the build rates, flaggy rates and exp multipliers.
+"""
+def get_components(rates):
+    rates = np.atleast_2d(rates)
+    return rates[:,0], rates[:,1] * (1 + rates[:,2]), rates[:,3]
@@ -0,0 +1,316 @@
+"""
+Cogstruction: Optimizing cog arrays in Legends of Idleon
+    Copyright (C) 2021 Michael P. Lane
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from cog_array_stuff import Empties_Set
+from cog_factory import cog_factory
+from disk_cache import Disk_Cache, Memory_Cache, get_template_signature
+from file_readers import read_cog_datas, read_empties_datas
+from learning_algo import Fitness_Memo, Iteration_Controller, learning_algo
+from objectives import get_objective
+from parallel_restarts import worker_output
+
+COG_DATAS_FILENAME = "cog_datas.csv"
+EMPTIES_DATAS_FILENAME = "empties_datas.csv"
+SETTINGS_FILENAME = "settings.json"
+MAX_EMPTIES_SETS = 16
+SUMMARY_FILENAME = "summary.csv"
+SUMMARY_COLUMNS = (
+    "name", "status", "objective", "build_rate", "flaggy_rate", "exp_mult", "seconds", "evaluations", "error"
+)
+DEFAULT_SETTINGS = {
+    "inv_build_weight": 7000.0,
+    "inv_flaggy_weight": 2000.0,
+    "inv_exp_weight": 3.0,
+    "objective": None,
+    "pop_size": 2000,
+    "num_restarts": 1,
+    "prob_cross_breed": 0.5,
+    "prob_one_point_mutation": 0.25,
+    "prob_two_point_mutation": 0.25,
+    "num_mutations": 800,
+    "factor_base": 2,
+    "max_factor": 4,
+    "max_multiplier": 16,
+    "req_running_total": 0.01,
+    "max_running_total_len": 10,
+    "min_generations": 100,
+    "max_generations": 400,
+    "max_seconds": None,
+    "max_evaluations": None,
+    "seed": 133742069
+}
+
+"""
+- One inventory to optimize: the cogs of `cog_datas_filename' on the board of `empties_datas_filename', with the
+parameters `settings', see `DEFAULT_SETTINGS' and `main.py'.
+- `settings["max_seconds"]' and `settings["max_evaluations"]' are the budget of the job, see
+`Iteration_Controller.set_budget_info'. The time budget does not include reading the files or preprocessing.
+- `settings["objective"]' is an optional objective spec (see `Standard_Objective.to_dict') that replaces the inverse
+weights.
+"""
+class Batch_Job:
+    def __init__(self, name, cog_datas_filename, empties_datas_filename, settings = None):
+        self.name = name
+        self.cog_datas_filename = cog_datas_filename
+        self.empties_datas_filename = empties_datas_filename
+        self.settings = get_settings(settings)
+
+"""
+The outcome of a `Batch_Job'. `status' is `"ok"' or `"error"', in which case `error' holds the traceback.
+"""
+class Batch_Result:
+    def __init__(
+            self,
+            name,
+            status,
+            seconds,
+            objective = None,
+            build_rate = None,
+            flaggy_rate = None,
+            exp_mult = None,
+            evaluations = None,
+            cog_array_str = None,
+            error = None
+    ):
+        self.name = name
+        self.status = status
+        self.seconds = seconds
+        self.objective = objective
+        self.build_rate = build_rate
+        self.flaggy_rate = flaggy_rate
+        self.exp_mult = exp_mult
+        self.evaluations = evaluations
+        self.cog_array_str = cog_array_str
+        self.error = error
+
+class Batch_Error(RuntimeError):
+    pass
+
+"""
+- Returns the list of `Batch_Job's described by `path', with `settings' overriding `DEFAULT_SETTINGS'.
+- If `path' is a directory, then each subdirectory holding a `COG_DATAS_FILENAME' and an `EMPTIES_DATAS_FILENAME' is a
+job named after the subdirectory. An optional `SETTINGS_FILENAME' in the subdirectory overrides `settings'.
+- Otherwise `path' is a JSON manifest of the form `{"settings": {...}, "jobs": [{"name": ..., "cog_datas": ...,
+"empties_datas": ..., ...}, ...]}'. The `settings' of the manifest override `settings', and the other keys of a job
+override those. File names are relative to the manifest.
+"""
+def read_jobs(path, settings = None):
+    settings = dict(settings or {})
+    jobs = []
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            directory = os.path.join(path, name)
+            cog_datas_filename = os.path.join(directory, COG_DATAS_FILENAME)
+            empties_datas_filename = os.path.join(directory, EMPTIES_DATAS_FILENAME)
+            if not (os.path.isfile(cog_datas_filename) and os.path.isfile(empties_datas_filename)):
+                continue
+            job_settings = dict(settings)
+            settings_filename = os.path.join(directory, SETTINGS_FILENAME)
+            if os.path.isfile(settings_filename):
+                with open(settings_filename, "r") as fh:
+                    job_settings.update(json.load(fh))
+            jobs.append(Batch_Job(name, cog_datas_filename, empties_datas_filename, job_settings))
+    else:
+        with open(path, "r") as fh:
+            manifest = json.load(fh)
+        directory = os.path.dirname(os.path.abspath(path))
+        settings.update(manifest.get("settings", {}))
+        for job in manifest["jobs"]:
+            job = dict(job)
+            try:
+                name = job.pop("name")
+                cog_datas_filename = os.path.join(directory, job.pop("cog_datas"))
+                empties_datas_filename = os.path.join(directory, job.pop("empties_datas"))
+            except KeyError as e:
+                raise Batch_Error("A job of `%s' has no %s." % (path, e))
+            jobs.append(Batch_Job(name, cog_datas_filename, empties_datas_filename, dict(settings, **job)))
+    names = [job.name for job in jobs]
+    if len(set(names)) != len(names):
+        raise Batch_Error("The job names of `%s' are not unique." % path)
+    return jobs
+
+"""
+- Run `jobs' in a pool of `processes' worker processes (default: one per CPU), and write the best cog array of each job
+to `<output_dirname>/<name>.txt' as soon as it finishes. Once all are done, a `SUMMARY_FILENAME' with one row per job is
+written to `output_dirname'. Returns the `Batch_Result's in the order of `jobs'.
+- A job that fails does not stop the others; its error is in the summary.
+- Each worker keeps the boards, influence tables, `excludes_dict's and cog statistics it has computed, in a
+`Memory_Cache' backed by a `Disk_Cache' at `cache_dirname' if given, so that later jobs with the same board or the same
+cogs skip that preprocessing. Jobs are submitted grouped by board.
+"""
+def run_batch(jobs, output_dirname, processes = None, cache_dirname = None):
+    os.makedirs(output_dirname, exist_ok=True)
+    order = sorted(range(len(jobs)), key=lambda i: _get_board_key(jobs[i]))
+    results = [None] * len(jobs)
+    with ProcessPoolExecutor(processes, initializer=init_worker, initargs=(cache_dirname,)) as executor:
+        futures = {executor.submit(_run_job, jobs[i]): i for i in order}
+        for future in as_completed(futures):
+            i = futures[future]
+            result = future.result()
+            results[i] = result
+            if result.status == "ok":
+                with open(os.path.join(output_dirname, "%s.txt" % result.name), "w") as fh:
+                    fh.write(result.cog_array_str)
+                print("%-30s %12.4f %8.1fs" % (result.name, result.objective, result.seconds))
+            else:
+                print("%-30s %12s %8.1fs" % (result.name, "failed", result.seconds))
+    write_summary(results, os.path.join(output_dirname, SUMMARY_FILENAME))
+    return results
+
+def write_summary(results, filename):
+    with open(filename, "w", newline="") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(SUMMARY_COLUMNS)
+        for result in results:
+            writer.writerow([
+                "" if getattr(result, column) is None else getattr(result, column) for column in SUMMARY_COLUMNS
+            ])
+
+"""
+Returns `DEFAULT_SETTINGS' overridden by `settings'.
+"""
+def get_settings(settings = None):
+    settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+    unknown = set(settings) - set(DEFAULT_SETTINGS)
+    if len(unknown) > 0:
+        raise Batch_Error("Unknown settings: %s." % ", ".join(sorted(unknown)))
+    return settings
+
+def _get_board_key(job):
+    try:
+        return repr(get_template_signature(Empties_Set(read_empties_datas(job.empties_datas_filename))))
+    except Exception:
+        return ""
+
+_cache = None
+_empties_sets = OrderedDict()
+
+"""
+Set up the caches of a worker process, see `run_batch'.
+"""
+def init_worker(cache_dirname = None):
+    global _cache
+    _cache = Memory_Cache(Disk_Cache(cache_dirname) if cache_dirname is not None else None)
+
+"""
+Returns the `Empties_Set' equal to `empties_set' that this process has used before, so that jobs on the same board share
+its influence tables, or `empties_set' itself. Only the `MAX_EMPTIES_SETS' most recently used boards are kept.
+"""
+def _get_shared_empties_set(empties_set):
+    empties_set = _empties_sets.setdefault(empties_set, empties_set)
+    _empties_sets.move_to_end(empties_set)
+    while len(_empties_sets) > MAX_EMPTIES_SETS:
+        _empties_sets.popitem(last=False)
+    return empties_set
+
+"""
+- Optimize the cogs of `cog_datas' (see `read_cog_datas') on the board of `empties' (see `read_empties_datas') with
+`settings' (see `get_settings'), using the caches of this process. Returns a `Batch_Result' named `name'.
+- `controller' is an optional fresh `Iteration_Controller', for example one that reports progress. It is configured
+from `settings'.
+"""
+def optimize_inventory(name, cog_datas, empties, settings, controller = None):
+    start = time.monotonic()
+    if _cache is None:
+        init_worker()
+    try:
+        cogs = cog_factory(cog_datas)
+        empties_set = Empties_Set(empties)
+        empties_set = _get_shared_empties_set(empties_set)
+        objective = get_objective(settings["objective"] if settings["objective"] is not None else settings)
+        controller = ((controller if controller is not None else Iteration_Controller())
+            .set_restart_info(settings["num_restarts"])
+            .set_generation_info(
+                settings["min_generations"],
+                settings["max_generations"],
+                settings["max_running_total_len"],
+                settings["req_running_total"]
+            )
+            .set_mutation_info(settings["num_mutations"])
+            .set_breeding_scheme_info(
+                settings["prob_cross_breed"], settings["prob_one_point_mutation"], settings["prob_two_point_mutation"]
+            )
+            .set_budget_info(settings["max_seconds"], settings["max_evaluations"])
+        )
+        with worker_output(False):
+            best = learning_algo(
+                cogs,
+                empties_set,
+                set(),
+                settings["pop_size"],
+                objective.obj_fxn,
+                settings["factor_base"],
+                settings["max_factor"],
+                settings["max_multiplier"],
+                controller,
+                objective.batch_obj_fxn,
+                np.random.default_rng(settings["seed"]),
+                _cache,
+                objective.get_key(),
+                fitness_memo=Fitness_Memo(),
+                reject_duplicates=True
+            )
+        return Batch_Result(
+            name,
+            "ok",
+            time.monotonic() - start,
+            float(best[1]),
+            float(best[0].get_build_rate()),
+            float(best[0].get_flaggy_rate()),
+            float(best[0].get_total_exp_mult()),
+            controller.get_num_evaluated(),
+            str(best[0])
+        )
+    except Exception:
+        return Batch_Result(name, "error", time.monotonic() - start, error=traceback.format_exc())
+
+def _run_job(job):
+    start = time.monotonic()
+    try:
+        cog_datas = read_cog_datas(job.cog_datas_filename)
+        empties = read_empties_datas(job.empties_datas_filename)
+    except Exception:
+        return Batch_Result(job.name, "error", time.monotonic() - start, error=traceback.format_exc())
+    result = optimize_inventory(job.name, cog_datas, empties, job.settings)
+    result.seconds = time.monotonic() - start
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Optimize the cog arrays of many inventories.")
+    parser.add_argument("inventories", help="A directory of inventories, or a JSON manifest, see `read_jobs'.")
+    parser.add_argument("output_dirname", help="Where to write the cog arrays and `%s'." % SUMMARY_FILENAME)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--cache-dirname", default=".cogstruction_cache")
+    parser.add_argument("--max-seconds", type=float, default=None)
+    parser.add_argument("--max-evaluations", type=int, default=None)
+    args = parser.parse_args()
+
+    run_batch(
+        read_jobs(args.inventories, {"max_seconds": args.max_seconds, "max_evaluations": args.max_evaluations}),
+        args.output_dirname,
+        args.processes,
+        args.cache_dirname
+    )
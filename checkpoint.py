@@ -0,0 +1,202 @@
+"""
+Cogstruction: Optimizing cog arrays in Legends of Idleon
+    Copyright (C) 2021 Michael P. Lane
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+"""
+
+import hashlib
+import json
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from cog_array_stuff import GENOME_DTYPE
+from disk_cache import get_template_signature
+
+CHECKPOINT_VERSION = 2
+CONTROLLER_STATE_ATTRS = (
+    "restart_count", "generation_count", "curr_running_total_len", "curr_running_total", "previous_best_improve"
+)
+
+"""
+- Writes the full state of `learning_algo' to `path' every `every_generations' generations or every `every_seconds'
+seconds, whichever comes first. If both are `None', then it saves after every generation.
+- A checkpoint is an uncompressed `.npz' file: the population, the strengths and the statistics of the cogs are stored
+as ndarrays, and the counters of the `Iteration_Controller' and the states of the random number generators as a JSON
+string. Nothing is pickled, so loading a checkpoint never runs code.
+- A checkpoint is written to a temporary file that is then renamed, so `path' always holds a complete checkpoint.
+- `learning_algo' resumes from `path' if it exists, and continues exactly as the interrupted run would have. It must be
+given the same arguments as the interrupted run. A checkpoint records a signature of the cogs, of the board and flaggies
+and of `obj_key' (see `get_run_signature'), and resuming with different ones raises `Checkpoint_Error'.
+"""
+class Checkpointer:
+    def __init__(self, path, every_generations = None, every_seconds = None):
+        self.path = path
+        self.every_generations = every_generations
+        self.every_seconds = every_seconds
+        self._generations = 0
+        self._last_save = time.monotonic()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    """
+    Call once per generation. Returns `True' if a checkpoint is due.
+    """
+    def step(self):
+        self._generations += 1
+        if self.every_generations is None and self.every_seconds is None:
+            return True
+        return (
+            (self.every_generations is not None and self._generations >= self.every_generations) or
+            (self.every_seconds is not None and time.monotonic() - self._last_save >= self.every_seconds)
+        )
+
+    def save(self, controller, pop, strength_model, bests, registry, rng, obj_key = None):
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "signature": get_run_signature(registry, pop.template, obj_key),
+            "controller": {attr: _to_json(getattr(controller, attr)) for attr in CONTROLLER_STATE_ATTRS},
+            "pop_size": pop.pop_size,
+            "is_sorted": pop.is_sorted,
+            "strength_start_value": strength_model.strength_start_value,
+            "rng": rng.bit_generator.state,
+            "random": random.getstate()
+        }
+        arrays = {
+            "state": np.array(json.dumps(state)),
+            "genomes": pop.genomes,
+            "values": pop.values,
+            "rates": pop.rates,
+            "orig_values": controller.orig_values,
+            "raw_strengths": strength_model.raw,
+            "total_strengths": strength_model.totals,
+            "average_objs": np.array([cog.average_obj for cog in registry], dtype=np.float64),
+            "std_objs": np.array([cog.std_obj for cog in registry], dtype=np.float64),
+            "best_genomes": np.array(
+                [best[0].genome for best in bests], dtype=GENOME_DTYPE
+            ).reshape(len(bests), pop.genomes.shape[1]),
+            "best_values": np.array([best[1] for best in bests], dtype=np.float64)
+        }
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                np.savez(fh, **arrays)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self._generations = 0
+        self._last_save = time.monotonic()
+        return self
+
+    """
+    Returns the `Checkpoint' at `path', or `None' if there is none.
+    """
+    def load(self):
+        if not self.exists():
+            return None
+        with np.load(self.path, allow_pickle=False) as npz:
+            arrays = {name: npz[name] for name in npz.files}
+        state = json.loads(str(arrays.pop("state")))
+        if state["version"] != CHECKPOINT_VERSION:
+            raise Checkpoint_Error("`%s' was written by an incompatible version." % self.path)
+        return Checkpoint(state, arrays)
+
+    def remove(self):
+        if self.exists():
+            os.remove(self.path)
+        return self
+
+"""
+A loaded checkpoint, see `Checkpointer'. `restore_average_std_objs' and `restore_run' put it back in place.
+"""
+class Checkpoint:
+    def __init__(self, state, arrays):
+        self.state = state
+        self.arrays = arrays
+
+    """
+    Raise `Checkpoint_Error' unless the checkpoint was written by a run with the cogs of `registry', the board and
+    flaggies of the cog array template `template' and the objective `obj_key', see `get_run_signature'.
+    """
+    def check(self, registry, template, obj_key = None):
+        if self.state["signature"] != get_run_signature(registry, template, obj_key):
+            raise Checkpoint_Error(
+                "The checkpoint was written for a different inventory, board, set of flaggies or objective."
+            )
+        return self
+
+    """
+    Set `cog.average_obj' and `cog.std_obj' of every cog of `registry' as they were in the interrupted run.
+    """
+    def restore_average_std_objs(self, registry):
+        if len(self.arrays["average_objs"]) != len(registry):
+            raise Checkpoint_Error("The checkpoint was written for a different inventory.")
+        for cog,average_obj,std_obj in zip(registry, self.arrays["average_objs"], self.arrays["std_objs"]):
+            cog.average_obj = average_obj
+            cog.std_obj = std_obj
+        return self
+
+    """
+    - Restore the counters of `controller', the strengths of `strength_model' and the states of `rng' and of `random'.
+    - `pop' should be the `Population' of the rows `arrays["genomes"]', `arrays["values"]' and `arrays["rates"]', see
+    `Population.from_rows'.
+    - Returns the list of the best cog arrays of the finished restarts.
+    """
+    def restore_run(self, controller, pop, strength_model, rng):
+        if self.arrays["genomes"].shape[1] != pop.template.empties_set.total_coords:
+            raise Checkpoint_Error("The checkpoint was written for a different board.")
+        for attr in CONTROLLER_STATE_ATTRS:
+            setattr(controller, attr, self.state["controller"][attr])
+        controller.orig_values = self.arrays["orig_values"]
+        controller.curr_pop = pop
+        pop.pop_size = self.state["pop_size"]
+        pop.is_sorted = self.state["is_sorted"]
+
+        strength_model.restore(
+            self.arrays["raw_strengths"], self.arrays["total_strengths"], self.state["strength_start_value"]
+        )
+
+        rng.bit_generator.state = self.state["rng"]
+        version, internal_state, gauss_next = self.state["random"]
+        random.setstate((version, tuple(internal_state), gauss_next))
+
+        bests = [
+            (pop.template.with_genome(genome), float(value))
+            for genome,value in zip(self.arrays["best_genomes"], self.arrays["best_values"])
+        ]
+        controller.best = max(bests, key=lambda t:t[1]) if len(bests) > 0 else None
+        return bests
+
+class Checkpoint_Error(RuntimeError):
+    pass
+
+"""
+Returns a hex digest of the signatures of the cogs of `registry' in registry order, of the board and flaggies of the
+cog array template `template' (see `get_template_signature') and of `obj_key'.
+"""
+def get_run_signature(registry, template, obj_key = None):
+    return hashlib.sha256(repr((
+        tuple(cog.get_signature() for cog in registry),
+        get_template_signature(template.empties_set, template.flaggies),
+        obj_key
+    )).encode()).hexdigest()
+
+def _to_json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
@@ -15,80 +15,484 @@ Cogstruction: Optimizing cog arrays in Legends of Idleon
 
 import copy
 import random
+from array import array
+from collections import OrderedDict
+
 import numpy as np
 
 from cog_types import Boost_Cog
-from constants import NUM_COGS_HORI, NUM_COGS_VERT, TOTAL_COORDS
+from constants import NUM_COGS_HORI, NUM_COGS_VERT
 from coords import Coords
 
+EMPTY_CELL = -1
+GENOME_DTYPE = np.int16
+MAX_SHARED_INFLUENCE_TABLES = 256
+
 """
 - `Empties_Set.empties' should be a `set'.
+- The board is `num_cogs_hori' by `num_cogs_vert', which defaults to the size of the in-game board. `shape' is
+`(num_cogs_hori, num_cogs_vert)' and `total_coords' is the number of coords on the board, empty or not.
 - `Empties_Set.coords_list' is a list of all the non-empty coords in the array.
-- There should be one `Empties_Set' per cog array template.
+- `Empties_Set.board_coords_list' is a list of all the coords of the board, in the same order as `coords_list'.
+- `Empties_Set.cells' is an ndarray of the cell indices of `Empties_Set.coords_list', in the same order. The cell index
+of `Coords(x,y)' is `x * num_cogs_vert + y', so that a genome reshaped to `shape' is indexed like `Cog_Array.array'.
+- There should be one `Empties_Set' per cog array template. Equal `Empties_Sets' share their influence tables.
 """
 class Empties_Set:
-    def __init__(self,empties):
+    def __init__(self, empties, num_cogs_hori = NUM_COGS_HORI, num_cogs_vert = NUM_COGS_VERT):
         self.empties = empties
+        self.num_cogs_hori = num_cogs_hori
+        self.num_cogs_vert = num_cogs_vert
+        self.shape = (num_cogs_hori, num_cogs_vert)
+        self.total_coords = num_cogs_hori * num_cogs_vert
+        self._frozen_empties = frozenset(empties)
+        self._influence_tables = {}
         self.coords_list = []
-        for y in range(NUM_COGS_VERT):
-            for x in range(NUM_COGS_HORI):
+        self.board_coords_list = []
+        self.all_coords = [None] * self.total_coords
+        for y in range(num_cogs_vert):
+            for x in range(num_cogs_hori):
                 coords = Coords(x, y)
+                self.all_coords[self.get_cell(coords)] = coords
+                self.board_coords_list.append(coords)
                 if coords not in self.empties:
                     self.coords_list.append(coords)
+        self.cells = np.array([self.get_cell(coords) for coords in self.coords_list], dtype=np.intp)
+        self.cells_list = self.cells.tolist()
+        self.non_empty_mask = np.zeros(self.total_coords, dtype=bool)
+        self.non_empty_mask[self.cells] = True
 
     def __eq__(self, other):
-        return self.empties == other.empties
+        return self.shape == other.shape and self.empties == other.empties
     def __ne__(self, other):
         return not(self == other)
 
+    def __hash__(self):
+        return hash((self.shape, self._frozen_empties))
+
     def __contains__(self, coords):
         return coords in self.empties
 
     def __len__(self):
         return len(self.empties)
 
+    def get_cell(self, coords):
+        return coords.x * self.num_cogs_vert + coords.y
+
+    def get_coords(self, cell):
+        return self.all_coords[cell]
+
+    def is_out_of_bounds(self, coords):
+        return coords.is_out_of_bounds(self.num_cogs_hori, self.num_cogs_vert)
+
+    """
+    Returns the `Influence_Table' of the `Boost_Cog' subtype `cog_type' for this template. It is built only once.
+    """
+    def get_influence_table(self, cog_type):
+        try:
+            return self._influence_tables[cog_type]
+        except KeyError:
+            key = (self.shape, self._frozen_empties, cog_type)
+            table = _influence_tables.get(key)
+            if table is None:
+                table = Influence_Table(cog_type, self)
+            _share_influence_table(key, table)
+            self._influence_tables[cog_type] = table
+            return table
+
+    def has_influence_table(self, cog_type):
+        return cog_type in self._influence_tables or (self.shape, self._frozen_empties, cog_type) in _influence_tables
+
+    """
+    Use `table' as the `Influence_Table' of `cog_type' for this template and every equal one, for example after loading it
+    from a `Disk_Cache'.
+    """
+    def set_influence_table(self, cog_type, table):
+        _share_influence_table((self.shape, self._frozen_empties, cog_type), table)
+        self._influence_tables[cog_type] = table
+        return self
+
+_influence_tables = OrderedDict()
+
+"""
+Share `table' under `key' between equal `Empties_Sets'. Only the `MAX_SHARED_INFLUENCE_TABLES' most recently used tables
+are shared, so that a long-running process that sees many boards does not keep all of their tables.
+"""
+def _share_influence_table(key, table):
+    _influence_tables[key] = table
+    _influence_tables.move_to_end(key)
+    while len(_influence_tables) > MAX_SHARED_INFLUENCE_TABLES:
+        _influence_tables.popitem(last=False)
+
+"""
+- The influence of one `Boost_Cog' subtype, precomputed for every cell of one `Empties_Set'. Get one from
+`Empties_Set.get_influence_table'.
+- `neighbors[cell]' is a tuple of the in-bounds, non-empty cells influenced by a cog placed at `cell'.
+- `influencers[cell]' is a tuple of the non-empty cells from which a cog of this type influences `cell'.
+- `in_bounds[cell]' is a tuple of all in-bounds cells influenced by a cog placed at `cell', including empty ones, since
+that is where flaggies go.
+- `num_out_of_bounds[cell]' is the number of coords influenced by a cog placed at `cell' that are out of bounds.
+- `padded' is an int ndarray of shape `(total_coords, K)'. Row `cell' is `neighbors[cell]', padded with
+`total_coords'. It is meant for vectorized gathers, see `Batch_Evaluator'.
+- If `cog_type' boosts a whole line of the board (see `Boost_Cog.line_axis'), then `line_axis' is that axis and
+`lines[cell]' is the index of the line through `cell', which is an index into `Cog_Array.get_line_sums'. Otherwise
+both are `None'. A line of `K' cells is then summed once per array rather than once per cog.
+"""
+class Influence_Table:
+    def __init__(self, cog_type, empties_set):
+        total_coords = empties_set.total_coords
+        neighbors = [[] for _ in range(total_coords)]
+        influencers = [[] for _ in range(total_coords)]
+        in_bounds = [[] for _ in range(total_coords)]
+        self._flaggy_counts = {}
+        self.num_out_of_bounds = np.zeros(total_coords, dtype=np.intp)
+        for cell,coords in enumerate(empties_set.all_coords):
+            for dx,dy in cog_type.get_influence_offsets(empties_set.num_cogs_hori, empties_set.num_cogs_vert):
+                adj_coords = Coords(coords.x + dx, coords.y + dy)
+                if empties_set.is_out_of_bounds(adj_coords):
+                    self.num_out_of_bounds[cell] += 1
+                    continue
+                adj_cell = empties_set.get_cell(adj_coords)
+                in_bounds[cell].append(adj_cell)
+                if adj_coords not in empties_set:
+                    neighbors[cell].append(adj_cell)
+                    if coords not in empties_set:
+                        influencers[adj_cell].append(cell)
+        self.neighbors = tuple(map(tuple, neighbors))
+        self.influencers = tuple(map(tuple, influencers))
+        self.in_bounds = tuple(map(tuple, in_bounds))
+        self.padded = np.full((total_coords, max([1] + list(map(len, neighbors)))), total_coords, dtype=np.intp)
+        for cell,adj_cells in enumerate(neighbors):
+            self.padded[cell, :len(adj_cells)] = adj_cells
+        self.line_axis = cog_type.line_axis
+        if self.line_axis == 0:
+            self.lines = [cell % empties_set.num_cogs_vert for cell in range(total_coords)]
+        elif self.line_axis == 1:
+            self.lines = [cell // empties_set.num_cogs_vert for cell in range(total_coords)]
+        else:
+            self.lines = None
+
+    """
+    The number of cells of `flaggy_cells' influenced by a cog placed at `cell'.
+    """
+    def count_flaggies(self, cell, flaggy_cells):
+        return sum((adj_cell in flaggy_cells) for adj_cell in self.in_bounds[cell])
+
+    """
+    - Returns a list of `self.count_flaggies(cell, flaggy_cells)' over all cells.
+    - `flaggy_cells' should be a `frozenset'. The list is computed once per `flaggy_cells'.
+    """
+    def get_flaggy_counts(self, flaggy_cells):
+        if flaggy_cells not in self._flaggy_counts:
+            self._flaggy_counts[flaggy_cells] = [
+                self.count_flaggies(cell, flaggy_cells) for cell in range(len(self.in_bounds))
+            ]
+        return self._flaggy_counts[flaggy_cells]
+
+"""
+- A `Cog_Registry' assigns each `Cog' a fixed integer index. A `Cog_Array' stores these indices rather than the `Cogs'
+themselves.
+- `Cogs' are registered the first time they are added to a `Cog_Array'; indices never change afterwards.
+- There should be one `Cog_Registry' per cog array template. Copies of a `Cog_Array' share their registry.
+"""
+class Cog_Registry:
+    def __init__(self, cogs = None):
+        self.cogs = []
+        self._indices = {}
+        self._boost_cogs = {}
+        self._properties = {}
+        self._canonical_indices = None
+        if cogs is not None:
+            for cog in cogs:
+                self.register(cog)
+
+    def register(self, cog):
+        try:
+            return self._indices[cog]
+        except KeyError:
+            self._indices[cog] = len(self.cogs)
+            self.cogs.append(cog)
+            self._properties.clear()
+            self._canonical_indices = None
+            if isinstance(cog, Boost_Cog) and type(cog) not in self._boost_cogs:
+                self._boost_cogs[type(cog)] = cog
+            return self._indices[cog]
+
+    """
+    Returns a `dict' whose keys are the `Boost_Cog' subtypes among the registered cogs. Each value is a cog of that type.
+    """
+    def get_boost_cogs(self):
+        return self._boost_cogs
+
+    """
+    - Returns a float ndarray of `getattr(cog, attr)' over the registered cogs, followed by a zero, so that indexing it
+    with a genome gives zero at `EMPTY_CELL'. Cogs without `attr' contribute zero.
+    - The ndarray is cached until the next cog is registered. Do not change it.
+    """
+    def get_property(self, attr):
+        if attr not in self._properties:
+            self._properties[attr] = np.array([float(getattr(cog, attr, 0.0)) for cog in self.cogs] + [0.0])
+        return self._properties[attr]
+
+    """
+    - Returns an int ndarray that maps each registry index to the smallest registry index of a cog with the same signature
+    (see `Cog.get_signature'), followed by `EMPTY_CELL'. Indexing it with a genome gives the same genome, except that
+    interchangeable cogs are no longer told apart.
+    - The ndarray is cached until the next cog is registered. Do not change it.
+    """
+    def get_canonical_indices(self):
+        if self._canonical_indices is None:
+            first_indices = {}
+            self._canonical_indices = np.array(
+                [first_indices.setdefault(cog.get_signature(), i) for i,cog in enumerate(self.cogs)] + [EMPTY_CELL],
+                dtype=GENOME_DTYPE
+            )
+        return self._canonical_indices
+
+    def index(self, cog):
+        try:
+            return self._indices[cog]
+        except KeyError:
+            raise Cog_Not_Found_Error
+
+    def __contains__(self, cog):
+        return cog in self._indices
+
+    def __getitem__(self, i):
+        return self.cogs[i]
+
+    def __iter__(self):
+        return iter(self.cogs)
+
+    def __len__(self):
+        return len(self.cogs)
+
+"""
+- The spare cogs of a `Cog_Array', as registry indices.
+- Spares are split into groups by the set of cells where they are excluded, see `Cog_Array.excludes'. All cogs of the
+same `Boost_Cog' subtype are in the same group, and cogs that are never excluded share group `0'. Each group is a list
+with swap-remove, so `add', `remove' and `draw' take constant time. The lists are `array.array's, so that copying them
+is a `memcpy'.
+- Copies share the grouping, which only depends on the cog array template, and copy only the lists.
+- `Spare_Pool.complement(genome)' is a pool of every registered cog that is not in `genome'. It is only filled in when
+first used.
+"""
+class Spare_Pool:
+    def __init__(self, registry, empties_set, excludes_dict):
+        self.registry = registry
+        self.empties_set = empties_set
+        self.excludes_dict = excludes_dict
+        self._group_keys = [frozenset()]
+        self._group_ids = {frozenset(): 0}
+        self._cog_groups = []
+        self._type_groups = {}
+        self._allowed_groups = {}
+        self._members = [array("l")]
+        self._positions = array("l")
+        self._size = 0
+        self._complement_of = None
+
+    """
+    Returns a new, empty `Spare_Pool' with the same grouping as `self'.
+    """
+    def empty_copy(self):
+        return self._new_pool([array("l") for _ in self._group_keys], array("l", [-1]) * len(self._cog_groups), 0)
+
+    def copy(self):
+        if self._complement_of is not None:
+            self._fill()
+        return self._new_pool([members[:] for members in self._members], self._positions[:], self._size)
+
+    def _new_pool(self, members, positions, size):
+        pool = Spare_Pool.__new__(Spare_Pool)
+        pool.registry = self.registry
+        pool.empties_set = self.empties_set
+        pool.excludes_dict = self.excludes_dict
+        pool._group_keys = self._group_keys
+        pool._group_ids = self._group_ids
+        pool._cog_groups = self._cog_groups
+        pool._type_groups = self._type_groups
+        pool._allowed_groups = self._allowed_groups
+        pool._members = members
+        pool._positions = positions
+        pool._size = size
+        pool._complement_of = None
+        return pool
+
+    def complement(self, genome):
+        pool = self.empty_copy()
+        pool._complement_of = genome
+        return pool
+
+    def __contains__(self, i):
+        if self._complement_of is not None:
+            self._fill()
+        return i < len(self._positions) and self._positions[i] >= 0
+
+    def __len__(self):
+        self._fill()
+        return self._size
+
+    def __iter__(self):
+        self._fill()
+        return (i for members in self._members for i in members)
+
+    def add(self, i):
+        if i in self:
+            return self
+        group = self._get_group(i)
+        self._positions[i] = len(self._members[group])
+        self._members[group].append(i)
+        self._size += 1
+        return self
+
+    def extend(self, indices):
+        if self._complement_of is not None:
+            self._fill()
+        positions = self._positions
+        members = self._members
+        for i in indices:
+            if i >= len(positions):
+                self._add_groups()
+            if positions[i] < 0:
+                group_members = members[self._cog_groups[i]]
+                positions[i] = len(group_members)
+                group_members.append(i)
+                self._size += 1
+        return self
+
+    def remove(self, i):
+        if i not in self:
+            return self
+        members = self._members[self._get_group(i)]
+        position = self._positions[i]
+        last = members.pop()
+        if last != i:
+            members[position] = last
+            self._positions[last] = position
+        self._positions[i] = -1
+        self._size -= 1
+        return self
+
+    """
+    - Returns a random spare, without removing it. If `cell' is given, then spares that are not excluded at `cell' are
+    drawn uniformly, if there are any.
+    - Raises `Cog_Not_Found_Error' if there are no spares.
+    """
+    def draw(self, cell = None):
+        self._fill()
+        if self._size == 0:
+            raise Cog_Not_Found_Error
+        members = self._members
+        while len(members) < len(self._group_keys):
+            members.append(array("l"))
+        groups = range(len(members))
+        total = self._size
+        if cell is not None:
+            try:
+                allowed = self._allowed_groups[cell]
+            except KeyError:
+                allowed = self._allowed_groups[cell] = tuple(
+                    group for group in groups if cell not in self._group_keys[group]
+                )
+            allowed_total = 0
+            for group in allowed:
+                allowed_total += len(members[group])
+            if allowed_total > 0:
+                groups, total = allowed, allowed_total
+        r = random.randrange(total)
+        for group in groups:
+            if r < len(members[group]):
+                return members[group][r]
+            r -= len(members[group])
+
+    """
+    Returns the group of registry index `i', assigning groups to newly registered cogs.
+    """
+    def _get_group(self, i):
+        if i >= len(self._positions):
+            self._add_groups()
+        return self._cog_groups[i]
+
+    def _add_groups(self):
+        type_groups = self._type_groups
+        for cog in self.registry.cogs[len(self._cog_groups):]:
+            cog_type = type(cog)
+            if cog_type not in type_groups:
+                key = frozenset()
+                if issubclass(cog_type, Boost_Cog) and cog_type in self.excludes_dict:
+                    key = frozenset(self.empties_set.get_cell(coords) for coords in self.excludes_dict[cog_type])
+                if key not in self._group_ids:
+                    self._group_ids[key] = len(self._group_keys)
+                    self._group_keys.append(key)
+                    self._allowed_groups.clear()
+                type_groups[cog_type] = self._group_ids[key]
+            self._cog_groups.append(type_groups[cog_type])
+        while len(self._members) < len(self._group_keys):
+            self._members.append(array("l"))
+        if len(self._positions) < len(self._cog_groups):
+            self._positions.extend(array("l", [-1]) * (len(self._cog_groups) - len(self._positions)))
+
+    def _fill(self):
+        if self._complement_of is not None:
+            genome = self._complement_of
+            self._complement_of = None
+            placed = np.zeros(len(self.registry) + 1, dtype=bool)
+            placed[genome] = True
+            self.extend(np.flatnonzero(~placed[:-1]).tolist())
+
 """
 - `excludes_dict[type(cog)]' is a `set' of all coordinates where `cog' should not be placed.
 - For example, if `cog' is of type `Up_Cog', then `excludes_dict[type(cog)]' should contain all coords on the top row of
 the array.
-- This dict is not necessary for the genetic algorithm to find an optimal array. It merely improves the convergence rate. 
+- This dict is not necessary for the genetic algorithm to find an optimal array. It merely improves the convergence rate.
 """
 def get_excludes_dict(empties_set, cogs):
-    cog_array = Cog_Array(empties_set)
     excludes_dict = {}
     for cog in cogs:
         if type(cog) not in excludes_dict and isinstance(cog, Boost_Cog):
             excludes_dict[type(cog)] = set()
-            for coords in Coords_Iter(cog_array):
-                num_oob_neighbors = sum((adj_coords.is_out_of_bounds()) for adj_coords in cog.get_influence(coords))
-                if num_oob_neighbors > cog.get_max_oob_neighbors():
+            num_out_of_bounds = empties_set.get_influence_table(type(cog)).num_out_of_bounds
+            max_oob_neighbors = cog.get_max_oob_neighbors(empties_set.num_cogs_hori, empties_set.num_cogs_vert)
+            for coords,cell in zip(empties_set.coords_list, empties_set.cells_list):
+                if num_out_of_bounds[cell] > max_oob_neighbors:
                     excludes_dict[type(cog)].add(coords)
     return excludes_dict
 
 """
 A cog array consists of:
-- array: A `numpy.ndarray' of `Cogs' placed on the cog array.
+- genome: A flat `numpy.ndarray' of length `empties_set.total_coords'. `genome[cell]' is the `registry' index of the `Cog' placed at
+  that cell, or `EMPTY_CELL' if there is none. See `Empties_Set.get_cell'.
+- registry: A `Cog_Registry' that translates between indices and `Cogs'. There is only one per cog array template.
 - empties_set: An `Empties_Set' of `Coords' that the user has not yet unlocked using flaggies. There is only one per
   cog array template.
 - flaggies: A collection of `Coords' where the user currently has flaggies placed.
-- spares: A spare collection of `Cogs'.
+- spares: A spare collection of `Cogs'. It is stored as a `Spare_Pool' of `registry' indices.
 - excludes_dict: A `dict` of `sets'. Each key of `excludes_dict' is a `Cog` subtype. Each `set' consists of `Coords' where
 `Cogs' should not be placed. There is only one per cog array template.
+Copying a `Cog_Array' copies only `genome' and the spare pool; everything else is shared. The attributes `array' and
+`spares' are views that build the object-based representation on demand.
 """
 class Cog_Array:
-    def __init__(self, empties_set = None, flaggies = None, excludes_dict = None):
-        self.array = np.empty((NUM_COGS_HORI, NUM_COGS_VERT), dtype=np.dtype(object))
+    __slots__ = (
+        "genome", "registry", "empties_set", "flaggies", "excludes_dict", "_spares", "_num_occupied",
+        "build_rate", "flaggy_rate", "total_exp_mult", "_flaggy_base_rate", "_flaggy_speed"
+    )
+
+    def __init__(self, empties_set = None, flaggies = None, excludes_dict = None, registry = None):
+        self.registry = registry if registry is not None else Cog_Registry()
         self.empties_set = empties_set if empties_set is not None else Empties_Set(set())
-        self.flaggies = set(flaggies) if flaggies is not None else set()
-        self.spares = set()
-        self.build_rate = self.flaggy_rate = self.total_exp_mult = None
+        self.genome = np.full(self.empties_set.total_coords, EMPTY_CELL, dtype=GENOME_DTYPE)
+        self.flaggies = frozenset(flaggies) if flaggies is not None else frozenset()
+        self._reset_rates()
         self.excludes_dict = excludes_dict if excludes_dict is not None else {}
+        self._spares = Spare_Pool(self.registry, self.empties_set, self.excludes_dict)
         self._num_occupied = 0
 
     """
     - Randomly places cogs on the cog array. Any leftover cogs are added to `self.spares'.
     - If `cog in cogs', then this method will try to place `cog' where `self.excludes(coords, cog)' is `False'. However,
-    depending on the shape of the cog array and the given `cogs', this will not always be possible, but the method will 
+    depending on the shape of the cog array and the given `cogs', this will not always be possible, but the method will
     always return.
     """
     def instantiate_randomly(self,cogs):
@@ -103,15 +507,45 @@ class Cog_Array:
         return self
 
     """
-    Mostly used for copying.
+    - Mostly used for copying.
+    - `array' is an ndarray of `Cogs' (or `None') of shape `self.empties_set.shape', like `Cog_Array.array'.
     """
     def instantiate_from_array(self,array):
+        genome = np.full(self.empties_set.total_coords, EMPTY_CELL, dtype=GENOME_DTYPE)
+        for cell,cog in enumerate(np.asarray(array).reshape(-1)):
+            if cog is not None:
+                genome[cell] = self.registry.register(cog)
+        return self.instantiate_from_genome(genome)
+
+    """
+    - Place cogs according to `genome', which is indexed like `Cog_Array.genome'.
+    - The spares are left untouched.
+    """
+    def instantiate_from_genome(self,genome):
         if self.get_num_spares() != 0 or self.get_num_occupied() != 0:
             raise RuntimeError("Cog_Array must be empty before instatiating.")
-        self.array = array
-        self._num_occupied = sum((self.array[i,j] is not None) for i,j in np.ndindex((NUM_COGS_HORI,NUM_COGS_VERT)))
+        self.genome = np.array(genome, dtype=GENOME_DTYPE)
+        self.genome[~self.empties_set.non_empty_mask] = EMPTY_CELL
+        self._num_occupied = int(np.count_nonzero(self.genome != EMPTY_CELL))
+        self._reset_rates()
         return self
 
+    """
+    - Returns a new `Cog_Array' with the same template as `self', whose cogs are placed according to `genome'.
+    - Every cog of `self.registry' that is not placed is a spare.
+    """
+    def with_genome(self,genome):
+        cog_array = Cog_Array.__new__(Cog_Array)
+        cog_array.registry = self.registry
+        cog_array.empties_set = self.empties_set
+        cog_array.flaggies = self.flaggies
+        cog_array.excludes_dict = self.excludes_dict
+        cog_array.genome = np.array(genome, dtype=GENOME_DTYPE)
+        cog_array._spares = self._spares.complement(cog_array.genome)
+        cog_array._num_occupied = int(np.count_nonzero(cog_array.genome != EMPTY_CELL))
+        cog_array._reset_rates()
+        return cog_array
+
     """
     - Randomly place cogs from `self.spares' on non-empty coords where `self.is_occupied(coords)' is `False'.
     - This method will not remove or replace cogs that have already been placed on the cog array.
@@ -127,26 +561,32 @@ class Cog_Array:
     Place a cog by coords.
     """
     def __setitem__(self, coords, cog):
-        if coords.is_out_of_bounds() or coords in self.empties_set:
+        if self.empties_set.is_out_of_bounds(coords) or coords in self.empties_set:
             raise RuntimeError("invalid coords")
-        if not self.is_occupied(coords):
-            self._num_occupied += 1
-        self.array[coords.x, coords.y] = cog
+        cell = self.empties_set.get_cell(coords)
+        was_occupied = self.genome[cell] != EMPTY_CELL
+        if cog is None:
+            self.genome[cell] = EMPTY_CELL
+            self._num_occupied -= was_occupied
+        else:
+            self.genome[cell] = self.registry.register(cog)
+            self._num_occupied += not was_occupied
         self._reset_rates()
 
     """
     Get a cog by coords.
     """
     def __getitem__(self, coords):
-        if coords.is_out_of_bounds() or coords in self.empties_set:
+        if self.empties_set.is_out_of_bounds(coords) or coords in self.empties_set:
             return None
-        return self.array[coords.x, coords.y]
+        i = self.genome[self.empties_set.get_cell(coords)]
+        return self.registry.cogs[i] if i != EMPTY_CELL else None
 
     def __str__(self):
         ret = ""
         line = ""
         i = 1
-        for coords in Coords_Iter():
+        for coords in self.empties_set.board_coords_list:
             if coords.x == 0 and coords.y > 0:
                 ret = line + "\n\n" + ret
                 line = ""
@@ -174,13 +614,30 @@ class Cog_Array:
         return ((coords,self[coords]) for coords in Coords_Iter(self))
 
     def __copy__(self):
-        cog_array = Cog_Array(self.empties_set, None, self.excludes_dict)
-        cog_array.instantiate_from_array(copy.copy(self.array))
-        cog_array.extend_spares(copy.copy(self.spares))
+        cog_array = Cog_Array.__new__(Cog_Array)
+        cog_array.genome = self.genome.copy()
+        cog_array._spares = self._spares.copy()
+        cog_array.registry = self.registry
+        cog_array.empties_set = self.empties_set
+        cog_array.flaggies = self.flaggies
+        cog_array.excludes_dict = self.excludes_dict
+        cog_array._num_occupied = self._num_occupied
+        cog_array.build_rate = self.build_rate
+        cog_array.flaggy_rate = self.flaggy_rate
+        cog_array.total_exp_mult = self.total_exp_mult
+        cog_array._flaggy_base_rate = self._flaggy_base_rate
+        cog_array._flaggy_speed = self._flaggy_speed
         return cog_array
 
     def __eq__(self, other):
-        if self.empties_set != other.empties_set or self.spares != other.spares or self.flaggies != other.flaggies:
+        if self.empties_set != other.empties_set or self.flaggies != other.flaggies:
+            return False
+        if self.registry is other.registry:
+            return (
+                np.array_equal(self.genome, other.genome) and
+                set(self._spares) == set(other._spares)
+            )
+        if self.spares != other.spares:
             return False
         for coords,cog in self:
             if cog != other[coords]:
@@ -190,11 +647,28 @@ class Cog_Array:
     def __ne__(self, other):
         return not(self==other)
 
+    """
+    An ndarray of `Cogs' (or `None') of shape `self.empties_set.shape'. Changing it does not change `self'.
+    """
+    @property
+    def array(self):
+        array = np.empty(self.empties_set.total_coords, dtype=np.dtype(object))
+        for cell in np.flatnonzero(self.genome != EMPTY_CELL):
+            array[cell] = self.registry.cogs[self.genome[cell]]
+        return array.reshape(self.empties_set.shape)
+
+    """
+    A `set' of the spare `Cogs'. Changing it does not change `self'.
+    """
+    @property
+    def spares(self):
+        return set(self.registry.cogs[i] for i in self._spares)
+
     "Call it and see =)"
     def str_with_abbr(self):
         ret = ""
         line = ""
-        for coords in Coords_Iter():
+        for coords in self.empties_set.board_coords_list:
             if coords.x == 0 and coords.y > 0:
                 ret = line + "\n\n" + ret
                 line = ""
@@ -230,7 +704,7 @@ class Cog_Array:
             return ret
 
     """
-    - This method blends two input `Cog_Arrays'. The blended `Cog_Array' is called `child'. 
+    - This method blends two input `Cog_Arrays'. The blended `Cog_Array' is called `child'.
     - For each non-empty `coord' of `self', the cog `child[coord]' will usually be either `self[coord]' or 'other[coord]'.
     - The decision of whether `child[coord]' is equal to either `self[coord]' or 'other[coord]' is made randomly. However,
     the odds are not 1:1. The exact probability is based off four floats
@@ -238,35 +712,35 @@ class Cog_Array:
         > `other[coords].get_strength(coords)'
         > `self[coords].get_average_std_obj()[0]' and
         > `other[coords].get_average_std_obj()[0]'.
-    - Under certain circumstances, `child[coord]' will be neither `self[coord]' nor `other[coord]'. This will happen if 
-    both of these cogs have already been placed somewhere else in `child'. 
+    - Under certain circumstances, `child[coord]' will be neither `self[coord]' nor `other[coord]'. This will happen if
+    both of these cogs have already been placed somewhere else in `child'.
     """
     def cross_breed(self,other):
         child = copy.copy(self)
         child.move_all_to_spares()
+        other_genome = other._get_genome_in(self.registry)
+        cogs = self.registry.cogs
         for coords in Coords_Iter(self, True):
-            self_strength = self[coords].get_strength(coords)*self[coords].get_average_std_obj()[0]
-            other_strength = other[coords].get_strength(coords)*other[coords].get_average_std_obj()[0]
+            cell = self.empties_set.get_cell(coords)
+            self_i = self.genome[cell]
+            other_i = other_genome[cell]
+            self_strength = cogs[self_i].get_strength(coords)*cogs[self_i].get_average_std_obj()[0]
+            other_strength = cogs[other_i].get_strength(coords)*cogs[other_i].get_average_std_obj()[0]
             self_weight = self_strength/(self_strength + other_strength)
-            if random.uniform(0,1) <= self_weight:
-                if self[coords] in child.spares:
-                    child.move_cog_from_spares(coords, self[coords])
-                elif other[coords] in child.spares:
-                    child.move_cog_from_spares(coords, other[coords])
-                else:
-                    child.move_random_cog_from_spares(coords)
+            if random.uniform(0,1) > self_weight:
+                self_i, other_i = other_i, self_i
+            if child._is_spare(self_i):
+                child._move_index_from_spares(cell, self_i)
+            elif child._is_spare(other_i):
+                child._move_index_from_spares(cell, other_i)
             else:
-                if other[coords] in child.spares:
-                    child.move_cog_from_spares(coords, other[coords])
-                elif self[coords] in child.spares:
-                    child.move_cog_from_spares(coords, self[coords])
-                else:
-                    child.move_random_cog_from_spares(coords)
+                child.move_random_cog_from_spares(coords)
         return child
 
     """
-    - This method produces a new `Cog_Array' called `child'. 
+    - This method produces a new `Cog_Array' called `child'.
     - First, randomly choose a cog placed in `self'. Then, choose a random cog from `self.spares'. Switch these two.
+    - If the rates of `self' are cached, then the rates of `child' are computed from them. See `_inherit_rates'.
     """
     def one_point_mutation(self):
         if self.get_num_spares() == 0:
@@ -276,19 +750,24 @@ class Cog_Array:
         old_cog = child[coords]
         child[coords] = None
         child.move_random_cog_from_spares(coords)
-        child.add_spare(old_cog)
+        if old_cog is not None:
+            child.add_spare(old_cog)
+        child._inherit_rates(self, [coords])
         return child,coords,old_cog
 
     """
     - Switch two cogs that are currently placed in the array.
     - This method ignores the cog shelf, `self.spares`.
+    - If the rates of `self' are cached, then the rates of `child' are computed from them. See `_inherit_rates'.
     """
     def two_point_mutation(self):
         child = copy.copy(self)
         coords1,coords2 = child.get_random_coords(2)
-        cog1 = child[coords1]
-        child[coords1] = child[coords2]
-        child[coords2] = cog1
+        cell1 = self.empties_set.get_cell(coords1)
+        cell2 = self.empties_set.get_cell(coords2)
+        child.genome[cell1], child.genome[cell2] = self.genome[cell2], self.genome[cell1]
+        child._reset_rates()
+        child._inherit_rates(self, [coords1, coords2])
         return child, coords1, coords2
 
 
@@ -298,55 +777,51 @@ class Cog_Array:
     - This method ignores the return value of `self.excludes(coords, cog)'.
     """
     def move_cog_from_spares(self, coords, cog):
-        if cog not in self.spares:
+        if cog not in self.registry:
             raise Cog_Not_Found_Error
-        self.spares.remove(cog)
-        self.move_cog_to_spares(coords)
-        self[coords] = cog
-        self._reset_rates()
+        i = self.registry.index(cog)
+        if not self._is_spare(i):
+            raise Cog_Not_Found_Error
+        if self.empties_set.is_out_of_bounds(coords) or coords in self.empties_set:
+            raise RuntimeError("invalid coords")
+        self._move_index_from_spares(self.empties_set.get_cell(coords), i)
         return self
 
     """
-    - Move a random cog from `self.spares' to `coords' of `self'. 
-    - If `coords' is already occupied by a different cog, then move that cog to `self.spares' before replacing with the 
+    - Move a random cog from `self.spares' to `coords' of `self'.
+    - If `coords' is already occupied by a different cog, then move that cog to `self.spares' before replacing with the
     new random cog.
-    - This method will attempt to choose a `cog' such that `self.excludes(coords,cog)' is `False', whenever this is 
-    possible. 
+    - This method will choose a `cog' such that `self.excludes(coords,cog)' is `False', whenever this is possible. The
+    draw takes constant time, see `Spare_Pool.draw'.
     """
     def move_random_cog_from_spares(self,coords):
-        if self.get_num_spares() == 0:
-            raise Cog_Not_Found_Error
-        attempts = 0
-        while attempts < len(self.spares):
-            cog = random.sample(self.spares, 1)[0]
-            if not self.excludes(coords,cog):
-                break
-            attempts += 1
-        else:
-            cog = random.sample(self.spares, 1)[0]
-        self.move_cog_from_spares(coords,cog)
-        return cog
+        cell = self.empties_set.get_cell(coords)
+        i = self._spares.draw(cell)
+        self._move_index_from_spares(cell, i)
+        return self.registry.cogs[i]
 
     def move_cog_to_spares(self,coords):
         if self.is_occupied(coords):
-            self.add_spare(self[coords])
-            self.array[coords.x,coords.y] = None
+            cell = self.empties_set.get_cell(coords)
+            self._set_spare(self.genome[cell], True)
+            self.genome[cell] = EMPTY_CELL
             self._reset_rates()
             self._num_occupied -= 1
         return self
 
     def move_all_to_spares(self):
-        for coords in Coords_Iter(self):
-            self.move_cog_to_spares(coords)
+        self._spares.extend(self.genome[self.genome != EMPTY_CELL].tolist())
+        self.genome[:] = EMPTY_CELL
+        self._num_occupied = 0
+        self._reset_rates()
         return self
 
     def add_spare(self,cog):
-        self.spares.add(cog)
+        self._set_spare(self.registry.register(cog), True)
         return self
 
     def extend_spares(self,cogs):
-        for cog in cogs:
-            self.add_spare(cog)
+        self._spares.extend([self.registry.register(cog) for cog in cogs])
         return self
 
     def is_occupied(self,coords):
@@ -357,24 +832,180 @@ class Cog_Array:
 
     def _reset_rates(self):
         self.build_rate = self.flaggy_rate = self.total_exp_mult = None
+        self._flaggy_base_rate = self._flaggy_speed = None
+
+    """
+    - Returns the rates vector `[build rate, flaggy rate before speed boosts, total flaggy speed boost, total exp mult]'.
+    The flaggy rate is `rates[1] * (1 + rates[2])'.
+    - `Batch_Evaluator.evaluate_rates' returns the same vector for whole stacks of genomes.
+    """
+    def get_rates(self):
+        if self.get_cached_rates() is None:
+            self._compute_rates()
+        return self.get_cached_rates()
+
+    """
+    Same as `get_rates', but returns `None' instead of computing rates that are not cached.
+    """
+    def get_cached_rates(self):
+        if self.build_rate is None or self._flaggy_base_rate is None or self.total_exp_mult is None:
+            return None
+        return np.array([self.build_rate, self._flaggy_base_rate, self._flaggy_speed, self.total_exp_mult])
+
+    """
+    Set the cached rates from a rates vector, see `get_rates'.
+    """
+    def set_cached_rates(self, rates):
+        self.build_rate, self._flaggy_base_rate, self._flaggy_speed, self.total_exp_mult = map(float, rates)
+        self.flaggy_rate = self._flaggy_base_rate * (1 + self._flaggy_speed)
+
+    """
+    - `self' must differ from `parent' only at the coords in `coords_list'.
+    - If the rates of `parent' are cached, then set the cached rates of `self' to those of `parent', minus the
+    contributions of `coords_list' to `parent', plus the contributions of `coords_list' to `self'. See
+    `_get_local_rates'. This costs `O(influence)' rather than `O(board * influence)'.
+    """
+    def _inherit_rates(self, parent, coords_list):
+        parent_rates = parent.get_cached_rates()
+        if parent_rates is not None:
+            self.set_cached_rates(
+                parent_rates - parent._get_local_rates(coords_list) + self._get_local_rates(coords_list)
+            )
+
+    """
+    - Returns the part of `self.get_rates()' that depends on the cogs at `coords_list': their own rates, the boosts
+    they give to the cogs they influence, and the boosts they receive from the other cogs that influence them.
+    - Each pair of a boosting cog and a boosted cog is counted once, even if both are at `coords_list'.
+    """
+    def _get_local_rates(self, coords_list):
+        cells = [self.empties_set.get_cell(coords) for coords in coords_list]
+        genome = self.genome.tolist()
+        cogs = self.registry.cogs
+        flaggy_cells = self._get_flaggy_cells()
+        build = flaggy_base = flaggy_speed = exp = 0.0
+        for cell in cells:
+            i = genome[cell]
+            if i == EMPTY_CELL:
+                continue
+            cog = cogs[i]
+            build += cog.build_rate
+            flaggy_base += cog.flaggy_rate
+            exp += cog.exp_mult
+            if isinstance(cog, Boost_Cog):
+                table = self.empties_set.get_influence_table(type(cog))
+                for adj_cell in table.neighbors[cell]:
+                    j = genome[adj_cell]
+                    if j != EMPTY_CELL:
+                        build += cogs[j].build_rate * cog.build_rate_boost
+                        flaggy_base += cogs[j].flaggy_rate * cog.flaggy_rate_boost
+                if len(flaggy_cells) > 0:
+                    flaggy_speed += cog.flaggy_speed_boost * table.get_flaggy_counts(flaggy_cells)[cell] / len(self.flaggies)
+            for boost_type in self.registry.get_boost_cogs():
+                for boost_cell in self.empties_set.get_influence_table(boost_type).influencers[cell]:
+                    j = genome[boost_cell]
+                    if j != EMPTY_CELL and boost_cell not in cells and type(cogs[j]) is boost_type:
+                        build += cog.build_rate * cogs[j].build_rate_boost
+                        flaggy_base += cog.flaggy_rate * cogs[j].flaggy_rate_boost
+        return np.array([build, flaggy_base, flaggy_speed, exp])
+
+    """
+    Returns a `frozenset' of the cells of `self.flaggies'.
+    """
+    def _get_flaggy_cells(self):
+        return frozenset(
+            self.empties_set.get_cell(coords) for coords in self.flaggies if not self.empties_set.is_out_of_bounds(coords)
+        )
+
+    """
+    - Calculate all the rates in one pass over the occupied cells, using the influence tables of `self.empties_set'.
+    - Cogs that boost a whole line read the sum of that line from `self.get_line_sums', so they cost the same as any
+    other cog, however large the board is.
+    """
+    def _compute_rates(self):
+        genome = self.genome.tolist()
+        cogs = self.registry.cogs
+        flaggy_cells = self._get_flaggy_cells()
+        line_sums = None
+        build = flaggy_base = flaggy_speed = exp = 0.0
+        for cell in self.empties_set.cells_list:
+            i = genome[cell]
+            if i == EMPTY_CELL:
+                continue
+            cog = cogs[i]
+            build += cog.build_rate
+            flaggy_base += cog.flaggy_rate
+            exp += cog.exp_mult
+            if isinstance(cog, Boost_Cog):
+                table = self.empties_set.get_influence_table(type(cog))
+                if table.line_axis is not None:
+                    if line_sums is None:
+                        line_sums = self.get_line_sums()
+                    line_build, line_flaggy = line_sums[table.line_axis]
+                    line = table.lines[cell]
+                    build += (line_build[line] - cog.build_rate) * cog.build_rate_boost
+                    flaggy_base += (line_flaggy[line] - cog.flaggy_rate) * cog.flaggy_rate_boost
+                else:
+                    for adj_cell in table.neighbors[cell]:
+                        j = genome[adj_cell]
+                        if j != EMPTY_CELL:
+                            build += cogs[j].build_rate * cog.build_rate_boost
+                            flaggy_base += cogs[j].flaggy_rate * cog.flaggy_rate_boost
+                if len(flaggy_cells) > 0:
+                    flaggy_speed += cog.flaggy_speed_boost * table.get_flaggy_counts(flaggy_cells)[cell] / len(self.flaggies)
+        self.set_cached_rates((build, flaggy_base, flaggy_speed, exp))
+
+    """
+    - Returns a `dict' keyed by the axes `0' and `1' of `self.array'. Each value is a pair of lists, the build rates and
+    the flaggy rates of the placed cogs summed along that axis.
+    - For example, `self.get_line_sums()[0][0][y]' is the total build rate of the row `y'.
+    """
+    def get_line_sums(self):
+        build_rates = self.registry.get_property("build_rate")[self.genome].reshape(self.empties_set.shape)
+        flaggy_rates = self.registry.get_property("flaggy_rate")[self.genome].reshape(self.empties_set.shape)
+        return {
+            axis: (build_rates.sum(axis=axis).tolist(), flaggy_rates.sum(axis=axis).tolist())
+            for axis in (0, 1)
+        }
+
+    def _is_spare(self, i):
+        return int(i) in self._spares
+
+    def _set_spare(self, i, is_spare):
+        if is_spare:
+            self._spares.add(int(i))
+        else:
+            self._spares.remove(int(i))
+
+    """
+    Same as `move_cog_from_spares', but by cell index and registry index, and without any checks.
+    """
+    def _move_index_from_spares(self, cell, i):
+        self._spares.remove(int(i))
+        old_i = self.genome[cell]
+        if old_i != EMPTY_CELL:
+            self._spares.add(int(old_i))
+        else:
+            self._num_occupied += 1
+        self.genome[cell] = i
+        self._reset_rates()
+
+    """
+    Return `self.genome', but with indices from `registry' rather than `self.registry'.
+    """
+    def _get_genome_in(self, registry):
+        if registry is self.registry:
+            return self.genome
+        genome = np.full(self.empties_set.total_coords, EMPTY_CELL, dtype=GENOME_DTYPE)
+        for cell in np.flatnonzero(self.genome != EMPTY_CELL):
+            genome[cell] = registry.index(self.registry.cogs[self.genome[cell]])
+        return genome
 
     """
     Calculate the total build rate of the array.
     """
     def get_build_rate(self):
         if self.build_rate is None:
-            total = 0
-            for coords, cog in self:
-                if self.is_occupied(coords):
-                    if isinstance(cog, Boost_Cog):
-                        rate = cog.build_rate_boost
-                        if rate > 0:
-                            for adj_cog_coords in cog.get_influence(coords):
-                                if self.is_occupied(adj_cog_coords):
-                                    adj_cog = self[adj_cog_coords]
-                                    total += adj_cog.build_rate * rate
-                    total += cog.build_rate
-            self.build_rate = total
+            self._compute_rates()
         return self.build_rate
 
     """
@@ -385,24 +1016,8 @@ class Cog_Array:
     - The ''flaggy speed'' adjacency bonus does nothing, which is likewise a bug.
     """
     def get_flaggy_rate(self):
-        if self.flaggy_rate is None:
-            total_rate = total_speed = 0
-            for coords, cog in self:
-                if self.is_occupied(coords):
-                    if isinstance(cog, Boost_Cog):
-                        rate = cog.flaggy_rate_boost
-                        if rate > 0:
-                            for adj_cog_coords in cog.get_influence(coords):
-                                if self.is_occupied(adj_cog_coords):
-                                    adj_cog = self[adj_cog_coords]
-                                    total_rate += adj_cog.flaggy_rate * rate
-                        speed = cog.flaggy_speed_boost
-                        if speed > 0:
-                            for adj_cog_coords in cog.get_influence(coords):
-                                if self.is_flaggy(adj_cog_coords):
-                                    total_speed += speed/len(self.flaggies)
-                    total_rate += cog.flaggy_rate
-            self.flaggy_rate = total_rate*(1+total_speed)
+        if self._flaggy_base_rate is None:
+            self._compute_rates()
         return self.flaggy_rate
 
     """
@@ -412,7 +1027,7 @@ class Cog_Array:
     """
     def get_total_exp_mult(self):
         if self.total_exp_mult is None:
-            self.total_exp_mult = sum((cog.exp_mult if self.is_occupied(coords) else 0.0) for coords, cog in self)
+            self._compute_rates()
         # if self.exp_rate is None:
         #     total_rate = sum((cog.exp_rate if self.is_occupied(coords) else 0.0) for coords,cog in self)
         #     total_bonus = 0.0
@@ -428,17 +1043,17 @@ class Cog_Array:
         return self.total_exp_mult
 
     """
-    - A convex combination (i.e. weighted average) of the build, flaggy, and exp rates. 
+    - A convex combination (i.e. weighted average) of the build, flaggy, and exp rates.
     - ''obj_fnx'' is an abbreviation of ''objective function''.
     """
     def standard_obj_fxn(self,build_weight,flaggy_weight,exp_weight):
         return self.get_build_rate() * build_weight + self.get_flaggy_rate() * flaggy_weight + self.get_total_exp_mult() * exp_weight
 
     def get_num_spares(self):
-        return len(self.spares)
+        return len(self._spares)
 
     def get_num_non_empty(self):
-        return TOTAL_COORDS - len(self.empties_set)
+        return self.empties_set.total_coords - len(self.empties_set)
 
     """
     Returns the total number of cogs in `self.spares` if every non-empty coords of `self` is occupied.
@@ -449,17 +1064,16 @@ class Cog_Array:
     def get_num_occupied(self):
         return self._num_occupied
 
-
 """
 Iterates through all the non-empty coordinates of an input `Cog_Array'.
 """
 class Coords_Iter:
-    def __init__(self, cog_array = None, randomize_order = False, length =TOTAL_COORDS):
+    def __init__(self, cog_array = None, randomize_order = False, length = None):
         self.cog_array = cog_array if cog_array is not None else Cog_Array()
         self.randomize_order = randomize_order
         self.curr_index = None
         self.coords_list = self.cog_array.empties_set.coords_list
-        self.length = min(length,len(self.coords_list))
+        self.length = min(length,len(self.coords_list)) if length is not None else len(self.coords_list)
 
     def __iter__(self):
         self.curr_index = 0
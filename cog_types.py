@@ -14,12 +14,15 @@ Cogstruction: Optimizing cog arrays in Legends of Idleon
 """
 
 import itertools
+import numbers
 
 import numpy as np
 
 from constants import ONE_SIG_PROB, NUM_COGS_HORI, NUM_COGS_VERT
 from coords import Coords
 
+COG_STATE_ATTRS = ("strengths", "strength_start_value", "average_obj", "std_obj")
+
 """
 - All cogs are instances of `Cog'.
 - `Cog' has two immediate subclasses, `Character' and `Boost_Cog'. Characters are instances of `Character' and cogs with
@@ -29,6 +32,8 @@ example, a `Right_Cog' might have low strength for coordinates on the far right
 - The `strengths' always add to 1.
 - The ndarray `strengths' is always instantiated uniformly (over non-empty coords) via the method 
 `Cog.instantiate_strengths(cog_array)'. 
+- `learning_algo' keeps the strengths of all cogs in one `Strength_Model' instead, and copies them to `strengths' at the
+end of each restart.
 """
 class Cog:
     def __init__(self, build_rate, flaggy_rate, exp_mult):
@@ -40,6 +45,17 @@ class Cog:
         self.average_obj = None
         self.std_obj = None
 
+    """
+    - Returns a tuple of the type and stats of `self', without the attributes that the genetic algorithm learns (see
+    `COG_STATE_ATTRS'). Its `repr' does not change between runs.
+    - Cogs with equal signatures are interchangeable.
+    """
+    def get_signature(self):
+        return (type(self).__name__,) + tuple(sorted(
+            (attr, float(value) if isinstance(value, numbers.Real) else value)
+            for attr,value in vars(self).items() if attr not in COG_STATE_ATTRS
+        ))
+
     def __str__(self):
         return (
              ("Type:               %s\n" % self.__class__.__name__) +
@@ -73,7 +89,7 @@ class Cog:
     - Set each non-empty coordinate strength to 1/N, where N is the total number of non-empty coords of `cog_array'.
     """
     def instantiate_strengths(self,cog_array):
-        self.strengths = np.zeros((NUM_COGS_HORI,NUM_COGS_VERT))
+        self.strengths = np.zeros(cog_array.empties_set.shape)
         for coords,_ in cog_array:
             self.strengths[coords.x,coords.y] = 1.0
         self.strength_start_value = 1/np.sum(self.strengths)
@@ -114,7 +130,7 @@ class Cog:
     def get_abbr(self):
         return "O"
 
-    def get_max_oob_neighbors(self):
+    def get_max_oob_neighbors(self, num_cogs_hori = NUM_COGS_HORI, num_cogs_vert = NUM_COGS_VERT):
         return 0
 
 
@@ -134,6 +150,9 @@ class Character(Cog):
 
 
 class Boost_Cog(Cog):
+    influence_offsets = []
+    line_axis = None
+
     def __init__(self, build_rate, flaggy_rate, exp_mult, build_rate_boost, flaggy_rate_boost, flaggy_speed_boost, exp_boost):
         super().__init__(build_rate, flaggy_rate, exp_mult)
         self.build_rate_boost = build_rate_boost
@@ -150,140 +169,127 @@ class Boost_Cog(Cog):
             (("Exp boost:          %d%%\n" % int(self.exp_boost * 100)) if self.exp_boost > 0 else "")
         ).strip()
 
+    """
+    - Each subclass lists the `(x,y)' offsets of the coords that it boosts in the class attribute `influence_offsets'.
+    - Returns the coords boosted by a cog at `coords', including coords that are out of bounds or empty.
+    - In hot loops, use `Empties_Set.get_influence_table' instead, which never allocates `Coords'.
+    """
+    def get_influence(self, coords, num_cogs_hori = NUM_COGS_HORI, num_cogs_vert = NUM_COGS_VERT):
+        return (coords + Coords(dx, dy) for dx, dy in self.get_influence_offsets(num_cogs_hori, num_cogs_vert))
+
+    """
+    - The `(x,y)' offsets of the coords boosted by a cog of this type on a board of `num_cogs_hori' by `num_cogs_vert'.
+    - Only `Row_Cog' and `Col_Cog' depend on the size of the board. They boost a whole line of the board, which runs
+    along the axis `line_axis' of `Cog_Array.array'. Every other subclass has `line_axis = None'.
+    """
+    @classmethod
+    def get_influence_offsets(cls, num_cogs_hori = NUM_COGS_HORI, num_cogs_vert = NUM_COGS_VERT):
+        return cls.influence_offsets
 
-class Yang_Cog(Boost_Cog):
 
-    def get_influence(self,coords):
-        return map(
-            lambda t: coords + Coords(t[0], t[1]),
-            [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1), (-2, 0), (2, 0), (0, -2), (0, 2)]
-        )
+class Yang_Cog(Boost_Cog):
+    influence_offsets = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1), (-2, 0), (2, 0), (0, -2), (0, 2)]
 
     def get_abbr(self):
         return "Y"
 
-    def get_max_oob_neighbors(self):
+    def get_max_oob_neighbors(self, num_cogs_hori = NUM_COGS_HORI, num_cogs_vert = NUM_COGS_VERT):
         return 4
 
 
 class X_Cog(Boost_Cog):
-    def get_influence(self,coords):
-        return map(
-            lambda t: coords + Coords(t[0], t[1]),
-            [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-        )
+    influence_offsets = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
     def get_abbr(self):
         return "X"
 
-    def get_max_oob_neighbors(self):
+    def get_max_oob_neighbors(self, num_cogs_hori = NUM_COGS_HORI, num_cogs_vert = NUM_COGS_VERT):
         return 2
 
 
 class Plus_Cog(Boost_Cog):
-    def get_influence(self,coords):
-        return map(
-            lambda t: coords + Coords(t[0], t[1]),
-            [(-1, 0), (1, 0), (0, -1), (0, 1)]
-        )
+    influence_offsets = [(-1, 0), (1, 0), (0, -1), (0, 1)]
 
     def get_abbr(self):
         return "+"
 
-    def get_max_oob_neighbors(self):
+    def get_max_oob_neighbors(self, num_cogs_hori = NUM_COGS_HORI, num_cogs_vert = NUM_COGS_VERT):
         return 2
 
 
 class Left_Cog(Boost_Cog):
-    def get_influence(self,coords):
-        return map(
-            lambda t: coords + Coords(t[0], t[1]),
-            [(-2, -1), (-2, 0), (-2, 1), (-1, -1), (-1, 0), (-1, 1)]
-        )
+    influence_offsets = [(-2, -1), (-2, 0), (-2, 1), (-1, -1), (-1, 0), (-1, 1)]
 
     def get_abbr(self):
         return "<"
 
-    def get_max_oob_neighbors(self):
+    def get_max_oob_neighbors(self, num_cogs_hori = NUM_COGS_HORI, num_cogs_vert = NUM_COGS_VERT):
         return 3
 
 
 class Right_Cog(Boost_Cog):
-    def get_influence(self,coords):
-        return map(
-            lambda t: coords + Coords(t[0], t[1]),
-            [(2, -1), (2, 0), (2, 1), (1, -1), (1, 0), (1, 1)]
-        )
+    influence_offsets = [(2, -1), (2, 0), (2, 1), (1, -1), (1, 0), (1, 1)]
+
     def get_abbr(self):
         return ">"
 
-    def get_max_oob_neighbors(self):
+    def get_max_oob_neighbors(self, num_cogs_hori = NUM_COGS_HORI, num_cogs_vert = NUM_COGS_VERT):
         return 3
 
 
 class Up_Cog(Boost_Cog):
-    def get_influence(self,coords):
-        return map(
-            lambda t: coords + Coords(t[0], t[1]),
-            [(-1, 1), (0, 1), (1, 1), (-1, 2), (0, 2), (1, 2)]
-        )
+    influence_offsets = [(-1, 1), (0, 1), (1, 1), (-1, 2), (0, 2), (1, 2)]
 
     def get_abbr(self):
         return "^"
 
-    def get_max_oob_neighbors(self):
+    def get_max_oob_neighbors(self, num_cogs_hori = NUM_COGS_HORI, num_cogs_vert = NUM_COGS_VERT):
         return 3
 
 
 class Down_Cog(Boost_Cog):
-    def get_influence(self,coords):
-        return map(
-            lambda t: coords + Coords(t[0], t[1]),
-            [(-1, -1), (0, -1), (1, -1), (-1, -2), (0, -2), (1, -2)]
-        )
+    influence_offsets = [(-1, -1), (0, -1), (1, -1), (-1, -2), (0, -2), (1, -2)]
 
     def get_abbr(self):
         return "v"
 
-    def get_max_oob_neighbors(self):
+    def get_max_oob_neighbors(self, num_cogs_hori = NUM_COGS_HORI, num_cogs_vert = NUM_COGS_VERT):
         return 3
 
 
 class Row_Cog(Boost_Cog):
-    def get_influence(self,coords):
-        return map(
-            lambda t: coords + Coords(t[0],t[1]),
-            [(x,0) for x in itertools.chain(range(-NUM_COGS_HORI,0),range(1,NUM_COGS_HORI+1))]
-        )
+    line_axis = 0
+
+    @classmethod
+    def get_influence_offsets(cls, num_cogs_hori = NUM_COGS_HORI, num_cogs_vert = NUM_COGS_VERT):
+        return [(x,0) for x in itertools.chain(range(-num_cogs_hori,0),range(1,num_cogs_hori+1))]
 
     def get_abbr(self):
         return "-"
 
-    def get_max_oob_neighbors(self):
-        return NUM_COGS_HORI
+    def get_max_oob_neighbors(self, num_cogs_hori = NUM_COGS_HORI, num_cogs_vert = NUM_COGS_VERT):
+        return num_cogs_hori
 
 
 class Col_Cog(Boost_Cog):
-    def get_influence(self,coords):
-        return map(
-            lambda t: coords + Coords(t[0],t[1]),
-            [(0,y) for y in itertools.chain(range(-NUM_COGS_VERT,0),range(1,NUM_COGS_VERT+1))]
-        )
+    line_axis = 1
+
+    @classmethod
+    def get_influence_offsets(cls, num_cogs_hori = NUM_COGS_HORI, num_cogs_vert = NUM_COGS_VERT):
+        return [(0,y) for y in itertools.chain(range(-num_cogs_vert,0),range(1,num_cogs_vert+1))]
 
     def get_abbr(self):
         return "|"
 
-    def get_max_oob_neighbors(self):
-        return NUM_COGS_VERT
+    def get_max_oob_neighbors(self, num_cogs_hori = NUM_COGS_HORI, num_cogs_vert = NUM_COGS_VERT):
+        return num_cogs_vert
 
 
 class Omni_Cog(Boost_Cog):
-    def get_influence(self,coords):
-        return map(
-            lambda t: coords + Coords(t[0], t[1]),
-            [(-2, -2), (-2, 2), (2, -2), (2, 2)]
-        )
+    influence_offsets = [(-2, -2), (-2, 2), (2, -2), (2, 2)]
+
     def get_abbr(self):
         return "*"
 
-    def get_max_oob_neighbors(self):
+    def get_max_oob_neighbors(self, num_cogs_hori = NUM_COGS_HORI, num_cogs_vert = NUM_COGS_VERT):
         return 2
\ No newline at end of file
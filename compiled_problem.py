@@ -0,0 +1,188 @@
+"""
+Cogstruction: Optimizing cog arrays in Legends of Idleon
+    Copyright (C) 2021 Michael P. Lane
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+"""
+
+import json
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from batch_evaluator import Batch_Evaluator
+from learning_algo import build_problem
+from reproduction_engine import Reproduction_Engine
+
+COMPILED_PROBLEM_VERSION = 1
+ALIGNMENT = 64
+EVALUATOR_PROPERTIES = (
+    ("build_rates", "build_rate"),
+    ("flaggy_rates", "flaggy_rate"),
+    ("exp_mults", "exp_mult"),
+    ("build_rate_boosts", "build_rate_boost"),
+    ("flaggy_rate_boosts", "flaggy_rate_boost"),
+    ("flaggy_speed_boosts", "flaggy_speed_boost")
+)
+
+"""
+- Everything a worker needs to breed and score genomes of one cog array template, as plain ndarrays: the cog property
+arrays and boost types of a `Batch_Evaluator', the influence tables of its boost types, the non-empty cells, the
+`excluded' matrix of a `Reproduction_Engine', the canonical indices of the `Cog_Registry' and the statistics of the
+cogs. See `compile_problem'.
+- `Batch_Evaluator.from_compiled' and `Reproduction_Engine.from_compiled' build from it without any `Cog',
+`Empties_Set' or `excludes_dict'.
+- `save' writes it to one uncompressed `.npz' file and `load' reads it back.
+- `publish' copies it into one block of shared memory. `attach' then builds a `Compiled_Problem' in another process
+whose ndarrays are read-only views of that block, so nothing is copied or pickled but a small `Problem_Handle'.
+"""
+class Compiled_Problem:
+    def __init__(self, arrays, shape, num_flaggies, shm = None):
+        self.arrays = arrays
+        self.shape = tuple(shape)
+        self.total_coords = self.shape[0] * self.shape[1]
+        self.num_flaggies = num_flaggies
+        self.num_cogs = len(arrays["type_ids"]) - 1
+        self._shm = shm
+
+    """
+    Returns the influence tables of the boost types, in the order of `type_ids', as `Compiled_Table's.
+    """
+    def get_tables(self):
+        tables = []
+        for type_id,line_axis in enumerate(self.arrays["line_axes"].tolist()):
+            if line_axis < 0:
+                tables.append(Compiled_Table(self.arrays["padded_%d" % type_id], None, None))
+            else:
+                tables.append(Compiled_Table(None, line_axis, self.arrays["lines_%d" % type_id]))
+        return tables
+
+    def save(self, path):
+        np.savez(path, metadata=np.array(json.dumps(self._get_metadata())), **self.arrays)
+        return self
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as npz:
+            arrays = {name: npz[name] for name in npz.files}
+        metadata = _check_metadata(json.loads(str(arrays.pop("metadata"))))
+        return cls(arrays, metadata["shape"], metadata["num_flaggies"])
+
+    """
+    - Copy the ndarrays into a new block of shared memory, and return the `Problem_Handle' with which other processes
+    `attach' to it. The block lives until the handle is `unlink'ed by this process.
+    """
+    def publish(self):
+        layout = []
+        offset = 0
+        for name,array in self.arrays.items():
+            layout.append((name, array.dtype.str, array.shape, offset))
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        shm = shared_memory.SharedMemory(create=True, size=max(1, offset))
+        for name,dtype,shape,offset in layout:
+            np.ndarray(shape, dtype, shm.buf, offset)[...] = self.arrays[name]
+        return Problem_Handle(shm, layout, self._get_metadata())
+
+    """
+    Returns a `Compiled_Problem' whose ndarrays are read-only views of the shared memory of `handle', see `publish'.
+    """
+    @classmethod
+    def attach(cls, handle):
+        metadata = _check_metadata(handle.metadata)
+        shm = shared_memory.SharedMemory(name=handle.name)
+        arrays = {}
+        for name,dtype,shape,offset in handle.layout:
+            array = np.ndarray(shape, dtype, shm.buf, offset)
+            array.flags.writeable = False
+            arrays[name] = array
+        return cls(arrays, metadata["shape"], metadata["num_flaggies"], shm)
+
+    def get_evaluator(self):
+        return Batch_Evaluator.from_compiled(self)
+
+    def get_engine(self, rng = None):
+        return Reproduction_Engine.from_compiled(self, rng)
+
+    def _get_metadata(self):
+        return {"version": COMPILED_PROBLEM_VERSION, "shape": list(self.shape), "num_flaggies": self.num_flaggies}
+
+"""
+The parts of an `Influence_Table' that `Batch_Evaluator' reads.
+"""
+class Compiled_Table:
+    def __init__(self, padded, line_axis, lines):
+        self.padded = padded
+        self.line_axis = line_axis
+        self.lines = lines
+
+"""
+- Names a `Compiled_Problem' published in shared memory, see `Compiled_Problem.publish'. It pickles to the name and the
+layout of the block only.
+- Only the process that published it should call `unlink'. Use as a context manager to unlink on exit.
+"""
+class Problem_Handle:
+    def __init__(self, shm, layout, metadata):
+        self.name = shm.name
+        self.layout = layout
+        self.metadata = metadata
+        self._shm = shm
+
+    def unlink(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+        return self
+
+    def __getstate__(self):
+        return {"name": self.name, "layout": self.layout, "metadata": self.metadata, "_shm": None}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.unlink()
+
+class Compiled_Problem_Error(RuntimeError):
+    pass
+
+"""
+- Returns the `Compiled_Problem' of the cog array template of `cogs' on `empties_set' with `flaggies', see
+`build_problem'.
+- The statistics of the cogs must be set, see `estimate_average_std_objs'.
+"""
+def compile_problem(cogs, empties_set, flaggies = None, cache = None):
+    registry, _, _, engine = build_problem(cogs, empties_set, flaggies, cache=cache)
+    evaluator = Batch_Evaluator(registry, empties_set, flaggies)
+    arrays = {name: registry.get_property(attr) for name,attr in EVALUATOR_PROPERTIES}
+    arrays["type_ids"] = evaluator.type_ids
+    arrays["line_axes"] = np.array(
+        [table.line_axis if table.line_axis is not None else -1 for table in evaluator.tables], dtype=np.intp
+    )
+    for type_id,table in enumerate(evaluator.tables):
+        if table.line_axis is None:
+            arrays["padded_%d" % type_id] = table.padded
+        else:
+            arrays["lines_%d" % type_id] = np.asarray(table.lines, dtype=np.intp)
+    arrays["flaggy_counts"] = np.array(evaluator.flaggy_counts, dtype=np.float64).reshape(
+        len(evaluator.tables), empties_set.total_coords
+    )
+    arrays["cells"] = empties_set.cells
+    arrays["excluded"] = engine.excluded
+    arrays["canonical_indices"] = registry.get_canonical_indices()
+    arrays["average_objs"] = np.array([cog.average_obj for cog in registry], dtype=np.float64)
+    arrays["std_objs"] = np.array([cog.std_obj for cog in registry], dtype=np.float64)
+    return Compiled_Problem(arrays, empties_set.shape, evaluator.num_flaggies)
+
+def _check_metadata(metadata):
+    if metadata["version"] != COMPILED_PROBLEM_VERSION:
+        raise Compiled_Problem_Error("The problem was compiled by an incompatible version.")
+    return metadata
@@ -23,8 +23,11 @@ class Coords:
         self.x = x
         self.y = y
 
-    def is_out_of_bounds(self):
-        return self.x < 0 or self.x >= NUM_COGS_HORI or self.y < 0 or self.y >= NUM_COGS_VERT
+    """
+    The board is `num_cogs_hori' by `num_cogs_vert', which defaults to the size of the in-game board.
+    """
+    def is_out_of_bounds(self, num_cogs_hori = NUM_COGS_HORI, num_cogs_vert = NUM_COGS_VERT):
+        return self.x < 0 or self.x >= num_cogs_hori or self.y < 0 or self.y >= num_cogs_vert
 
     def __copy__(self):
         return Coords(self.x,self.y)
@@ -0,0 +1,247 @@
+"""
+Cogstruction: Optimizing cog arrays in Legends of Idleon
+    Copyright (C) 2021 Michael P. Lane
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+"""
+
+import hashlib
+import os
+import pickle as pkl
+import tempfile
+from collections import OrderedDict
+
+from cog_array_stuff import get_excludes_dict
+from marginal_objs import get_average_std_objs
+
+CACHE_VERSION = 1
+CACHE_SUFFIX = ".pkl"
+
+"""
+- A directory of pickled values, each stored under the SHA-256 hash of its key, see `get_key'.
+- Entries live in the subdirectory `v<version>', so bumping `CACHE_VERSION' orphans every entry written by an older
+version of the code. Those are evicted like any other.
+- When the directory holds more than `max_bytes', the least recently used entries are deleted. `get' marks an entry as
+used by touching it. The directory is only walked when the bytes it held after the last walk, plus those put since,
+exceed `max_bytes', so entries put by other processes in the meantime are only counted at the next walk.
+- Entries are written to a temporary file that is then renamed, so that an interrupted run never leaves a truncated
+entry. An entry that cannot be read is deleted and treated as missing.
+"""
+class Disk_Cache:
+    def __init__(self, directory, max_bytes = 256 * 2**20, version = CACHE_VERSION):
+        self.root = directory
+        self.directory = os.path.join(directory, "v%d" % version)
+        self.max_bytes = max_bytes
+        self.version = version
+        self._total_bytes = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    """
+    - Returns a hex string that identifies `parts'. Each part should be built from tuples, strings and numbers, so that its
+    `repr' does not change between runs. See `Cog.get_signature' and `get_template_signature'.
+    """
+    def get_key(self, *parts):
+        return hashlib.sha256(repr((self.version,) + parts).encode()).hexdigest()
+
+    def get(self, key, default = None):
+        path = self._get_path(key)
+        try:
+            with open(path, "rb") as fh:
+                value = pkl.load(fh)
+        except FileNotFoundError:
+            return default
+        except (OSError, EOFError, pkl.UnpicklingError, AttributeError, ImportError):
+            self._remove(path)
+            return default
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key, value):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                pkl.dump(value, fh, pkl.HIGHEST_PROTOCOL)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, self._get_path(key))
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+        if self._total_bytes is not None:
+            self._total_bytes += size
+        if self._total_bytes is None or self._total_bytes > self.max_bytes:
+            self.evict()
+        return self
+
+    def __contains__(self, key):
+        return os.path.exists(self._get_path(key))
+
+    """
+    Delete the least recently used entries, of every version, until at most `max_bytes' are used.
+    """
+    def evict(self):
+        entries = []
+        for dirpath,_,filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(CACHE_SUFFIX):
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((dirpath == self.directory, stat.st_mtime, stat.st_size, path))
+        total = sum(entry[2] for entry in entries)
+        for _,_,size,path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+        self._total_bytes = total
+        return self
+
+    def clear(self):
+        for filename in os.listdir(self.directory):
+            self._remove(os.path.join(self.directory, filename))
+        self._total_bytes = None
+        return self
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+"""
+- An in-memory cache with the interface of `Disk_Cache', in front of the `Disk_Cache' `backing' if given. Values found in
+`backing' are kept in memory too, and values put are put in both.
+- Values are shared, not copied, so they must not be modified.
+- When it holds `max_entries' values, adding another evicts the least recently used one.
+"""
+class Memory_Cache:
+    def __init__(self, backing = None, max_entries = 1024, version = CACHE_VERSION):
+        self.backing = backing
+        self.max_entries = max_entries
+        self.version = backing.version if backing is not None else version
+        self._entries = OrderedDict()
+
+    def get_key(self, *parts):
+        return hashlib.sha256(repr((self.version,) + parts).encode()).hexdigest()
+
+    def get(self, key, default = None):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        if self.backing is None:
+            return default
+        value = self.backing.get(key)
+        if value is None:
+            return default
+        self._store(key, value)
+        return value
+
+    def put(self, key, value):
+        self._store(key, value)
+        if self.backing is not None:
+            self.backing.put(key, value)
+        return self
+
+    def __contains__(self, key):
+        return key in self._entries or (self.backing is not None and key in self.backing)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _store(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+"""
+The board shape, the empty `Coords' and the flaggy `Coords' of a cog array template.
+"""
+def get_template_signature(empties_set, flaggies = None):
+    return (
+        empties_set.shape,
+        tuple(sorted((coords.x, coords.y) for coords in empties_set.empties)),
+        tuple(sorted((coords.x, coords.y) for coords in (flaggies if flaggies is not None else ())))
+    )
+
+"""
+Load the influence tables of every type of `cog_types' for `empties_set' from `cache', building and storing the ones that
+are missing. See `Empties_Set.get_influence_table'.
+"""
+def load_influence_tables(cache, empties_set, cog_types):
+    template_signature = get_template_signature(empties_set)
+    for cog_type in cog_types:
+        if empties_set.has_influence_table(cog_type):
+            continue
+        key = cache.get_key("influence_table", template_signature, cog_type.__module__, cog_type.__name__)
+        table = cache.get(key)
+        if table is None:
+            cache.put(key, empties_set.get_influence_table(cog_type))
+        else:
+            empties_set.set_influence_table(cog_type, table)
+
+"""
+Like `get_excludes_dict', but read from `cache' if it was computed for the same board and the same `Boost_Cog' subtypes.
+"""
+def get_cached_excludes_dict(cache, empties_set, cogs):
+    key = cache.get_key(
+        "excludes_dict",
+        get_template_signature(empties_set),
+        tuple(sorted(set((type(cog).__module__, type(cog).__name__) for cog in cogs)))
+    )
+    excludes_dict = cache.get(key)
+    if excludes_dict is None:
+        excludes_dict = get_excludes_dict(empties_set, cogs)
+        cache.put(key, excludes_dict)
+    return excludes_dict
+
+"""
+- Like `get_average_std_objs', but each cog's statistics are read from `cache' if they were estimated for a cog with the
+same stats, on the same template, for the same objective. Only the others are estimated, and then stored. Cogs with the
+same stats are estimated once and get the same statistics.
+- `obj_key' identifies the objective function, for example a tuple of its weights. Two objective functions with the same
+`obj_key' must be equal.
+- The key of a cog does not include the rest of the inventory. Statistics estimated with a slightly different inventory
+are reused as they are, since the noise of the estimate is larger than the effect of a few other cogs.
+- The remaining arguments are passed to `get_average_std_objs'.
+"""
+def load_average_std_objs(cache, obj_key, engine, obj_fxn, batch_obj_fxn = None, evaluator = None, **kwargs):
+    template_signature = get_template_signature(engine.empties_set, engine.template.flaggies)
+    keys = [
+        cache.get_key("average_std_obj", cog.get_signature(), template_signature, obj_key)
+        for cog in engine.registry
+    ]
+    average_std_objs = {}
+    missing = {}
+    for i,key in enumerate(keys):
+        if key not in average_std_objs and key not in missing:
+            average_std_obj = cache.get(key)
+            if average_std_obj is None:
+                missing[key] = i
+            else:
+                average_std_objs[key] = average_std_obj
+    if len(missing) > 0:
+        get_average_std_objs(engine, obj_fxn, batch_obj_fxn, evaluator, cog_indices=list(missing.values()), **kwargs)
+        for key,i in missing.items():
+            cog = engine.registry.cogs[i]
+            average_std_objs[key] = (cog.average_obj, cog.std_obj)
+            cache.put(key, average_std_objs[key])
+    for cog,key in zip(engine.registry, keys):
+        cog.average_obj, cog.std_obj = average_std_objs[key]
+    return engine
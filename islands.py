@@ -0,0 +1,274 @@
+"""
+Cogstruction: Optimizing cog arrays in Legends of Idleon
+    Copyright (C) 2021 Michael P. Lane
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+"""
+
+import copy
+import multiprocessing
+import traceback
+
+import numpy as np
+
+from learning_algo import Population, estimate_average_std_objs, run_generation, build_problem
+from parallel_restarts import seed_worker, worker_output
+from strength_model import Strength_Model
+
+RING = "ring"
+FULLY_CONNECTED = "fully_connected"
+
+"""
+- The island model of `learning_algo'. `num_islands' populations of `pop_size' evolve in separate worker processes, each
+with its own `Reproduction_Engine' and `Strength_Model'. Every `migration_interval' generations each island sends copies
+of its `num_migrants' best cog arrays to its neighbours, which add them and cull back to `pop_size'.
+- `topology' is `RING', where island `i' sends to island `i+1', or `FULLY_CONNECTED', where every island sends to every
+other island.
+- If `share_strengths' is `True', then at every migration the normalized strengths of all islands are averaged, and every
+island continues from the average. Otherwise each island keeps its own.
+- Each island runs the generation loop of `controller' once; `controller.num_restarts' is ignored. Islands that stop
+early keep sending migrants until the last one stops.
+- Islands are seeded like the restarts of `parallel_learning_algo', so the result depends only on `seed'. Migrants are
+exchanged synchronously, so it does not depend on the speed of the workers either.
+- `obj_fxn', `batch_obj_fxn' and `fitness_memo' are sent to the workers, see `parallel_learning_algo'.
+- Returns the best cog array of all islands and its objective.
+"""
+def island_learning_algo(
+        cogs,
+        empties_set,
+        flaggies,
+        pop_size,
+        obj_fxn,
+        factor_base,
+        max_factor,
+        max_multiplier,
+        controller,
+        batch_obj_fxn=None,
+        num_islands=4,
+        migration_interval=10,
+        num_migrants=20,
+        topology=RING,
+        share_strengths=False,
+        seed=None,
+        cache=None,
+        obj_key=None,
+        fitness_memo=None,
+        reject_duplicates=False,
+        verbose=False
+):
+    if topology not in (RING, FULLY_CONNECTED):
+        raise ValueError("Unknown topology `%s'." % topology)
+    controller.print_init_info()
+
+    stats_seed, *island_seeds = np.random.SeedSequence(seed).spawn(num_islands + 1)
+    estimate_average_std_objs(
+        cogs, empties_set, flaggies, obj_fxn, batch_obj_fxn, np.random.default_rng(stats_seed), cache, obj_key
+    )
+
+    island_controller = copy.copy(controller)
+    island_controller.set_restart_info(1)
+    context = multiprocessing.get_context()
+    conns = []
+    processes = []
+    try:
+        for island_seed in island_seeds:
+            conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_island_main,
+                args=(
+                    child_conn,
+                    island_seed,
+                    cogs,
+                    empties_set,
+                    flaggies,
+                    pop_size,
+                    obj_fxn,
+                    factor_base,
+                    max_factor,
+                    max_multiplier,
+                    island_controller,
+                    batch_obj_fxn,
+                    cache,
+                    fitness_memo,
+                    reject_duplicates,
+                    verbose
+                ),
+                daemon=True
+            )
+            process.start()
+            child_conn.close()
+            conns.append(conn)
+            processes.append(process)
+
+        emigrants = [None] * num_islands
+        strengths = None
+        generation_count = 0
+        while True:
+            for conn,immigrants in zip(conns, _route(emigrants, topology)):
+                conn.send(("run", migration_interval, num_migrants, immigrants, strengths, share_strengths))
+            replies = [_receive(conn) for conn in conns]
+            generation_count += migration_interval
+            emigrants = [(genomes, rates) for _,genomes,rates,_,_ in replies]
+            if share_strengths:
+                strengths = np.mean([reply[3] for reply in replies], axis=0)
+            best_values = [reply[4] for reply in replies]
+            print("Generation:                           %d" % generation_count)
+            print("Best per island:                      %s" % " ".join("%.4f" % value for value in best_values))
+            if all(reply[0] for reply in replies):
+                break
+
+        best_island = int(np.argmax(best_values))
+        conns[best_island].send(("best",))
+        controller.best = _receive(conns[best_island])
+        controller.restart_count = 1
+    finally:
+        for conn in conns:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+        for process in processes:
+            process.join()
+
+    print("Best:                                 %.4f" % controller.best[1])
+    return controller.best
+
+class Island_Error(RuntimeError):
+    pass
+
+"""
+Returns, for each island, the migrants it receives, or `None'.
+"""
+def _route(emigrants, topology):
+    if emigrants[0] is None:
+        return emigrants
+    num_islands = len(emigrants)
+    if topology == RING:
+        return [emigrants[i-1] for i in range(num_islands)]
+    return [
+        tuple(np.concatenate([emigrants[j][k] for j in range(num_islands) if j != i]) for k in range(2))
+        for i in range(num_islands)
+    ]
+
+def _receive(conn):
+    status, reply = conn.recv()
+    if status == "error":
+        raise Island_Error("An island failed:\n%s" % reply)
+    return reply
+
+"""
+One island, see `island_learning_algo'.
+"""
+class _Island:
+    def __init__(
+            self,
+            island_seed,
+            cogs,
+            empties_set,
+            flaggies,
+            pop_size,
+            obj_fxn,
+            factor_base,
+            max_factor,
+            max_multiplier,
+            controller,
+            batch_obj_fxn,
+            cache,
+            fitness_memo,
+            reject_duplicates
+    ):
+        self.factor_base = factor_base
+        self.max_factor = max_factor
+        self.max_multiplier = max_multiplier
+        self.controller = controller
+        self.done = False
+
+        rng = seed_worker(island_seed)
+        registry, template, evaluator, self.engine = build_problem(
+            cogs, empties_set, flaggies, batch_obj_fxn, rng, cache
+        )
+        self.average_objs = np.array([cog.get_average_std_obj()[0] for cog in registry])
+        self.std_objs = np.array([cog.get_average_std_obj()[1] for cog in registry])
+        self.strength_model = Strength_Model(registry, empties_set).instantiate()
+
+        self.controller.restart_loop()
+        self.pop = Population.from_genomes(
+            template,
+            self.engine.random_genomes(pop_size),
+            obj_fxn,
+            batch_obj_fxn,
+            evaluator,
+            fitness_memo,
+            reject_duplicates
+        )
+        self.controller.set_pop(self.pop)
+        self.controller.print_restart_status_open()
+
+    """
+    - Add `immigrants', continue from the averaged `strengths' if given, then run up to `num_generations' generations.
+    - Returns whether the island has stopped, the genomes and rates vectors of its `num_migrants' best cog arrays, its
+    normalized strengths if `share_strengths' is `True', and its best objective.
+    """
+    def run(self, num_generations, num_migrants, immigrants, strengths, share_strengths):
+        if not self.done:
+            if immigrants is not None:
+                self.pop.extend_genomes(*immigrants)
+                self.pop.cull()
+            if strengths is not None:
+                self.strength_model.restore(
+                    strengths, np.ones(len(strengths)), self.strength_model.strength_start_value
+                )
+            for _ in range(num_generations):
+                if not self.controller.generation_loop():
+                    self.done = True
+                    self.strength_model.write_to_cogs()
+                    self.controller.print_restart_status_close()
+                    break
+                self.controller.print_generation_status()
+                run_generation(
+                    self.engine,
+                    self.pop,
+                    self.controller,
+                    self.strength_model,
+                    self.factor_base,
+                    self.max_factor,
+                    self.max_multiplier,
+                    self.average_objs,
+                    self.std_objs
+                )
+        top = np.argsort(-self.pop.values, kind="stable")[:num_migrants]
+        return (
+            self.done,
+            self.pop.genomes[top],
+            self.pop.rates[top],
+            self.strength_model.get_strengths() if share_strengths else None,
+            self.pop.get_best_value()
+        )
+
+def _island_main(conn, island_seed, *args):
+    verbose = args[-1]
+    with worker_output(verbose):
+        island = None
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            try:
+                if island is None:
+                    island = _Island(island_seed, *args[:-1])
+                if message[0] == "run":
+                    reply = island.run(*message[1:])
+                else:
+                    reply = island.pop.get_best()
+                conn.send(("ok", reply))
+            except Exception:
+                conn.send(("error", traceback.format_exc()))
+    conn.close()
@@ -13,18 +13,23 @@ Cogstruction: Optimizing cog arrays in Legends of Idleon
     GNU General Public License for more details.
 """
 
-import copy
 import random
+from collections import OrderedDict
 import numpy as np
-import pickle as pkl
 import time
 
-from cog_array_stuff import get_excludes_dict, Cog_Array
+from batch_evaluator import Batch_Evaluator, NUM_RATES, get_components
+from cog_array_stuff import get_excludes_dict, Cog_Array, Cog_Registry, EMPTY_CELL, GENOME_DTYPE
+from disk_cache import get_cached_excludes_dict, load_average_std_objs, load_influence_tables
+from local_search import Swap_Local_Search, polish_population
+from marginal_objs import get_average_std_objs
+from reproduction_engine import Reproduction_Engine, ONE_POINT_MUTATION, TWO_POINT_MUTATION
+from strength_model import Strength_Model
 from constants import ONE_SIG_PROB, EARLY_STOP_FACTOR
 
 """
 - This singleton controls the loops of the genetic algorithm. 
-- It also controls if the genetic algorithm should do a cross breed or a one-point-mutation.
+- It also holds the probabilities of a cross breed and of each mutation, which `Reproduction_Engine.breed' draws from.
 - It also prints status info.
 """
 class Iteration_Controller:
@@ -34,6 +39,11 @@ class Iteration_Controller:
         self.num_restarts = None
         self.restart_count = 0
 
+        self.max_seconds = None
+        self.max_evaluations = None
+        self.start_time = None
+        self.evaluation_count = 0
+
         self.max_generations = None
         self.min_generations = None
         self.max_running_total_len = None
@@ -43,16 +53,14 @@ class Iteration_Controller:
         self.generation_count = 0
         self.previous_best_improve = 0
 
-        self.orig_pop = None
+        self.orig_values = None
         self.curr_pop = None
 
         self.num_mutations = None
-        self.mutation_count = 0
 
         self.prob_cross_breed = None
         self.prob_one_point_mutation = None
         self.prob_two_point_mutation = None
-        self.cross_breed_count = 0
 
     """
     `num_restarts' in the number of random restarts.
@@ -75,35 +83,58 @@ class Iteration_Controller:
         return self
 
     """
-    - `num_mutations' is how many mutations to do per generation.
-    - `prob_cross_breed' is the probability of calling `Cog_Array.cross_breed'; likewise `1-prob_cross_breed' is the
-    probability of calling `Cog_Array.one_point_mutation'.
+    `num_mutations' is how many children to breed per generation.
     """
     def set_mutation_info(self, num_mutations):
         self.num_mutations = num_mutations
         return self
 
+    """
+    A child is cross-bred with probability `prob_cross_breed', one-point mutated with probability
+    `prob_one_point_mutation' and two-point mutated otherwise, see `Reproduction_Engine.breed'.
+    """
     def set_breeding_scheme_info(self, prob_cross_breed, prob_one_point_mutation, prob_two_point_mutation):
         self.prob_cross_breed = prob_cross_breed
         self.prob_one_point_mutation = prob_one_point_mutation
         self.prob_two_point_mutation = prob_two_point_mutation
         return self
 
+    """
+    - Once `max_seconds' have passed since the first restart began, or `max_evaluations' cog arrays have been scored (see
+    `Population.num_evaluated'), the current generation loop stops and no other restart begins. Either may be `None'.
+    - The first restart always runs its first generation, so that there is a result.
+    """
+    def set_budget_info(self, max_seconds = None, max_evaluations = None):
+        self.max_seconds = max_seconds
+        self.max_evaluations = max_evaluations
+        return self
+
+    def get_num_evaluated(self):
+        return self.evaluation_count + (self.curr_pop.num_evaluated if self.curr_pop is not None else 0)
+
+    def budget_exhausted(self):
+        return (
+            (
+                self.max_seconds is not None and self.start_time is not None and
+                time.monotonic() - self.start_time >= self.max_seconds
+            ) or
+            (self.max_evaluations is not None and self.get_num_evaluated() >= self.max_evaluations)
+        )
+
+    """
+    Only the sorted objectives of the original population are kept, for the `*_improve_from_original' methods.
+    """
     def set_pop(self,pop):
-        self.orig_pop = copy.copy(pop)
+        self.orig_values = pop.get_sorted_values()
+        if self.curr_pop is not None and self.curr_pop is not pop:
+            self.evaluation_count += self.curr_pop.num_evaluated
         self.curr_pop = pop
         return self
 
-    def mutation_loop(self):
-        if self.mutation_count >= self.num_mutations:
-            self.cross_breed_count = 0
-            self.mutation_count = 0
-            return False
-        else:
-            self.mutation_count+=1
-            return True
-
     def generation_loop(self):
+        if self.generation_count > 0 and self.budget_exhausted():
+            self.generation_count = 0
+            return False
         if ((
                 self.generation_count <= (self.max_generations - self.min_generations) * EARLY_STOP_FACTOR + self.min_generations or
                 self.curr_running_total_len <= self.max_running_total_len
@@ -126,24 +157,17 @@ class Iteration_Controller:
             return False
 
     def restart_loop(self):
-        if self.restart_count < self.num_restarts:
+        if self.start_time is None:
+            self.start_time = time.monotonic()
+        if self.restart_count < self.num_restarts and not (self.restart_count > 0 and self.budget_exhausted()):
             self.restart_count+=1
             return True
         else:
             return False
 
-    def breeding_scheme(self):
-        rand = random.uniform(0,1)
-        if rand >= 1-self.prob_cross_breed:
-            return "cross_breed"
-        elif rand >= 1-self.prob_cross_breed - self.prob_one_point_mutation:
-            return "one_point_mutation"
-        else:
-            return "two_point_mutation"
-
     def print_restart_status_open(self):
         print("Restart:                              %d" % (self.restart_count-1))
-        print("Pop size:                             %d" % self.orig_pop.get_size())
+        print("Pop size:                             %d" % len(self.orig_values))
 
     def print_generation_status(self):
         if self.generation_count % 10 == 1:
@@ -153,13 +177,13 @@ class Iteration_Controller:
                 print("\t\t90th %%ile improvement from original: %1.3f%%" % ((self.perc_improve_from_original(0.90)-1)*100))
                 print("\t\t50th %%ile improvement from original: %1.3f%%" % ((self.perc_improve_from_original(0.50)-1)*100))
                 print(self.curr_pop.get_best()[0].str_with_abbr())
-                # print("\t\t%% cross-breeds:                      %d%%\n" % int(100*self.cross_breed_count/self.mutation_count))
 
     def perc_improve_from_original(self,perc):
-        return self.curr_pop.get_percentile(perc)[1] / self.orig_pop.get_percentile(perc)[1]
+        orig_value = self.orig_values[int((1-perc)*len(self.orig_values))]
+        return self.curr_pop.get_percentile_value(perc) / orig_value
 
     def best_improve_from_original(self):
-        return self.curr_pop.get_best()[1] / self.orig_pop.get_best()[1]
+        return self.curr_pop.get_best_value() / self.orig_values[0]
 
     def print_restart_status_close(self):
         if self.restart_count == 1:
@@ -176,34 +200,174 @@ class Iteration_Controller:
         print("MIN_GENERATION: %d" % self.min_generations)
         print("MAX_GENERATION: %d" % self.max_generations)
 
+"""
+- A bounded map from genome keys (see `Population') to objectives and rates vectors. When it holds `max_size' entries,
+adding another evicts the least recently used one.
+- `hits' and `misses' count the lookups by `get'.
+- There should be one `Fitness_Memo' per cog array template and objective function.
+"""
+class Fitness_Memo:
+    def __init__(self, max_size = 2**16):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    """
+    Returns the entry of `key', or `None'.
+    """
+    def get(self, key):
+        try:
+            entry = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return self
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
 """
 - A population of `Cog_Arrays'.
+- The population is stored as a matrix `genomes' of shape `(capacity, total_coords)', one `Cog_Array.genome' per row,
+a float64 vector `values' of objectives and a matrix `rates' of rates vectors (see `Cog_Array.get_rates'). A row of
+`rates' is `nan' if those rates are unknown. Only the first `get_size()' rows are in use.
+- All `Cog_Arrays' of a population share a template (see `Cog_Array.with_genome'). Their spares are implicitly every
+registered cog that is not placed.
+- `Cog_Arrays' returned by the methods below are views, built from `genomes' on demand. Their rates are cached if
+known, so that their mutations can be scored incrementally (see `Cog_Array._inherit_rates').
+- If `batch_obj_fxn' is given, then `evaluator' must be a `Batch_Evaluator'. `batch_obj_fxn' takes ndarrays of build
+rates, flaggy rates and exp multipliers and returns the objectives. It is then used instead of `obj_fxn' whenever
+several arrays are scored at once.
+- If `memo' is a `Fitness_Memo' or a `Shared_Fitness_Table', then arrays found in it are not evaluated again.
+- If `reject_duplicates' is `True', then an array that is already in the population, or that is interchangeable with one
+that is (see `Cog_Registry.get_canonical_indices'), is scored but not added. `num_rejected' counts them.
+- `num_evaluated' counts the arrays scored for the population, including those scored by an `Offspring_Pool' but not
+those found in `memo' or given with known objectives, see `from_rows'.
 """
 class Population:
-    def __init__(self,arrays,obj_fxn):
-        self.arrays = arrays
-        self.obj_fxn = obj_fxn
-        self.values = list(map(self.obj_fxn,self.arrays))
-        self.is_sorted = False
-        self.pop_size = len(arrays)
+    def __init__(self,arrays,obj_fxn,batch_obj_fxn=None,evaluator=None,memo=None,reject_duplicates=False):
+        self._allocate(arrays[0],len(arrays),obj_fxn,batch_obj_fxn,evaluator,memo,reject_duplicates)
+        self.extend(arrays)
+
+    """
+    - Returns a new `Population' of the rows of the genome matrix `genomes', see `Cog_Array.with_genome'. It is cheaper
+    than building a `Cog_Array' per row, for example for the output of `Reproduction_Engine.random_genomes'.
+    - `template' must have every cog of the genomes registered.
+    """
+    @classmethod
+    def from_genomes(
+            cls,template,genomes,obj_fxn,batch_obj_fxn=None,evaluator=None,memo=None,reject_duplicates=False
+    ):
+        pop = cls.__new__(cls)
+        pop._allocate(template,len(genomes),obj_fxn,batch_obj_fxn,evaluator,memo,reject_duplicates)
+        pop.extend_genomes(genomes)
+        return pop
+
+    """
+    Like `Population.from_genomes', but with known objectives `values' and rates vectors `rates', which are not
+    evaluated again.
+    """
+    @classmethod
+    def from_rows(
+            cls,template,genomes,values,rates,obj_fxn,batch_obj_fxn=None,evaluator=None,memo=None,
+            reject_duplicates=False
+    ):
+        pop = cls.__new__(cls)
+        pop._allocate(template,len(genomes),obj_fxn,batch_obj_fxn,evaluator,memo,reject_duplicates)
+        pop._extend(genomes,values,rates)
+        if reject_duplicates:
+            pop._member_keys = set(pop._get_keys(pop.genomes))
+        return pop
+
+    @property
+    def genomes(self):
+        return self._genomes[:self._size]
+
+    @property
+    def values(self):
+        return self._values[:self._size]
+
+    @property
+    def rates(self):
+        return self._rates[:self._size]
+
+    @property
+    def arrays(self):
+        return [self.get_array(i) for i in range(self._size)]
 
     def add(self,array):
-        self.arrays.append(array)
-        self.values.append(self.obj_fxn(array))
-        self.is_sorted = False
-        return array, self.values[-1]
+        value = self.extend([array])[0]
+        return array, value
 
+    """
+    - Add several `Cog_Arrays' at once. Returns an ndarray of their objectives.
+    - With `batch_obj_fxn', only the arrays whose rates are not cached are evaluated.
+    """
+    def extend(self,arrays):
+        if len(arrays) == 0:
+            return np.empty(0)
+        genomes = np.stack([array._get_genome_in(self.template.registry) for array in arrays])
+        return self._add_rows(genomes, self._get_cached_rates(arrays), arrays)
+
+    """
+    - Add the rows of the genome matrix `genomes'. Returns an ndarray of their objectives, including those of rejected
+    duplicates.
+    - `rates' is an optional matrix of known rates vectors of `genomes'; rows that are `nan' are evaluated.
+    - Without `batch_obj_fxn', each row is scored by `obj_fxn' through a view (see `Cog_Array.with_genome').
+    """
+    def extend_genomes(self,genomes,rates=None):
+        return self._add_rows(genomes, rates)
+
+    """
+    - Like `extend_genomes', but with known objectives `values' and rates vectors `rates', which are not evaluated again.
+    - `num_evaluated' is how many of the rows were scored elsewhere for this population, for example by an
+    `Offspring_Pool', and is added to `self.num_evaluated'.
+    """
+    def extend_rows(self,genomes,values,rates,num_evaluated = 0):
+        self.num_evaluated += num_evaluated
+        return self._add_rows(genomes, rates, values=values)
+
+    """
+    - Keep only the `pop_size' rows with the highest objective. Uses a partial sort, so `self' is not sorted afterwards.
+    """
     def cull(self,pop_size = None):
-        self.sort()
         N = self.pop_size if pop_size is None else pop_size
-        self.arrays = self.arrays[:N]
-        self.values = self.values[:N]
+        if N < self._size:
+            self._reorder(np.argpartition(-self.values, N-1)[:N])
+            self.is_sorted = False
+        return self
 
     def sample(self,k=1):
-        return random.sample(list(zip(self.arrays,self.values)),k)
+        return [(self.get_array(i), float(self._values[i])) for i in self.sample_indices(k)]
+
+    def sample_indices(self,k=1):
+        return random.sample(range(self._size),k)
+
+    def get_array(self,i):
+        array = self.template.with_genome(self._genomes[i])
+        if not np.isnan(self._rates[i,0]):
+            array.set_cached_rates(self._rates[i])
+        return array
 
     def get_best(self):
-        return self.sort().arrays[0],self.values[0]
+        i = self._get_best_index()
+        return self.get_array(i),float(self._values[i])
+
+    def get_best_value(self):
+        return float(self._values[self._get_best_index()])
 
     def get_mean(self):
         return np.mean(self.values)
@@ -212,29 +376,267 @@ class Population:
         return self.get_percentile(0.50)
 
     def get_percentile(self,perc):
-        self.sort()
-        i = int((1-perc)*self.get_size())
-        return self.arrays[i],self.values[i]
+        i = self._get_percentile_index(perc)
+        return self.get_array(i),float(self._values[i])
+
+    def get_percentile_value(self,perc):
+        return float(self._values[self._get_percentile_index(perc)])
 
     def get_perc_std(self):
-        return self.get_percentile(0.50 + ONE_SIG_PROB)[1] - self.get_median()[1]
+        return self.get_percentile_value(0.50 + ONE_SIG_PROB) - self.get_percentile_value(0.50)
 
     def get_z_score(self,other):
-        return (other.get_median()[1] - self.get_median()[1])/self.get_perc_std()
+        return (other.get_percentile_value(0.50) - self.get_percentile_value(0.50))/self.get_perc_std()
 
     def sort(self):
         if not self.is_sorted:
-            sorted_pairs = sorted(zip(self.values, self.arrays),key=lambda t:-t[0])
-            self.values = [v for (v,_) in sorted_pairs]
-            self.arrays = [a for (_,a) in sorted_pairs]
+            self._reorder(np.argsort(-self.values, kind="stable"))
             self.is_sorted = True
         return self
 
+    """
+    Returns a copy of `self.values', sorted from highest to lowest.
+    """
+    def get_sorted_values(self):
+        return -np.sort(-self.values)
+
     def get_size(self):
-        return len(self.arrays)
+        return self._size
 
     def __copy__(self):
-        return Population([copy.copy(array) for array in self.arrays], self.obj_fxn)
+        pop = type(self).__new__(type(self))
+        pop.template = self.template
+        pop.obj_fxn = self.obj_fxn
+        pop.batch_obj_fxn = self.batch_obj_fxn
+        pop.evaluator = self.evaluator
+        pop.memo = self.memo
+        pop.reject_duplicates = self.reject_duplicates
+        pop.num_rejected = self.num_rejected
+        pop.num_evaluated = self.num_evaluated
+        pop._member_keys = set(self._member_keys)
+        pop.pop_size = self.pop_size
+        pop._size = self._size
+        pop._genomes = self._genomes.copy()
+        pop._values = self._values.copy()
+        pop._rates = self._rates.copy()
+        pop.is_sorted = self.is_sorted
+        return pop
+
+    def _allocate(self,template,pop_size,obj_fxn,batch_obj_fxn,evaluator,memo,reject_duplicates):
+        self.template = template
+        self.obj_fxn = obj_fxn
+        self.batch_obj_fxn = batch_obj_fxn
+        self.evaluator = evaluator
+        self.memo = memo
+        self.reject_duplicates = reject_duplicates
+        self.num_rejected = 0
+        self.num_evaluated = 0
+        self._member_keys = set()
+        self.pop_size = pop_size
+        self._size = 0
+        self._genomes = np.empty((2 * self.pop_size, self.template.empties_set.total_coords), dtype=GENOME_DTYPE)
+        self._values = np.empty(2 * self.pop_size, dtype=np.float64)
+        self._rates = np.empty((2 * self.pop_size, NUM_RATES), dtype=np.float64)
+        self.is_sorted = False
+
+    def _get_best_index(self):
+        if self.is_sorted:
+            return 0
+        return int(np.argmax(self.values))
+
+    """
+    The index of the `(1-perc)*get_size()'-th highest objective, found with a partial sort.
+    """
+    def _get_percentile_index(self,perc):
+        i = int((1-perc)*self.get_size())
+        if self.is_sorted:
+            return i
+        return int(np.argpartition(-self.values, i)[i])
+
+    def _get_cached_rates(self,arrays):
+        rates = np.full((len(arrays), NUM_RATES), np.nan)
+        for i,array in enumerate(arrays):
+            array_rates = array.get_cached_rates()
+            if array_rates is not None:
+                rates[i] = array_rates
+        return rates
+
+    """
+    Keep only the rows `indices', in that order.
+    """
+    def _reorder(self,indices):
+        N = len(indices)
+        self._genomes[:N] = self._genomes[indices]
+        self._values[:N] = self._values[indices]
+        self._rates[:N] = self._rates[indices]
+        self._size = N
+        if self.reject_duplicates:
+            self._member_keys = set(self._get_keys(self.genomes))
+
+    """
+    - Returns a list of hashable keys of the rows of `genomes', equal for interchangeable genomes, see
+    `Cog_Registry.get_canonical_indices'.
+    """
+    def _get_keys(self,genomes):
+        return [genome.tobytes() for genome in self.template.registry.get_canonical_indices()[genomes]]
+
+    """
+    Score the rows of `genomes' whose `values' are not known, looking them up in `self.memo' first, and add those that are
+    not rejected.
+    """
+    def _add_rows(self,genomes,rates=None,arrays=None,values=None):
+        N = len(genomes)
+        rates = np.full((N, NUM_RATES), np.nan) if rates is None else np.array(rates, dtype=np.float64)
+        known = values is not None
+        values = np.array(values, dtype=np.float64) if known else np.full(N, np.nan)
+        keys = self._get_keys(genomes) if self.memo is not None or self.reject_duplicates else None
+        if self.memo is not None and not known:
+            for k,key in enumerate(keys):
+                entry = self.memo.get(key)
+                if entry is not None:
+                    values[k], rates[k] = entry
+        rows = np.flatnonzero(np.isnan(values))
+        self.num_evaluated += len(rows)
+        if len(rows) > 0:
+            values[rows], rates[rows] = self._evaluate(
+                genomes[rows], rates[rows], [arrays[k] for k in rows] if arrays is not None else None
+            )
+            if self.memo is not None:
+                for k in rows:
+                    self.memo.put(keys[k], (values[k], rates[k].copy()))
+        if self.reject_duplicates:
+            keep = np.ones(N, dtype=bool)
+            for k,key in enumerate(keys):
+                if key in self._member_keys:
+                    keep[k] = False
+                else:
+                    self._member_keys.add(key)
+            self.num_rejected += N - int(np.count_nonzero(keep))
+            self._extend(genomes[keep], values[keep], rates[keep])
+        else:
+            self._extend(genomes, values, rates)
+        return values
+
+    """
+    - Returns the objectives and rates vectors of the rows of `genomes'. Rows of `rates' that are not `nan' are known.
+    - Without `batch_obj_fxn', `arrays' are scored if given, and otherwise views of `genomes'.
+    """
+    def _evaluate(self,genomes,rates,arrays=None):
+        if self.batch_obj_fxn is None:
+            if arrays is None:
+                arrays = [self.template.with_genome(genome) for genome in genomes]
+                for array,array_rates in zip(arrays,rates):
+                    if not np.isnan(array_rates[0]):
+                        array.set_cached_rates(array_rates)
+            values = np.array([self.obj_fxn(array) for array in arrays], dtype=np.float64)
+            return values, self._get_cached_rates(arrays)
+        unknown = np.isnan(rates[:,0])
+        if np.any(unknown):
+            rates[unknown] = self.evaluator.evaluate_rates(genomes[unknown])
+        return np.asarray(self.batch_obj_fxn(*get_components(rates)), dtype=np.float64), rates
+
+    def _extend(self,genomes,values,rates):
+        new_size = self._size + len(values)
+        if new_size > len(self._values):
+            capacity = max(new_size, 2 * len(self._values))
+            self._genomes = _resize(self._genomes, self._size, capacity)
+            self._values = _resize(self._values, self._size, capacity)
+            self._rates = _resize(self._rates, self._size, capacity)
+        self._genomes[self._size:new_size] = genomes
+        self._values[self._size:new_size] = values
+        self._rates[self._size:new_size] = rates
+        self._size = new_size
+        self.is_sorted = False
+        return values
+
+"""
+Returns a new buffer with `capacity' rows whose first `size' rows are copied from `buffer'.
+"""
+def _resize(buffer, size, capacity):
+    new_buffer = np.empty((capacity,) + buffer.shape[1:], dtype=buffer.dtype)
+    new_buffer[:size] = buffer[:size]
+    return new_buffer
+
+"""
+- Buffer the strength updates earned by the mutated children of `offspring' in `strength_model'.
+- `old_genomes', `old_objs' and `new_objs' are the genomes and objectives of the first parents and of the children.
+- A two-point mutation that did better than its parent moves strength of both cogs towards their new coords. A one-point
+mutation moves strength of the new cog towards its coords, and of the old cog away from them, by the z-score of the
+improvement against `average_objs' and `std_objs'. Updates whose factor cannot be computed are skipped.
+"""
+def _update_strengths(strength_model, offspring, old_genomes, old_objs, new_objs, factor_base, average_objs, std_objs):
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        rows = np.flatnonzero(offspring.schemes == TWO_POINT_MUTATION)
+        cells1, cells2 = offspring.cells[rows,0], offspring.cells[rows,1]
+        cogs1 = old_genomes[rows, cells1].astype(np.intp)
+        cogs2 = old_genomes[rows, cells2].astype(np.intp)
+        prop_new = new_objs[rows] / (old_objs[rows] + new_objs[rows])
+        num_occupied = np.count_nonzero(old_genomes[rows] != EMPTY_CELL, axis=1)
+        factors = factor_base ** ((prop_new - 1/2) * num_occupied)
+        keep = (cogs1 != EMPTY_CELL) & (cogs2 != EMPTY_CELL)
+        cogs1, cogs2, cells1, cells2, factors = cogs1[keep], cogs2[keep], cells1[keep], cells2[keep], factors[keep]
+        strength_model.update_strengths(
+            np.concatenate((cogs1, cogs1, cogs2, cogs2)),
+            np.concatenate((cells2, cells1, cells1, cells2)),
+            np.concatenate((factors, 1/factors, factors, 1/factors))
+        )
+
+        rows = np.flatnonzero(offspring.schemes == ONE_POINT_MUTATION)
+        cells = offspring.cells[rows,0]
+        old_cogs = offspring.old_cogs[rows]
+        new_cogs = offspring.genomes[rows, cells].astype(np.intp)
+        keep = (old_cogs != EMPTY_CELL) & (new_cogs != EMPTY_CELL)
+        rows, cells, old_cogs, new_cogs = rows[keep], cells[keep], old_cogs[keep], new_cogs[keep]
+        median_diff = average_objs[new_cogs] - average_objs[old_cogs]
+        std_diff = np.sqrt(std_objs[new_cogs] ** 2 + std_objs[old_cogs] ** 2)
+        z_scores = (new_objs[rows] - old_objs[rows] - median_diff) / std_diff
+        factors = factor_base ** z_scores
+        strength_model.update_strengths(
+            np.concatenate((old_cogs, new_cogs)),
+            np.concatenate((cells, cells)),
+            np.concatenate((1/factors, factors))
+        )
+
+"""
+- One generation of `learning_algo': breed `controller.num_mutations' children of `pop', add them, update the strengths
+of `strength_model' by their outcomes, then cull `pop' back to its size.
+- If `offspring_pool' is an `Offspring_Pool', then the children are bred and scored by its workers, from seeds drawn
+from `engine.rng'.
+"""
+def run_generation(
+        engine,
+        pop,
+        controller,
+        strength_model,
+        factor_base,
+        max_factor,
+        max_multiplier,
+        average_objs,
+        std_objs,
+        offspring_pool = None
+):
+    breed_args = (
+        pop.genomes,
+        controller.num_mutations,
+        controller.prob_cross_breed,
+        controller.prob_one_point_mutation,
+        strength_model.get_strengths()
+    )
+    if offspring_pool is None:
+        offspring = engine.breed(*breed_args)
+    else:
+        offspring, values, rates, num_evaluated = offspring_pool.breed(*breed_args, engine.rng)
+    old_genomes = pop.genomes[offspring.parents[:,0]]
+    old_objs = pop.values[offspring.parents[:,0]]
+    if offspring_pool is None:
+        new_objs = pop.extend_genomes(offspring.genomes)
+    else:
+        new_objs = pop.extend_rows(offspring.genomes, values, rates, num_evaluated)
+    _update_strengths(
+        strength_model, offspring, old_genomes, old_objs, new_objs, factor_base, average_objs, std_objs
+    )
+    strength_model.apply_updates(max_factor, max_multiplier)
+    return pop.cull()
 
 """
 The genetic algorithm.
@@ -246,10 +648,30 @@ The genetic algorithm.
     - pop_size: The initial population size. This is also the population size after each mutation loop terminates.
     - obj_fxn: The objective function, takes input `Cog_Array' and outputs a positive `float'.
     - factor_base: A float greater than 1. A smaller float corresponds to smaller `factors' passed to 
-    `Cog.update_strengths', a larger float to larger `factors'.
+    `Cog.update_strengths', a larger float to larger `factors'. The strengths are kept in a `Strength_Model' and written
+    back to the cogs at the end of each restart.
     - max_factor: See `Cog.update_strengths'.
     - max_multiplier: See `Cog.update_strengths'.
     - controller: A singleton of class `Iteration_Controller'.
+    - batch_obj_fxn: Optional. Takes ndarrays of build rates, flaggy rates and exp multipliers and outputs the
+    objectives. It must agree with `obj_fxn'. If given, whole populations and whole generations of children are scored
+    at once by a `Batch_Evaluator'.
+    - rng: Optional. The NumPy `Generator' from which each starting population and each generation of children is drawn
+    by a `Reproduction_Engine'. The random cog arrays of `get_average_std_objs' are drawn from it as well.
+    - cache: Optional. A `Disk_Cache' for the influence tables, `excludes_dict' and, if `obj_key' is given, the
+    statistics of `get_average_std_objs'. Repeated runs on the same inventory then skip this preprocessing.
+    - obj_key: Optional. Identifies `obj_fxn' in `cache', for example a tuple of its weights.
+    - checkpointer: Optional. A `Checkpointer' that periodically saves the state of the run. If its checkpoint exists,
+    then the run resumes from it instead of starting over. The checkpoint is removed once the run completes.
+    - fitness_memo: Optional. A `Fitness_Memo' shared by the populations of all restarts, see `Population'. A
+    `Shared_Fitness_Table' may be used instead, to share objectives with other processes and later runs.
+    - reject_duplicates: Optional. If `True', then children that are already in the population are not added, see
+    `Population'.
+    - offspring_pool: Optional. An `Offspring_Pool' whose workers breed and score each generation of children in
+    chunks, see `run_generation'.
+    - polish_top_k: Optional. If positive, then at the end of each restart its `polish_top_k' best cog arrays are
+    polished to local optima by a `Swap_Local_Search' and added to the population before its best is taken. Requires
+    `batch_obj_fxn'.
 """
 def learning_algo(
         cogs,
@@ -260,152 +682,140 @@ def learning_algo(
         factor_base,
         max_factor,
         max_multiplier,
-        controller
+        controller,
+        batch_obj_fxn=None,
+        rng=None,
+        cache=None,
+        obj_key=None,
+        checkpointer=None,
+        fitness_memo=None,
+        reject_duplicates=False,
+        offspring_pool=None,
+        polish_top_k=0
 ):
 
     controller.print_init_info()
 
-    excludes_dict = get_excludes_dict(empties_set,cogs)
-    cog_array_template = Cog_Array(empties_set,None,excludes_dict).extend_spares(cogs)
-
-    can_do_one_point_mutation = cog_array_template.get_num_non_empty() < cog_array_template.get_num_spares()
+    registry, cog_array_template, evaluator, engine = build_problem(
+        cogs, empties_set, flaggies, batch_obj_fxn, rng, cache
+    )
+    local_search = (
+        Swap_Local_Search(evaluator, engine.cells, engine.excluded, batch_obj_fxn) if polish_top_k > 0 else None
+    )
 
     bests = []
-    # with open("hello.pkl", "rb") as fh:
-    #     cogs = pkl.load(fh)
-    average_std_objs = {}
-    for i, cog in enumerate(cogs):
-        average_std_objs[cog] = cog.get_average_std_obj(cog_array_template, obj_fxn)
-    # with open("hello.pkl", "wb") as fh:
-    #     pkl.dump(cogs,fh)
-    # raise Exception
-
-    while controller.restart_loop():
-
-        for cog in cogs:
-            cog.instantiate_strengths(cog_array_template)
-
-        pop = []
-        for _ in range(pop_size):
-            cog_array = Cog_Array(empties_set,None,excludes_dict)
-            cog_array.instantiate_randomly(cogs)
-            pop.append(cog_array)
-        pop = Population(pop,obj_fxn)
-
-        controller.set_pop(pop)
-        controller.print_restart_status_open()
+    checkpoint = checkpointer.load() if checkpointer is not None else None
+    if checkpoint is not None:
+        checkpoint.check(registry, cog_array_template, obj_key).restore_average_std_objs(registry)
+    else:
+        _load_average_std_objs(engine, obj_fxn, batch_obj_fxn, evaluator, cache, obj_key)
+    average_objs = np.array([cog.get_average_std_obj()[0] for cog in registry])
+    std_objs = np.array([cog.get_average_std_obj()[1] for cog in registry])
+    strength_model = Strength_Model(registry, empties_set)
+
+    while checkpoint is not None or controller.restart_loop():
+
+        if checkpoint is not None:
+            pop = Population.from_rows(
+                cog_array_template,
+                checkpoint.arrays["genomes"],
+                checkpoint.arrays["values"],
+                checkpoint.arrays["rates"],
+                obj_fxn,
+                batch_obj_fxn,
+                evaluator,
+                fitness_memo,
+                reject_duplicates
+            )
+            bests = checkpoint.restore_run(controller, pop, strength_model, engine.rng)
+            checkpoint = None
+
+        else:
+            strength_model.instantiate()
+
+            pop = Population.from_genomes(
+                cog_array_template,
+                engine.random_genomes(pop_size),
+                obj_fxn,
+                batch_obj_fxn,
+                evaluator,
+                fitness_memo,
+                reject_duplicates
+            )
+
+            controller.set_pop(pop)
+            controller.print_restart_status_open()
 
         while controller.generation_loop():
 
             controller.print_generation_status()
 
-            while controller.mutation_loop():
-
-                breeding_scheme = controller.breeding_scheme()
-                if breeding_scheme == "cross_breed":
-                    (array1,_),(array2,_) = pop.sample(2)
-                    pop.add(array1.cross_breed(array2))
-
-                elif breeding_scheme == "two_point_mutation" or not can_do_one_point_mutation:
-                    old_array,old_obj = pop.sample(1)[0]
-                    new_array, coords1, coords2 = old_array.two_point_mutation()
-                    cog1 = old_array[coords1]
-                    cog2 = old_array[coords2]
-                    _, new_obj = pop.add(new_array)
-                    try:
-                        prop_new = new_obj / (old_obj + new_obj)
-                        factor = factor_base ** ((prop_new-1/2)*old_array.get_num_occupied())
-                        cog1.update_strength(coords2,factor,max_factor,max_multiplier)
-                        cog1.update_strength(coords1,1/factor,max_factor,max_multiplier)
-                        cog2.update_strength(coords1, factor, max_factor,max_multiplier)
-                        cog2.update_strength(coords2, 1/factor,max_factor,max_multiplier)
-                        pass
-                    except ZeroDivisionError:
-                        pass
-
-                elif breeding_scheme == "one_point_mutation":
-                    old_array,old_obj = pop.sample(1)[0]
-                    new_array,coords,old_cog = old_array.one_point_mutation()
-                    new_cog = new_array[coords]
-                    _, new_obj = pop.add(new_array)
-                    median_diff = average_std_objs[new_cog][0] - average_std_objs[old_cog][0]
-                    std_diff = np.sqrt(average_std_objs[new_cog][1] ** 2 + average_std_objs[old_cog][1] ** 2)
-                    try:
-                        z_score = (new_obj - old_obj - median_diff) / std_diff
-                        factor = factor_base ** z_score
-                        old_cog.update_strength(coords, 1 / factor, max_factor, max_multiplier)
-                        new_cog.update_strength(coords, factor, max_factor, max_multiplier)
-                        pass
-                        # if (
-                        #         (
-                        #         new_cog.__class__.__name__ == "Up_Cog" and
-                        #         coords.y == 7 and
-                        #         np.max(new_cog.get_strength(coords))>=0.03
-                        #         ) or (
-                        #
-                        #     )
-                        # ):
-                        #     print("NEW")
-                        #     print(new_array.str_with_abbr())
-                        #     print("OLD")
-                        #     print(old_array.str_with_abbr())
-                        #     print("new_cog:                      %s" % str(new_cog).replace("\n","\t"))
-                        #     print("new_obj:                      %1.5f" % new_obj)
-                        #     print("old_cog:                      %s" % str(old_cog).replace("\n","\t"))
-                        #     print("old_obj:                      %1.5f" % old_obj)
-                        #     print("Coords:                       %s" % coords)
-                        #     print("average_std_objs[new_cog][0]: %1.5f" % average_std_objs[new_cog][0])
-                        #     print("average_std_objs[old_cog][0]: %1.5f" % average_std_objs[old_cog][0])
-                        #     print("median_diff:                  %1.5f" % median_diff)
-                        #     print("average_std_objs[new_cog][1]: %1.5f" % average_std_objs[new_cog][1])
-                        #     print("average_std_objs[old_cog][1]: %1.5f" % average_std_objs[old_cog][1])
-                        #     print("std_diff:                     %1.5f" % std_diff)
-                        #     print("z_score:                      %1.5f" % z_score)
-                        #     print("pre_factor:                   %1.5f" % pre_factor)
-                        #     print("new_cog factor:               %1.5f" % factor)
-                        #     print("old_cog factor:               %1.5f" % (1/factor))
-                        #     print("new_cog.get_strength(coords): %1.5f" % new_cog.get_strength(coords))
-                        #     print("old_cog.get_strength(coords): %1.5f" % old_cog.get_strength(coords))
-                        #     print("new_cog.strengths:\n%s" % np.array2string(new_cog.strengths.transpose(),precision=5,max_line_width=120))
-                        #     print("old_cog.strengths:\n%s" % np.array2string(old_cog.strengths.transpose(),precision=5,max_line_width=120))
-                        # elif (
-                        #     old_cog.__class__.__name__ == "Up_Cog" and
-                        #     # old_cog.build_rate == 28 and
-                        #     # old_cog.exp_rate == 0.07 and
-                        #     # old_cog.build_rate_boost == 0.09 and
-                        #     coords.y == 7 and
-                        #     np.max(old_cog.get_strength(coords)) >= 0.03
-                        # ):
-                        #     print("OLD")
-                        #     print(old_array.str_with_abbr())
-                        #     print("NEW")
-                        #     print(new_array.str_with_abbr())
-                        #     print("old_cog:                      %s" % str(old_cog).replace("\n","\t"))
-                        #     print("old_obj:                      %1.5f" % old_obj)
-                        #     print("new_cog:                      %s" % str(new_cog).replace("\n","\t"))
-                        #     print("new_obj:                      %1.5f" % new_obj)
-                        #     print("Coords:                       %s" % coords)
-                        #     print("average_std_objs[old_cog][0]: %1.5f" % average_std_objs[old_cog][0])
-                        #     print("average_std_objs[new_cog][0]: %1.5f" % average_std_objs[new_cog][0])
-                        #     print("median_diff:                  %1.5f" % median_diff)
-                        #     print("average_std_objs[old_cog][1]: %1.5f" % average_std_objs[old_cog][1])
-                        #     print("average_std_objs[new_cog][1]: %1.5f" % average_std_objs[new_cog][1])
-                        #     print("std_diff:                     %1.5f" % std_diff)
-                        #     print("z_score:                      %1.5f" % z_score)
-                        #     print("pre_factor:                   %1.5f" % pre_factor)
-                        #     print("old_cog factor:               %1.5f" % (1/factor))
-                        #     print("new_cog factor:               %1.5f" % factor)
-                        #     print("old_cog.get_strength(coords): %1.5f" % old_cog.get_strength(coords))
-                        #     print("new_cog.get_strength(coords): %1.5f" % new_cog.get_strength(coords))
-                        #     print("old_cog.strengths:\n%s" % np.array2string(old_cog.strengths.transpose(),precision=5,max_line_width=120))
-                        #     print("new_cog.strengths\n%s" % np.array2string(new_cog.strengths.transpose(),precision=5,max_line_width=120))
-                    except ZeroDivisionError:
-                        pass
-
-                else:
-                    raise RuntimeError("Breeding scheme must be among `cross_breed`, `one_point_mutation`, and `two_point_mutation`.")
-            pop.cull()
+            run_generation(
+                engine,
+                pop,
+                controller,
+                strength_model,
+                factor_base,
+                max_factor,
+                max_multiplier,
+                average_objs,
+                std_objs,
+                offspring_pool
+            )
+            if checkpointer is not None and checkpointer.step():
+                checkpointer.save(controller, pop, strength_model, bests, registry, engine.rng, obj_key)
+        strength_model.write_to_cogs()
+        if local_search is not None:
+            polish_population(local_search, pop, polish_top_k)
         controller.print_restart_status_close()
 
         bests.append(pop.get_best())
-    return max(bests, key=lambda t:t[1])
\ No newline at end of file
+    if checkpointer is not None:
+        checkpointer.remove()
+    return max(bests, key=lambda t:t[1])
+"""
+Set `cog.average_obj' and `cog.std_obj' of every cog of `cogs' that does not have them yet, exactly as `learning_algo'
+would with the same arguments. `learning_algo' then skips this preprocessing.
+"""
+def estimate_average_std_objs(
+        cogs,
+        empties_set,
+        flaggies,
+        obj_fxn,
+        batch_obj_fxn=None,
+        rng=None,
+        cache=None,
+        obj_key=None
+):
+    _, _, evaluator, engine = build_problem(cogs, empties_set, flaggies, batch_obj_fxn, rng, cache)
+    _load_average_std_objs(engine, obj_fxn, batch_obj_fxn, evaluator, cache, obj_key)
+    return cogs
+
+"""
+Returns the `Cog_Registry' of `cogs', the cog array template, the `Batch_Evaluator' (if `batch_obj_fxn' is given) and
+the `Reproduction_Engine' that `learning_algo' works with.
+"""
+def build_problem(cogs, empties_set, flaggies, batch_obj_fxn = None, rng = None, cache = None):
+    registry = Cog_Registry(cogs)
+    if cache is not None:
+        load_influence_tables(cache, empties_set, registry.get_boost_cogs())
+        excludes_dict = get_cached_excludes_dict(cache, empties_set, cogs)
+    else:
+        excludes_dict = get_excludes_dict(empties_set,cogs)
+    cog_array_template = Cog_Array(empties_set,flaggies,excludes_dict,registry).extend_spares(cogs)
+
+    evaluator = Batch_Evaluator(registry,empties_set,flaggies) if batch_obj_fxn is not None else None
+    engine = Reproduction_Engine(cog_array_template, rng)
+    return registry, cog_array_template, evaluator, engine
+
+def _load_average_std_objs(engine, obj_fxn, batch_obj_fxn, evaluator, cache, obj_key):
+    if cache is not None and obj_key is not None:
+        load_average_std_objs(cache, obj_key, engine, obj_fxn, batch_obj_fxn, evaluator)
+    else:
+        get_average_std_objs(
+            engine,
+            obj_fxn,
+            batch_obj_fxn,
+            evaluator,
+            cog_indices=[i for i,cog in enumerate(engine.registry) if not cog.average_obj]
+        )
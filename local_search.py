@@ -0,0 +1,242 @@
+"""
+Cogstruction: Optimizing cog arrays in Legends of Idleon
+    Copyright (C) 2021 Michael P. Lane
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+"""
+
+import numpy as np
+
+from batch_evaluator import NUM_RATES, get_components
+from cog_array_stuff import EMPTY_CELL
+
+MAX_CHUNK_ROWS = 20000
+
+"""
+- A deterministic best-improvement local search over the swaps of a genome (see `Cog_Array.genome'), in the style of
+local search for the quadratic assignment problem. A move swaps the cogs of two of `cells', either of which may be
+empty, or replaces the cog of a cell by a spare, which becomes a spare in its place. Each step makes the move that
+improves the objective `batch_obj_fxn' (see `Population') the most.
+- The swap-gain matrix is kept as the change of the rates vector (see `Cog_Array.get_rates') of every move, one row per
+pair of positions of its upper triangle, where the positions are the cells followed by the spare slots. The gains are
+recomputed from it at each step, since the flaggy rate is a product of rates and so the gain of a move depends on the
+rest of the genome.
+- The build and flaggy rates are sums over pairs of cells of a boost times a base rate, so the change of a move is
+computed from the influence tables (see `get_reach') rather than by evaluating the moved genome: it only needs, for
+each cell, the base rates that a `Boost_Cog' of each type placed there would boost and the boosts that the cell
+receives. After a move, only the rows of moves whose change depends on one of the swapped cells are computed again: the
+change of a move depends only on its own cells, on the cells that the `Boost_Cog's on them boost from either cell, and
+on the `Boost_Cog's that boost either cell.
+- A search stops at a certified local optimum: once no move improves by more than `rel_tol' times the objective, the
+whole matrix is evaluated again from scratch by `evaluator', and the search goes on if that finds an improving move.
+- Moves that place a cog at a cell where `excluded' (see `Reproduction_Engine') says it should not be are not made.
+- `evaluator' is a `Batch_Evaluator'. There should be one `Swap_Local_Search' per cog array template.
+"""
+class Swap_Local_Search:
+    def __init__(self, evaluator, cells, excluded, batch_obj_fxn, rel_tol = 1e-9):
+        if evaluator is None or batch_obj_fxn is None:
+            raise Local_Search_Error("The local search needs a `Batch_Evaluator' and `batch_obj_fxn'.")
+        self.evaluator = evaluator
+        self.cells = np.asarray(cells, dtype=np.intp)
+        self.excluded = excluded
+        self.batch_obj_fxn = batch_obj_fxn
+        self.rel_tol = rel_tol
+        self.num_cogs = len(evaluator.type_ids) - 1
+        self.reach = get_reach(evaluator)[:, self.cells[:,None], self.cells]
+        self._reach_weights = self.reach.astype(np.float64)
+        self._flaggy_counts = np.zeros((len(evaluator.tables) + 1, len(self.cells)))
+        for type_id in range(len(evaluator.tables)):
+            self._flaggy_counts[type_id] = np.asarray(evaluator.flaggy_counts[type_id])[self.cells]
+
+    """
+    - Returns the polished copy of `genome', its rates vector and the number of moves made, at most `max_moves' if
+    given, in which case the result need not be a local optimum.
+    """
+    def polish(self, genome, max_moves = None):
+        genome = np.array(genome)
+        C = len(self.cells)
+        placed = genome[genome != EMPTY_CELL]
+        spares = np.setdiff1d(np.arange(self.num_cogs), placed).astype(genome.dtype)
+        values = np.concatenate((genome[self.cells], spares))
+        first, second = np.triu_indices(len(values), 1)
+        keep = first < C
+        first, second = first[keep], second[keep]
+
+        rates = self.evaluator.evaluate_rates(genome)[0]
+        deltas = self._get_local_deltas(values, first, second)
+        num_moves = 0
+        certified = False
+        while max_moves is None or num_moves < max_moves:
+            objective = self._get_objectives(rates[None])[0]
+            gains = np.where(
+                self._get_valid(values, first, second),
+                self._get_objectives(rates + deltas) - objective,
+                -np.inf
+            )
+            best = int(np.argmax(gains)) if len(gains) > 0 else None
+            if best is None or not gains[best] > self.rel_tol * abs(objective):
+                if certified:
+                    break
+                deltas = self._get_deltas(genome, values, rates, first, second)
+                certified = True
+                continue
+            certified = False
+
+            p, q = first[best], second[best]
+            old_values = values[[p, q]]
+            values[p], values[q] = values[q], values[p]
+            genome[self.cells[p]] = values[p]
+            if q < C:
+                genome[self.cells[q]] = values[q]
+            rates = self.evaluator.evaluate_rates(genome)[0]
+            num_moves += 1
+
+            redo = self._get_affected(values, old_values, first, second, p, q)
+            deltas[redo] = self._get_local_deltas(values, first[redo], second[redo])
+        return genome, rates, num_moves
+
+    """
+    Returns the changes of the rates vector of the cells `values' made by the moves `first', `second', computed from the
+    influence tables, see `Swap_Local_Search'. A spare is handled as a cell that nothing boosts and that boosts nothing.
+    """
+    def _get_local_deltas(self, values, first, second):
+        evaluator = self.evaluator
+        C = len(self.cells)
+        to_cell = second < C
+        x = first
+        y = np.where(to_cell, second, 0)
+        old_x, new_x = values[first], values[second]
+        old_y = np.where(to_cell, values[second], EMPTY_CELL)
+        new_y = np.where(to_cell, values[first], EMPTY_CELL)
+        types = evaluator.type_ids
+        old_tx, new_tx, old_ty, new_ty = types[old_x], types[new_x], types[old_y], types[new_y]
+        old_rxy, new_rxy = self.reach[old_tx, x, y], self.reach[new_tx, x, y]
+        old_ryx, new_ryx = self.reach[old_ty, y, x], self.reach[new_ty, y, x]
+
+        cogs = values[:C]
+        reach_from = self._reach_weights[types[cogs], np.arange(C)]
+        deltas = np.zeros((len(first), NUM_RATES))
+        for column,base,boosts in (
+                (0, evaluator.build_rates, evaluator.build_rate_boosts),
+                (1, evaluator.flaggy_rates, evaluator.flaggy_rate_boosts)
+        ):
+            sums = self._reach_weights @ base[cogs]
+            received = boosts[cogs] @ reach_from
+            old_bx, new_bx, old_by, new_by = base[old_x], base[new_x], base[old_y], base[new_y]
+            old_sx, new_sx, old_sy, new_sy = boosts[old_x], boosts[new_x], boosts[old_y], boosts[new_y]
+            deltas[:,column] = (
+                new_bx - old_bx + new_by - old_by
+                + new_sx * (sums[new_tx, x] - new_rxy * old_by) - old_sx * (sums[old_tx, x] - old_rxy * old_by)
+                + new_sy * (sums[new_ty, y] - new_ryx * old_bx) - old_sy * (sums[old_ty, y] - old_ryx * old_bx)
+                + (new_bx - old_bx) * (received[x] - old_sy * old_ryx)
+                + (new_by - old_by) * (received[y] - old_sx * old_rxy)
+                + new_sx * new_rxy * new_by + new_sy * new_ryx * new_bx
+                - old_sx * old_rxy * old_by - old_sy * old_ryx * old_bx
+            )
+        if evaluator.num_flaggies > 0:
+            speeds, counts = evaluator.flaggy_speed_boosts, self._flaggy_counts
+            deltas[:,2] = (
+                speeds[new_x] * counts[new_tx, x] - speeds[old_x] * counts[old_tx, x] +
+                speeds[new_y] * counts[new_ty, y] - speeds[old_y] * counts[old_ty, y]
+            ) / evaluator.num_flaggies
+        exp_mults = evaluator.exp_mults
+        deltas[:,3] = exp_mults[new_x] - exp_mults[old_x] + exp_mults[new_y] - exp_mults[old_y]
+        return deltas
+
+    """
+    Returns the changes of the rates vector `rates' of `genome' made by the moves `first', `second'.
+    """
+    def _get_deltas(self, genome, values, rates, first, second):
+        deltas = np.empty((len(first), len(rates)))
+        for start in range(0, len(first), MAX_CHUNK_ROWS):
+            chunk = slice(start, start + MAX_CHUNK_ROWS)
+            genomes = self._apply(genome, values, first[chunk], second[chunk])
+            deltas[chunk] = self.evaluator.evaluate_rates(genomes) - rates
+        return deltas
+
+    def _apply(self, genome, values, first, second):
+        C = len(self.cells)
+        genomes = np.repeat(genome[None], len(first), axis=0)
+        rows = np.arange(len(first))
+        genomes[rows, self.cells[first]] = values[second]
+        to_cell = second < C
+        genomes[rows[to_cell], self.cells[second[to_cell]]] = values[first[to_cell]]
+        return genomes
+
+    def _get_valid(self, values, first, second):
+        C = len(self.cells)
+        to_cell = second < C
+        second_cells = self.cells[np.where(to_cell, second, 0)]
+        return (
+            (values[first] != values[second]) &
+            ~self.excluded[values[second], self.cells[first]] &
+            ~(to_cell & self.excluded[values[first], second_cells])
+        )
+
+    """
+    Returns whether the change of each move `first', `second' may have changed when the cells of positions `p' and `q'
+    went from `old_values' to `values'.
+    """
+    def _get_affected(self, values, old_values, first, second, p, q):
+        C = len(self.cells)
+        to_cell = second < C
+        second_cells = np.where(to_cell, second, 0)
+        affected = (first == p) | (first == q) | (second == p) | (second == q)
+        first_types = self.evaluator.type_ids[values[first]]
+        second_types = self.evaluator.type_ids[values[second]]
+        for changed in (p, q):
+            if changed >= C:
+                continue
+            for types in (first_types, second_types):
+                affected |= self.reach[types, first, changed]
+                affected |= to_cell & self.reach[types, second_cells, changed]
+            for cog in (values[changed], old_values[0 if changed == p else 1]):
+                changed_reach = self.reach[self.evaluator.type_ids[cog], changed]
+                affected |= changed_reach[first] | (to_cell & changed_reach[second_cells])
+        return affected
+
+    def _get_objectives(self, rates):
+        return np.asarray(self.batch_obj_fxn(*get_components(rates)), dtype=np.float64)
+
+class Local_Search_Error(RuntimeError):
+    pass
+
+"""
+Polish the `k' best cog arrays of `pop' (see `Population') with `search', a `Swap_Local_Search', and add the results to
+`pop'. Returns `pop'.
+"""
+def polish_population(search, pop, k):
+    top = np.argsort(-pop.values, kind="stable")[:k]
+    polished = [search.polish(genome)[:2] for genome in pop.genomes[top]]
+    if len(polished) > 0:
+        pop.extend_genomes(np.stack([genome for genome,_ in polished]), np.stack([rates for _,rates in polished]))
+    return pop
+
+"""
+Returns a boolean array `reach' of shape `(len(evaluator.tables) + 1, total_coords, total_coords)': `reach[type_id]'
+is `True' from a cell to each cell that a `Boost_Cog' of that type (see `Batch_Evaluator.type_ids') placed at it
+boosts. The last slice, for cogs that boost nothing, is all `False'.
+"""
+def get_reach(evaluator):
+    T = evaluator.total_coords
+    reach = np.zeros((len(evaluator.tables) + 1, T, T), dtype=bool)
+    for type_id,table in enumerate(evaluator.tables):
+        if table.line_axis is not None:
+            lines = np.asarray(table.lines)
+            reach[type_id] = lines[:,None] == lines[None,:]
+            np.fill_diagonal(reach[type_id], False)
+        else:
+            padded = np.asarray(table.padded)
+            cells = np.repeat(np.arange(len(padded)), padded.shape[1])
+            adj = padded.ravel()
+            keep = adj < T
+            reach[type_id, cells[keep], adj[keep]] = True
+    return reach
@@ -16,19 +16,27 @@ Cogstruction: Optimizing cog arrays in Legends of Idleon
 import random
 import numpy as np
 
-from learning_algo import Iteration_Controller,learning_algo
+from learning_algo import Iteration_Controller,learning_algo,Fitness_Memo
+from parallel_restarts import parallel_learning_algo
+from pareto import pareto_learning_algo
+from objectives import Standard_Objective
 from file_readers import read_cog_datas,read_empties_datas,read_flaggies_datas
 from cog_factory import cog_factory
+from checkpoint import Checkpointer
 from cog_array_stuff import Empties_Set
+from disk_cache import Disk_Cache
 
 if __name__ == "__main__":
-    random.seed(133742069)
+    seed = 133742069
+    random.seed(seed)
 
     inv_build_weight = 7000.0
     inv_flaggy_weight = 2000.0
     inv_exp_weight = 3.0
     pop_size = 2000
     num_restarts = 1
+    num_processes = None
+    pareto_mode = False
     prob_cross_breed = 0.5
     prob_one_point_mutation = 0.25
     prob_two_point_mutation = 0.25
@@ -40,19 +48,15 @@ if __name__ == "__main__":
     max_running_total_len = 10
     min_generations = 100
     max_generations = 400
+    polish_top_k = 10
 
     cog_datas_filename = "cog_datas.csv"
     empties_datas_filename = "empties_datas.csv"
     flaggies_datas_filename = "flaggies_datas.csv"
     output_filename = "output.txt"
-
-    A = np.array([
-        [1.,1.,1.],
-        [inv_build_weight,-inv_flaggy_weight,0.],
-        [0.,inv_flaggy_weight,-inv_exp_weight]
-    ])
-    b = np.array([1.,0.,0.])
-    build_weight, flaggy_weight, exp_weight = np.linalg.solve(A, b)
+    cache_dirname = ".cogstruction_cache"
+    checkpoint_filename = "checkpoint.npz"
+    checkpoint_seconds = 60
 
     controller = (Iteration_Controller()
         .set_restart_info(num_restarts)
@@ -65,18 +69,73 @@ if __name__ == "__main__":
     empties_set = Empties_Set(empties)
     cogs = cog_factory(cog_datas)
 
-    best = learning_algo(
-        cogs,
-        empties_set,
-        set(),
-        pop_size,
-        lambda cog: cog.standard_obj_fxn(build_weight,flaggy_weight,exp_weight),
-        factor_base,
-        max_factor,
-        max_multiplier,
-        controller
-    )
+    objective = Standard_Objective.from_inverse_weights(inv_build_weight, inv_flaggy_weight, inv_exp_weight)
+
+    if pareto_mode:
+        front = pareto_learning_algo(
+            cogs,
+            empties_set,
+            set(),
+            pop_size,
+            objective.obj_fxn,
+            factor_base,
+            max_factor,
+            max_multiplier,
+            controller,
+            objective.batch_obj_fxn,
+            rng=np.random.default_rng(seed),
+            cache=Disk_Cache(cache_dirname),
+            obj_key=objective.get_key(),
+            fitness_memo=Fitness_Memo(),
+            reject_duplicates=True
+        )
+        print("Writing %d Pareto-optimal cog arrays to %s" % (len(front), output_filename))
+        with open(output_filename, "w") as fh:
+            for array,_,(build_rate,flaggy_rate,exp_mult) in front:
+                fh.write("Build rate: %s, flaggy rate: %s, exp multiplier: %s\n" % (build_rate, flaggy_rate, exp_mult))
+                fh.write(str(array) + "\n\n")
+    elif num_restarts > 1:
+        best = parallel_learning_algo(
+            cogs,
+            empties_set,
+            set(),
+            pop_size,
+            objective.obj_fxn,
+            factor_base,
+            max_factor,
+            max_multiplier,
+            controller,
+            objective.batch_obj_fxn,
+            seed=seed,
+            processes=num_processes,
+            cache=Disk_Cache(cache_dirname),
+            obj_key=objective.get_key(),
+            fitness_memo=Fitness_Memo(),
+            reject_duplicates=True,
+            polish_top_k=polish_top_k
+        )
+    else:
+        best = learning_algo(
+            cogs,
+            empties_set,
+            set(),
+            pop_size,
+            objective.obj_fxn,
+            factor_base,
+            max_factor,
+            max_multiplier,
+            controller,
+            objective.batch_obj_fxn,
+            rng=np.random.default_rng(seed),
+            cache=Disk_Cache(cache_dirname),
+            obj_key=objective.get_key(),
+            checkpointer=Checkpointer(checkpoint_filename, every_seconds=checkpoint_seconds),
+            fitness_memo=Fitness_Memo(),
+            reject_duplicates=True,
+            polish_top_k=polish_top_k
+        )
 
-    print("Writing best cog array to %s" % output_filename)
-    with open(output_filename, "w") as fh:
-        fh.write(str(best[0]))
\ No newline at end of file
+    if not pareto_mode:
+        print("Writing best cog array to %s" % output_filename)
+        with open(output_filename, "w") as fh:
+            fh.write(str(best[0]))
\ No newline at end of file
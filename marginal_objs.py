@@ -0,0 +1,167 @@
+"""
+Cogstruction: Optimizing cog arrays in Legends of Idleon
+    Copyright (C) 2021 Michael P. Lane
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+"""
+
+import copy
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from batch_evaluator import get_components
+from cog_array_stuff import EMPTY_CELL
+from constants import ONE_SIG_PROB
+from objectives import get_component_matrix
+
+MAX_CHUNK_ROWS = 20000
+
+"""
+- Estimates `Cog.get_average_std_obj' for the cogs of `engine.registry' with registry indices `cog_indices' (default:
+all of them) at once, and sets `cog.average_obj' and `cog.std_obj'. Returns two float ndarrays, the averages and the
+standard deviations, in the order of `cog_indices'.
+- A sample of a cog is drawn as follows. Place the cog at a non-empty cell and the other cogs randomly, using
+`engine.random_genomes'. The sample is the objective of that cog array minus the objective of the same cog array with
+that cell emptied. Each round draws `samples_per_coord' samples per non-empty cell for each cog.
+- Like `Cog.get_average_std_obj', the average is the median of the samples and the standard deviation is half the
+spread between the `0.50-ONE_SIG_PROB' and `0.50+ONE_SIG_PROB' percentiles.
+- If `rel_tol' is given, then more rounds are drawn for the cogs whose median is not yet known to within `rel_tol'
+times its absolute value. Each round doubles the samples of those cogs, up to `max_samples_per_coord' per cell.
+- If `batch_obj_fxn' is given, then `evaluator' must be a `Batch_Evaluator', and samples are scored as whole genome
+matrices, see `Population'. Otherwise each cog array is scored by `obj_fxn' through a view (see `Cog_Array.with_genome').
+- If `processes' is given, then the cogs are split among that many worker processes. `obj_fxn' and `batch_obj_fxn' must
+then be picklable, so lambdas will not do. Each worker draws from its own child of `engine.rng'.
+"""
+def get_average_std_objs(
+        engine,
+        obj_fxn,
+        batch_obj_fxn=None,
+        evaluator=None,
+        samples_per_coord=1,
+        rel_tol=None,
+        max_samples_per_coord=64,
+        processes=None,
+        cog_indices=None
+):
+    num_cogs = len(engine.registry)
+    cog_indices = np.arange(num_cogs) if cog_indices is None else np.asarray(cog_indices, dtype=np.intp)
+    average_objs = np.zeros(num_cogs)
+    std_objs = np.zeros(num_cogs)
+    objs = [np.empty(0) for _ in range(num_cogs)]
+    pending = cog_indices
+    num_samples = samples_per_coord
+    drawn = 0
+
+    while len(pending) > 0 and num_samples > 0:
+        new_objs = _sample_in_parallel(
+            engine, pending, num_samples, obj_fxn, batch_obj_fxn, evaluator, processes
+        )
+        drawn += num_samples
+        for i,cog_objs in zip(pending, new_objs):
+            objs[i] = np.concatenate((objs[i], cog_objs))
+        pending_objs = np.stack([objs[i] for i in pending])
+        average_objs[pending], std_objs[pending] = get_average_std_of_samples(pending_objs)
+        if rel_tol is None:
+            break
+        std_errors = np.sqrt(np.pi / 2) * std_objs[pending] / np.sqrt(pending_objs.shape[1])
+        pending = pending[std_errors > rel_tol * np.abs(average_objs[pending])]
+        num_samples = min(drawn, max_samples_per_coord - drawn)
+
+    for i in cog_indices:
+        engine.registry.cogs[i].average_obj = average_objs[i]
+        engine.registry.cogs[i].std_obj = std_objs[i]
+    return average_objs[cog_indices], std_objs[cog_indices]
+
+"""
+- Returns a float ndarray of shape `(len(cog_indices), num_samples * num_non_empty)', one row of samples per cog, see
+`get_average_std_objs'.
+- Genomes are built and scored in chunks of at most `MAX_CHUNK_ROWS' cog arrays.
+"""
+def sample_marginal_objs(engine, cog_indices, num_samples, obj_fxn, batch_obj_fxn=None, evaluator=None):
+    return _sample_marginals(
+        engine,
+        cog_indices,
+        num_samples,
+        lambda genomes: _score(engine.template, genomes, obj_fxn, batch_obj_fxn, evaluator)
+    )
+
+"""
+- Like `sample_marginal_objs', but each sample is the difference of the build rate, flaggy rate and exp multiplier (see
+`get_components') rather than of an objective. Returns a float ndarray of shape
+`(len(cog_indices), num_samples * num_non_empty, 3)'.
+- The marginal objectives of any `Standard_Objective' are then `samples @ objective.coefficients', with no more
+evaluations, see `get_average_std_of_samples'. `evaluator' is a `Batch_Evaluator'.
+"""
+def sample_marginal_components(engine, cog_indices, num_samples, evaluator):
+    return _sample_marginals(
+        engine, cog_indices, num_samples, lambda genomes: get_component_matrix(evaluator.evaluate_rates(genomes))
+    )
+
+"""
+Returns the averages and standard deviations of the rows of samples `objs', as estimated by `get_average_std_objs'.
+"""
+def get_average_std_of_samples(objs):
+    return np.median(objs, axis=1), (
+        np.percentile(objs, 100*(0.50+ONE_SIG_PROB), axis=1) -
+        np.percentile(objs, 100*(0.50-ONE_SIG_PROB), axis=1)
+    )/2
+
+"""
+`score' maps a genome matrix to its objectives, or to a matrix with one row per genome.
+"""
+def _sample_marginals(engine, cog_indices, num_samples, score):
+    cells = engine.cells
+    cog_indices = np.asarray(cog_indices, dtype=np.intp)
+    num_per_cog = num_samples * len(cells)
+    objs = None
+    cogs_per_chunk = max(1, MAX_CHUNK_ROWS // max(1, num_per_cog))
+    for start in range(0, len(cog_indices), cogs_per_chunk):
+        chunk = cog_indices[start : start + cogs_per_chunk]
+        fixed_cogs = np.repeat(chunk, num_per_cog)
+        fixed_cells = np.tile(np.repeat(cells, num_samples), len(chunk))
+        genomes = engine.random_genomes(len(fixed_cogs), fixed_cogs, fixed_cells)
+        emptied = genomes.copy()
+        emptied[np.arange(len(fixed_cells)), fixed_cells] = EMPTY_CELL
+        values = score(np.concatenate((genomes, emptied)))
+        if objs is None:
+            objs = np.empty((len(cog_indices), num_per_cog) + values.shape[1:])
+        objs[start : start + len(chunk)] = (values[:len(genomes)] - values[len(genomes):]).reshape(
+            (len(chunk), num_per_cog) + values.shape[1:]
+        )
+    return objs if objs is not None else np.empty((0, num_per_cog))
+
+def _score(template, genomes, obj_fxn, batch_obj_fxn, evaluator):
+    if batch_obj_fxn is not None:
+        rates = evaluator.evaluate_rates(genomes)
+        return np.asarray(batch_obj_fxn(*get_components(rates)), dtype=np.float64)
+    return np.array([obj_fxn(template.with_genome(genome)) for genome in genomes], dtype=np.float64)
+
+def _sample_in_parallel(engine, cog_indices, num_samples, obj_fxn, batch_obj_fxn, evaluator, processes):
+    if not processes or processes <= 1 or len(cog_indices) <= 1:
+        return sample_marginal_objs(engine, cog_indices, num_samples, obj_fxn, batch_obj_fxn, evaluator)
+    chunks = np.array_split(cog_indices, min(processes, len(cog_indices)))
+    workers = []
+    for chunk,rng in zip(chunks, engine.rng.spawn(len(chunks))):
+        worker = copy.copy(engine)
+        worker.rng = rng
+        workers.append(worker)
+    with ProcessPoolExecutor(len(chunks)) as executor:
+        results = executor.map(
+            sample_marginal_objs,
+            workers,
+            chunks,
+            [num_samples] * len(chunks),
+            [obj_fxn] * len(chunks),
+            [batch_obj_fxn] * len(chunks),
+            [evaluator] * len(chunks)
+        )
+        return np.concatenate(list(results))
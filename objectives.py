@@ -0,0 +1,143 @@
+"""
+Cogstruction: Optimizing cog arrays in Legends of Idleon
+    Copyright (C) 2021 Michael P. Lane
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+"""
+
+import numpy as np
+
+from batch_evaluator import get_components
+
+"""
+- The objective of `main.py': a convex combination (i.e. weighted average) of the build, flaggy and exp rates, see
+`Cog_Array.standard_obj_fxn'.
+- It is a plain description of the objective rather than code: `coefficients' is the vector of the weights, and
+`evaluate_rates' applies it to the components of rates vectors (see `get_components') with one matrix product. An
+evaluator that knows the components of its genomes can use `coefficients' directly.
+- `inv_weights' are the inverse weights it was built from, if any, see `from_inverse_weights'.
+- It can be pickled, and `to_dict' and `from_dict' convert it to and from JSON-compatible dicts. Unlike a `lambda', its
+bound methods `obj_fxn' and `batch_obj_fxn' can be pickled too, so they can be sent to worker processes.
+"""
+class Standard_Objective:
+    def __init__(self, build_weight, flaggy_weight, exp_weight, inv_weights = None):
+        self.build_weight = float(build_weight)
+        self.flaggy_weight = float(flaggy_weight)
+        self.exp_weight = float(exp_weight)
+        self.inv_weights = tuple(float(inv_weight) for inv_weight in inv_weights) if inv_weights is not None else None
+        self.coefficients = np.array([self.build_weight, self.flaggy_weight, self.exp_weight])
+
+    """
+    Returns the `Standard_Objective' of `main.py', whose weights sum to 1 and satisfy
+    `build_weight * inv_build_weight == flaggy_weight * inv_flaggy_weight == exp_weight * inv_exp_weight'.
+    """
+    @classmethod
+    def from_inverse_weights(cls, inv_build_weight, inv_flaggy_weight, inv_exp_weight):
+        A = np.array([
+            [1.,1.,1.],
+            [inv_build_weight,-inv_flaggy_weight,0.],
+            [0.,inv_flaggy_weight,-inv_exp_weight]
+        ])
+        b = np.array([1.,0.,0.])
+        return cls(*np.linalg.solve(A, b), inv_weights=(inv_build_weight, inv_flaggy_weight, inv_exp_weight))
+
+    """
+    - The inverse of `to_dict'. `spec' has the keys `build_weight', `flaggy_weight' and `exp_weight', or the keys
+    `inv_build_weight', `inv_flaggy_weight' and `inv_exp_weight' (like the settings of `batch_runner'), or both, in
+    which case the weights are used as they are.
+    - Raises `Objective_Error' if it has neither.
+    """
+    @classmethod
+    def from_dict(cls, spec):
+        inv_weights = [spec[name] for name in INV_WEIGHT_NAMES] if all(name in spec for name in INV_WEIGHT_NAMES) else None
+        if all(name in spec for name in WEIGHT_NAMES):
+            return cls(*(spec[name] for name in WEIGHT_NAMES), inv_weights=inv_weights)
+        if all(name in spec for name in INV_WEIGHT_NAMES):
+            return cls.from_inverse_weights(*(spec[name] for name in INV_WEIGHT_NAMES))
+        raise Objective_Error(
+            "An objective needs either the keys %s or the keys %s." % (", ".join(WEIGHT_NAMES), ", ".join(INV_WEIGHT_NAMES))
+        )
+
+    def to_dict(self):
+        spec = {"type": "standard"}
+        spec.update(zip(WEIGHT_NAMES, self.coefficients.tolist()))
+        if self.inv_weights is not None:
+            spec.update(zip(INV_WEIGHT_NAMES, self.inv_weights))
+        return spec
+
+    def obj_fxn(self, cog_array):
+        return cog_array.standard_obj_fxn(self.build_weight, self.flaggy_weight, self.exp_weight)
+
+    def batch_obj_fxn(self, build, flaggy, exp):
+        return build * self.build_weight + flaggy * self.flaggy_weight + exp * self.exp_weight
+
+    """
+    Returns the objectives of a matrix of rates vectors (or of one rates vector), see `Cog_Array.get_rates'.
+    """
+    def evaluate_rates(self, rates):
+        return get_component_matrix(rates) @ self.coefficients
+
+    """
+    Identifies the objective in a `Disk_Cache', see the `obj_key' of `learning_algo'.
+    """
+    def get_key(self):
+        return ("standard_obj_fxn", self.build_weight, self.flaggy_weight, self.exp_weight)
+
+"""
+- An objective given by arbitrary functions, with the interface of `Standard_Objective'. It is the slow fallback for
+objectives that are not a combination of the components: `coefficients' is `None', and `evaluate_rates' calls
+`batch_obj_fxn', or raises `Objective_Error' without it.
+- `key' is its `get_key', `None' by default, which disables the caching of the statistics of the cogs.
+- It can only be sent to worker processes if `obj_fxn' and `batch_obj_fxn' can be pickled, and it has no `to_dict'.
+"""
+class Callable_Objective:
+    def __init__(self, obj_fxn, batch_obj_fxn = None, key = None):
+        self.obj_fxn = obj_fxn
+        self.batch_obj_fxn = batch_obj_fxn
+        self.key = key
+        self.coefficients = None
+
+    def evaluate_rates(self, rates):
+        if self.batch_obj_fxn is None:
+            raise Objective_Error("This objective can only score `Cog_Array's, see `obj_fxn'.")
+        return np.asarray(self.batch_obj_fxn(*get_components(rates)), dtype=np.float64)
+
+    def to_dict(self):
+        raise Objective_Error("An objective given by functions cannot be serialized.")
+
+    def get_key(self):
+        return self.key
+
+class Objective_Error(RuntimeError):
+    pass
+
+WEIGHT_NAMES = ("build_weight", "flaggy_weight", "exp_weight")
+INV_WEIGHT_NAMES = ("inv_build_weight", "inv_flaggy_weight", "inv_exp_weight")
+
+"""
+- Returns `spec' as an objective: objectives are returned as they are, dicts are read by `Standard_Objective.from_dict'
+and a function is the `obj_fxn' of a `Callable_Objective'.
+"""
+def get_objective(spec):
+    if isinstance(spec, (Standard_Objective, Callable_Objective)):
+        return spec
+    if isinstance(spec, dict):
+        return Standard_Objective.from_dict(spec)
+    if callable(spec):
+        return Callable_Objective(spec)
+    raise Objective_Error("Cannot make an objective out of a `%s'." % type(spec).__name__)
+
+"""
+Returns the matrix whose rows are the build rate, flaggy rate and exp multiplier of the rows of `rates', see
+`get_components'.
+"""
+def get_component_matrix(rates):
+    return np.stack(get_components(rates), axis=1)
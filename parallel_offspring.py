@@ -0,0 +1,181 @@
+"""
+Cogstruction: Optimizing cog arrays in Legends of Idleon
+    Copyright (C) 2021 Michael P. Lane
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from batch_evaluator import NUM_RATES, get_components
+from compiled_problem import Compiled_Problem, compile_problem
+from learning_algo import Population, build_problem
+from reproduction_engine import Offspring
+
+"""
+- A pool of `processes' worker processes (default: one per CPU) that breed and score the children of a generation, see
+the `offspring_pool' of `learning_algo'. The children are split into `num_chunks' chunks (default: one per worker), each
+bred by `Reproduction_Engine.breed' and scored by a `Population' in a worker.
+- If `batch_obj_fxn' is given, then the problem is compiled once, published in shared memory (see `Compiled_Problem'),
+and each worker attaches its `Batch_Evaluator' and `Reproduction_Engine' to it without copying, so starting a worker
+costs the same whatever the size of the inventory. Otherwise each worker builds its own cog array template,
+`Batch_Evaluator' and `Reproduction_Engine' once, from the arguments below, which are as in `learning_algo'.
+- Per generation, only the parents' genome matrix and the strengths are sent to the workers, and only genome matrices,
+objectives, rates vectors and the `Offspring' bookkeeping come back.
+- The workers are started by the first `breed', so the cogs they receive have the statistics that `learning_algo' sets.
+- Each chunk draws from its own seed, drawn from the `rng' passed to `breed'. The children depend only on `rng' and
+`num_chunks', not on `processes'.
+- `obj_fxn', `batch_obj_fxn' and `fitness_memo' are sent to the workers, see `parallel_learning_algo'.
+- Use as a context manager, or call `close'.
+"""
+class Offspring_Pool:
+    def __init__(
+            self,
+            cogs,
+            empties_set,
+            flaggies,
+            obj_fxn,
+            batch_obj_fxn = None,
+            processes = None,
+            num_chunks = None,
+            cache = None,
+            fitness_memo = None
+    ):
+        self.cogs = cogs
+        self.empties_set = empties_set
+        self.flaggies = flaggies
+        self.obj_fxn = obj_fxn
+        self.batch_obj_fxn = batch_obj_fxn
+        self.processes = processes
+        self.num_chunks = num_chunks
+        self.cache = cache
+        self.fitness_memo = fitness_memo
+        self._executor = None
+        self._handle = None
+
+    """
+    - Like `Reproduction_Engine.breed', but the children are bred and scored by the workers.
+    - Returns the `Offspring', the objectives and the rates vectors of the children, and how many of them the workers
+    scored rather than found in `fitness_memo'.
+    """
+    def breed(self, genomes, num_children, prob_cross_breed, prob_one_point_mutation, strengths, rng):
+        if self._executor is None:
+            self._start()
+        num_chunks = self.num_chunks or self.processes or os.cpu_count()
+        sizes = [len(chunk) for chunk in np.array_split(np.arange(num_children), num_chunks) if len(chunk) > 0]
+        seeds = rng.integers(2**63, size=len(sizes))
+        futures = [
+            self._executor.submit(
+                _breed_chunk, genomes, size, prob_cross_breed, prob_one_point_mutation, strengths, int(seed)
+            )
+            for size,seed in zip(sizes, seeds)
+        ]
+        chunks = [future.result() for future in futures]
+        offspring = Offspring(*(np.concatenate([chunk[k] for chunk in chunks]) for k in range(5)))
+        return (
+            offspring,
+            np.concatenate([chunk[5] for chunk in chunks]),
+            np.concatenate([chunk[6] for chunk in chunks]),
+            sum(chunk[7] for chunk in chunks)
+        )
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._handle is not None:
+            self._handle.unlink()
+            self._handle = None
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _start(self):
+        if self.batch_obj_fxn is not None:
+            self._handle = compile_problem(self.cogs, self.empties_set, self.flaggies, self.cache).publish()
+            initializer = _attach_worker
+            initargs = (self._handle, self.batch_obj_fxn, self.fitness_memo)
+        else:
+            initializer = _init_worker
+            initargs = (
+                self.cogs,
+                self.empties_set,
+                self.flaggies,
+                self.obj_fxn,
+                self.batch_obj_fxn,
+                self.cache,
+                self.fitness_memo
+            )
+        self._executor = ProcessPoolExecutor(self.processes, initializer=initializer, initargs=initargs)
+
+_worker = None
+_problem = None
+
+def _attach_worker(handle, batch_obj_fxn, fitness_memo):
+    global _worker, _problem
+    _problem = Compiled_Problem.attach(handle)
+    _worker = (None, _problem.get_evaluator(), _problem.get_engine(), None, batch_obj_fxn, fitness_memo)
+
+def _init_worker(cogs, empties_set, flaggies, obj_fxn, batch_obj_fxn, cache, fitness_memo):
+    global _worker
+    _, template, evaluator, engine = build_problem(cogs, empties_set, flaggies, batch_obj_fxn, cache=cache)
+    _worker = (template, evaluator, engine, obj_fxn, batch_obj_fxn, fitness_memo)
+
+def _breed_chunk(genomes, num_children, prob_cross_breed, prob_one_point_mutation, strengths, seed):
+    template, evaluator, engine, obj_fxn, batch_obj_fxn, fitness_memo = _worker
+    engine.rng = np.random.default_rng(seed)
+    offspring = engine.breed(genomes, num_children, prob_cross_breed, prob_one_point_mutation, strengths)
+    if template is None:
+        values, rates, num_evaluated = _score_compiled(offspring.genomes, evaluator, batch_obj_fxn, fitness_memo)
+    else:
+        children = Population.from_genomes(template, offspring.genomes, obj_fxn, batch_obj_fxn, evaluator, fitness_memo)
+        values, rates, num_evaluated = children.values, children.rates, children.num_evaluated
+    return (
+        offspring.genomes,
+        offspring.schemes,
+        offspring.parents,
+        offspring.cells,
+        offspring.old_cogs,
+        values,
+        rates,
+        num_evaluated
+    )
+
+"""
+Score `genomes' as a `Population' would, with the same memo keys as `Population._get_keys', but from the arrays of the
+attached `Compiled_Problem'. Returns the objectives, the rates vectors and how many genomes were not found in
+`fitness_memo'.
+"""
+def _score_compiled(genomes, evaluator, batch_obj_fxn, fitness_memo):
+    values = np.full(len(genomes), np.nan)
+    rates = np.full((len(genomes), NUM_RATES), np.nan)
+    keys = None
+    if fitness_memo is not None:
+        keys = [genome.tobytes() for genome in _problem.arrays["canonical_indices"][genomes]]
+        for k,key in enumerate(keys):
+            entry = fitness_memo.get(key)
+            if entry is not None:
+                values[k], rates[k] = entry
+    rows = np.flatnonzero(np.isnan(values))
+    if len(rows) > 0:
+        rates[rows] = evaluator.evaluate_rates(genomes[rows])
+        values[rows] = batch_obj_fxn(*get_components(rates[rows]))
+        if fitness_memo is not None:
+            for k in rows:
+                fitness_memo.put(keys[k], (values[k], rates[k].copy()))
+    return values, rates, len(rows)
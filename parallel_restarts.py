@@ -0,0 +1,164 @@
+"""
+Cogstruction: Optimizing cog arrays in Legends of Idleon
+    Copyright (C) 2021 Michael P. Lane
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+"""
+
+import contextlib
+import copy
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from learning_algo import estimate_average_std_objs, learning_algo
+
+"""
+- Like `learning_algo', but the `controller.num_restarts' restarts run at the same time in a pool of `processes' worker
+processes (default: one per CPU). Each restart is a `learning_algo' run with a single restart. Returns the best cog array
+and its objective.
+- Restarts are seeded from `np.random.SeedSequence(seed)': restart `i' draws from its own child sequence, both for its
+NumPy `Generator' and for `random'. The result depends only on `seed', not on `processes' or on the order in which
+restarts finish.
+- The statistics of `get_average_std_objs' are estimated once, in this process, before the pool starts.
+- `obj_fxn' and `batch_obj_fxn' are sent to the workers, so they must be picklable, see `Standard_Objective'.
+- Each worker gets its own copy of `fitness_memo', unless it is a `Shared_Fitness_Table', which all workers share.
+- Each restart polishes its `polish_top_k' best cog arrays, see `learning_algo'.
+- Checkpoints are not supported.
+- The output of the workers is discarded unless `verbose' is `True'. As restarts finish, their bests are merged into
+`controller.best' and printed.
+"""
+def parallel_learning_algo(
+        cogs,
+        empties_set,
+        flaggies,
+        pop_size,
+        obj_fxn,
+        factor_base,
+        max_factor,
+        max_multiplier,
+        controller,
+        batch_obj_fxn=None,
+        seed=None,
+        processes=None,
+        cache=None,
+        obj_key=None,
+        fitness_memo=None,
+        reject_duplicates=False,
+        polish_top_k=0,
+        verbose=False
+):
+    controller.print_init_info()
+
+    stats_seed, *restart_seeds = np.random.SeedSequence(seed).spawn(controller.num_restarts + 1)
+    estimate_average_std_objs(
+        cogs, empties_set, flaggies, obj_fxn, batch_obj_fxn, np.random.default_rng(stats_seed), cache, obj_key
+    )
+
+    restart_controller = copy.copy(controller)
+    restart_controller.set_restart_info(1)
+
+    with ProcessPoolExecutor(processes) as executor:
+        futures = {
+            executor.submit(
+                _run_restart,
+                restart_seed,
+                cogs,
+                empties_set,
+                flaggies,
+                pop_size,
+                obj_fxn,
+                factor_base,
+                max_factor,
+                max_multiplier,
+                restart_controller,
+                batch_obj_fxn,
+                cache,
+                obj_key,
+                fitness_memo,
+                reject_duplicates,
+                polish_top_k,
+                verbose
+            ): i
+            for i,restart_seed in enumerate(restart_seeds)
+        }
+        best_index = None
+        for future in as_completed(futures):
+            i = futures[future]
+            best = future.result()
+            controller.restart_count += 1
+            if controller.best is None or (best[1], -i) > (controller.best[1], -best_index):
+                controller.best = best
+                best_index = i
+            print("Restart %d finished:                  %.4f" % (i, best[1]))
+            print("Best so far:                          %.4f" % controller.best[1])
+    return controller.best
+
+def _run_restart(
+        restart_seed,
+        cogs,
+        empties_set,
+        flaggies,
+        pop_size,
+        obj_fxn,
+        factor_base,
+        max_factor,
+        max_multiplier,
+        controller,
+        batch_obj_fxn,
+        cache,
+        obj_key,
+        fitness_memo,
+        reject_duplicates,
+        polish_top_k,
+        verbose
+):
+    rng = seed_worker(restart_seed)
+    with worker_output(verbose):
+        return learning_algo(
+            cogs,
+            empties_set,
+            flaggies,
+            pop_size,
+            obj_fxn,
+            factor_base,
+            max_factor,
+            max_multiplier,
+            controller,
+            batch_obj_fxn,
+            rng,
+            cache,
+            obj_key,
+            fitness_memo=fitness_memo,
+            reject_duplicates=reject_duplicates,
+            polish_top_k=polish_top_k
+        )
+
+"""
+Seed `random' from a child of the `SeedSequence' `seed_seq' and return a NumPy `Generator' drawn from another.
+"""
+def seed_worker(seed_seq):
+    random_seed, rng_seed = seed_seq.spawn(2)
+    random.seed(int(random_seed.generate_state(1)[0]))
+    return np.random.default_rng(rng_seed)
+
+"""
+A context in which the output of a worker is printed if `verbose' is `True', and discarded otherwise.
+"""
+@contextlib.contextmanager
+def worker_output(verbose):
+    if verbose:
+        yield
+    else:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            yield
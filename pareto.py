@@ -0,0 +1,199 @@
+"""
+Cogstruction: Optimizing cog arrays in Legends of Idleon
+    Copyright (C) 2021 Michael P. Lane
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+"""
+
+import numpy as np
+
+from learning_algo import Population, build_problem, estimate_average_std_objs, run_generation
+from objectives import get_component_matrix
+from strength_model import Strength_Model
+
+"""
+- A `Population' that is culled by NSGA-II selection on the components of its rates vectors (the build rate, flaggy rate
+and exp multiplier, see `get_components') instead of by its objectives: rows are kept front by front (see
+`get_pareto_ranks'), and the last front that fits is cut by crowding distance (see `get_crowding_distances').
+- The objectives `values' are still computed, for the strength updates of `run_generation' and the progress of
+`Iteration_Controller', but they do not decide which rows survive.
+- The rates of every row must be known, so `batch_obj_fxn' is required.
+"""
+class Pareto_Population(Population):
+
+    """
+    Keep the `pop_size' rows that come first by Pareto rank, then by decreasing crowding distance.
+    """
+    def cull(self,pop_size = None):
+        N = self.pop_size if pop_size is None else pop_size
+        if N < self._size:
+            points = self.get_components()
+            ranks = get_pareto_ranks(points, N)
+            distances = get_crowding_distances(points, ranks)
+            self._reorder(np.lexsort((-distances, ranks))[:N])
+            self.is_sorted = False
+        return self
+
+    """
+    Returns the matrix whose rows are the build rate, flaggy rate and exp multiplier of the rows of the population.
+    """
+    def get_components(self):
+        return get_component_matrix(self.rates)
+
+    """
+    Returns the indices of the rows that no other row dominates.
+    """
+    def get_front(self):
+        return np.flatnonzero(get_pareto_ranks(self.get_components(), 1) == 0)
+
+class Pareto_Error(RuntimeError):
+    pass
+
+"""
+- Returns the Pareto rank of each row of `points', where every column is maximized: rank 0 is the front of rows that
+no row dominates, rank 1 the front of the rest, and so on.
+- The ranks are found by peeling the fronts off a dominance matrix, all rows at a time. If `num_needed' is given, then
+peeling stops once that many rows are ranked, and the other rows all get the next rank.
+"""
+def get_pareto_ranks(points, num_needed = None):
+    N = len(points)
+    num_needed = N if num_needed is None else num_needed
+    weakly = np.ones((N, N), dtype=bool)
+    strictly = np.zeros((N, N), dtype=bool)
+    for column in points.T:
+        weakly &= column[:,None] >= column[None,:]
+        strictly |= column[:,None] > column[None,:]
+    dominates = weakly & strictly
+    num_dominators = np.count_nonzero(dominates, axis=0)
+    ranks = np.full(N, -1, dtype=np.intp)
+    remaining = np.ones(N, dtype=bool)
+    rank = 0
+    while N - np.count_nonzero(remaining) < num_needed:
+        front = remaining & (num_dominators == 0)
+        ranks[front] = rank
+        remaining &= ~front
+        num_dominators -= np.count_nonzero(dominates[front], axis=0)
+        rank += 1
+    ranks[remaining] = rank
+    return ranks
+
+"""
+- Returns the crowding distance of each row of `points' within its front of `ranks': the sum over the columns of the gap
+between its two neighbours in that column, divided by the range of the column in the front. The rows at either end of a
+front in some column are infinitely far.
+- Computed for all fronts at once, with one sort per column.
+"""
+def get_crowding_distances(points, ranks):
+    N = len(points)
+    distances = np.zeros(N)
+    if N == 0:
+        return distances
+    for column in points.T:
+        order = np.lexsort((column, ranks))
+        values = column[order]
+        fronts = ranks[order]
+        first = np.r_[True, fronts[1:] != fronts[:-1]]
+        last = np.r_[fronts[1:] != fronts[:-1], True]
+        starts, ends = np.flatnonzero(first), np.flatnonzero(last)
+        spans = np.repeat(values[ends] - values[starts], ends - starts + 1)
+        gaps = np.zeros(N)
+        gaps[1:-1] = values[2:] - values[:-2]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            gaps = np.where(spans > 0, gaps / spans, 0.)
+        gaps[first | last] = np.inf
+        distances[order] += gaps
+    return distances
+
+"""
+- The multi-objective mode of `learning_algo'. The arguments are as in `learning_algo', but each population is a
+`Pareto_Population', so it spreads over the tradeoffs between build rate, flaggy rate and exp multiplier instead of
+converging to the best objective. One run approximates the whole Pareto front, instead of one run per set of weights.
+- `obj_fxn' and `batch_obj_fxn' still guide the strengths of the cogs and decide when `controller' stops, see
+`Pareto_Population'. `batch_obj_fxn' is required.
+- Returns the fronts of all restarts merged into one, without interchangeable cog arrays, as a list of tuples of a cog
+array, its objective and its build rate, flaggy rate and exp multiplier, by decreasing build rate.
+- Checkpoints are not supported.
+"""
+def pareto_learning_algo(
+        cogs,
+        empties_set,
+        flaggies,
+        pop_size,
+        obj_fxn,
+        factor_base,
+        max_factor,
+        max_multiplier,
+        controller,
+        batch_obj_fxn,
+        rng=None,
+        cache=None,
+        obj_key=None,
+        fitness_memo=None,
+        reject_duplicates=False,
+        offspring_pool=None
+):
+    if batch_obj_fxn is None:
+        raise Pareto_Error("The Pareto mode needs `batch_obj_fxn'.")
+
+    controller.print_init_info()
+
+    estimate_average_std_objs(cogs, empties_set, flaggies, obj_fxn, batch_obj_fxn, rng, cache, obj_key)
+    registry, cog_array_template, evaluator, engine = build_problem(
+        cogs, empties_set, flaggies, batch_obj_fxn, rng, cache
+    )
+    average_objs = np.array([cog.get_average_std_obj()[0] for cog in registry])
+    std_objs = np.array([cog.get_average_std_obj()[1] for cog in registry])
+    strength_model = Strength_Model(registry, empties_set)
+
+    fronts = []
+    while controller.restart_loop():
+        strength_model.instantiate()
+        pop = Pareto_Population.from_genomes(
+            cog_array_template,
+            engine.random_genomes(pop_size),
+            obj_fxn,
+            batch_obj_fxn,
+            evaluator,
+            fitness_memo,
+            reject_duplicates
+        )
+        controller.set_pop(pop)
+        controller.print_restart_status_open()
+
+        while controller.generation_loop():
+            controller.print_generation_status()
+            run_generation(
+                engine,
+                pop,
+                controller,
+                strength_model,
+                factor_base,
+                max_factor,
+                max_multiplier,
+                average_objs,
+                std_objs,
+                offspring_pool
+            )
+        strength_model.write_to_cogs()
+        controller.print_restart_status_close()
+
+        front = pop.get_front()
+        fronts.append((pop.genomes[front], pop.values[front], pop.rates[front]))
+
+    genomes, values, rates = (np.concatenate([front[k] for front in fronts]) for k in range(3))
+    merged = Pareto_Population.from_rows(
+        cog_array_template, genomes, values, rates, obj_fxn, batch_obj_fxn, evaluator
+    )
+    _, unique = np.unique(registry.get_canonical_indices()[merged.genomes], axis=0, return_index=True)
+    front = unique[np.isin(unique, merged.get_front())]
+    points = merged.get_components()
+    front = front[np.argsort(-points[front,0], kind="stable")]
+    return [(merged.get_array(i), float(merged.values[i]), tuple(points[i].tolist())) for i in front]
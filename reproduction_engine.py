@@ -0,0 +1,279 @@
+"""
+Cogstruction: Optimizing cog arrays in Legends of Idleon
+    Copyright (C) 2021 Michael P. Lane
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+"""
+
+import numpy as np
+
+from cog_array_stuff import EMPTY_CELL, GENOME_DTYPE
+
+CROSS_BREED = 0
+ONE_POINT_MUTATION = 1
+TWO_POINT_MUTATION = 2
+BREEDING_SCHEMES = ("cross_breed", "one_point_mutation", "two_point_mutation")
+
+"""
+- A generation of children made by `Reproduction_Engine.breed', one per row of `genomes'.
+- `schemes[i]' is `CROSS_BREED', `ONE_POINT_MUTATION' or `TWO_POINT_MUTATION'.
+- `parents[i]' are the rows of the parents in the genome matrix passed to `Reproduction_Engine.breed'. The second parent
+is `-1' unless the child was cross-bred.
+- `cells[i]' are the cells changed by a mutation, or `-1'. A one-point mutation only changes `cells[i,0]'.
+- `old_cogs[i]' is the registry index of the cog removed by a one-point mutation, or `EMPTY_CELL'.
+"""
+class Offspring:
+    def __init__(self, genomes, schemes, parents, cells, old_cogs):
+        self.genomes = genomes
+        self.schemes = schemes
+        self.parents = parents
+        self.cells = cells
+        self.old_cogs = old_cogs
+
+    def __len__(self):
+        return len(self.schemes)
+
+"""
+- Makes a whole generation of children at once, as a genome matrix (see `Cog_Array.genome'). This is the batched
+counterpart of `Cog_Array.cross_breed', `Cog_Array.one_point_mutation' and `Cog_Array.two_point_mutation'.
+- All random draws come from the NumPy `Generator' `rng'.
+- `excluded[i,cell]' is `True' if the cog with registry index `i' should not be placed at `cell', see
+`Cog_Array.excludes'. The last row is for `EMPTY_CELL'.
+- There should be one `Reproduction_Engine' per cog array template. All cogs must be registered before it is built.
+- `from_compiled' builds one from a `Compiled_Problem' instead, without a template.
+"""
+class Reproduction_Engine:
+    def __init__(self, template, rng = None):
+        self.template = template
+        self.registry = template.registry
+        self.empties_set = template.empties_set
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.num_cogs = len(self.registry)
+        self.total_coords = self.empties_set.total_coords
+        self.cells = self.empties_set.cells
+        self.average_objs = None
+        self.excluded = np.zeros((len(self.registry) + 1, self.empties_set.total_coords), dtype=bool)
+        for i,cog in enumerate(self.registry):
+            for coords in self.empties_set.coords_list:
+                if template.excludes(coords, cog):
+                    self.excluded[i, self.empties_set.get_cell(coords)] = True
+
+    """
+    - A `Reproduction_Engine' that reads the arrays of `problem', see `Compiled_Problem'. It has no `template',
+    `registry' or `empties_set', and its weights use the averages `problem.arrays["average_objs"]'.
+    """
+    @classmethod
+    def from_compiled(cls, problem, rng = None):
+        engine = cls.__new__(cls)
+        engine.template = None
+        engine.registry = None
+        engine.empties_set = None
+        engine.rng = rng if rng is not None else np.random.default_rng()
+        engine.num_cogs = problem.num_cogs
+        engine.total_coords = problem.total_coords
+        engine.cells = problem.arrays["cells"]
+        engine.average_objs = problem.arrays["average_objs"]
+        engine.excluded = problem.arrays["excluded"]
+        return engine
+
+    """
+    - Returns a genome matrix of `num_genomes' random cog arrays, one per row. This is the batched counterpart of
+    `Cog_Array.instantiate_randomly', with the same distribution.
+    - The non-empty cells are filled in a random order. Each cell gets a uniformly random unused cog among those that are
+    not excluded at that cell, or among all unused cogs if every one is excluded. If there are more cells than cogs, then
+    the last cells of the order stay `EMPTY_CELL'.
+    - If `fixed_cogs' and `fixed_cells' are given, then row `k' has the cog with registry index `fixed_cogs[k]' at
+    `fixed_cells[k]' and the rest is random as above, like `Cog_Array.randomize' after `Cog_Array.move_cog_from_spares'.
+    - Cogs with the same row of `excluded' are interchangeable, so only the group of the cog is drawn at each cell. The
+    cog itself is the next one of a random order of that group.
+    """
+    def random_genomes(self, num_genomes, fixed_cogs = None, fixed_cells = None):
+        num_cogs = self.num_cogs
+        genomes = np.full((num_genomes, self.total_coords), EMPTY_CELL, dtype=GENOME_DTYPE)
+        if num_cogs == 0 or num_genomes == 0:
+            return genomes
+        group_excluded, groups, sizes = np.unique(
+            self.excluded[:num_cogs], axis=0, return_inverse=True, return_counts=True
+        )
+        groups = groups.reshape(-1)
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        rows = np.arange(num_genomes)
+        cog_keys = self.rng.random((num_genomes, num_cogs)) + 2 * groups
+        cell_keys = self.rng.random((num_genomes, self.total_coords))
+        remaining = np.tile(sizes, (num_genomes, 1))
+        num_steps = min(len(self.cells), num_cogs)
+        if fixed_cogs is not None:
+            fixed_cogs = np.asarray(fixed_cogs, dtype=np.intp)
+            fixed_cells = np.asarray(fixed_cells, dtype=np.intp)
+            genomes[rows, fixed_cells] = fixed_cogs
+            cog_keys[rows, fixed_cogs] = 2 * groups[fixed_cogs] + 1.5
+            cell_keys[rows, fixed_cells] = 2.0
+            remaining[rows, groups[fixed_cogs]] -= 1
+            num_steps -= 1
+        orders = np.argsort(cog_keys, axis=1)
+        cell_orders = self.cells[np.argsort(cell_keys[:, self.cells], axis=1)]
+        for k in range(num_steps):
+            cells = cell_orders[:,k]
+            counts = np.where(group_excluded[:,cells].T, 0, remaining)
+            totals = counts.sum(axis=1)
+            fallback = totals == 0
+            counts[fallback] = remaining[fallback]
+            totals[fallback] = counts[fallback].sum(axis=1)
+            cumulative = np.cumsum(counts, axis=1)
+            group = np.count_nonzero(cumulative <= self.rng.integers(totals)[:,None], axis=1)
+            genomes[rows, cells] = orders[rows, starts[group] + sizes[group] - remaining[rows, group]]
+            remaining[rows, group] -= 1
+        return genomes
+
+    """
+    - Returns a float ndarray of shape `(len(registry) + 1, total_coords)'. Entry `[i,cell]' is
+    `cog.get_strength(coords) * cog.get_average_std_obj()[0]' for the cog with registry index `i'. The last row, for
+    `EMPTY_CELL', is zero.
+    - These are the weights with which `Cog_Array.cross_breed' chooses between the two parents.
+    - If `strengths' is given, for example by `Strength_Model.get_strengths', then it is used instead of `cog.strengths'.
+    It must be given if there is no `registry'.
+    """
+    def get_weights(self, strengths = None):
+        weights = np.zeros((self.num_cogs + 1, self.total_coords))
+        if self.registry is None:
+            weights[:-1] = strengths * self.average_objs[:,None]
+            return weights
+        for i,cog in enumerate(self.registry):
+            cog_strengths = strengths[i] if strengths is not None else cog.strengths.reshape(-1)
+            weights[i] = cog_strengths * cog.get_average_std_obj()[0]
+        return weights
+
+    """
+    - Make `num_children' children of the rows of `genomes' and return them as an `Offspring'.
+    - Each child is cross-bred with probability `prob_cross_breed', one-point mutated with probability
+    `prob_one_point_mutation' and two-point mutated otherwise, see `Iteration_Controller.set_breeding_scheme_info'. If no
+    cog would be spare, then one-point mutations are replaced by two-point mutations.
+    - Parents are drawn uniformly; the two parents of a cross-breed are distinct.
+    - `strengths' is passed to `self.get_weights'.
+    """
+    def breed(self, genomes, num_children, prob_cross_breed, prob_one_point_mutation, strengths = None):
+        rand = self.rng.random(num_children)
+        schemes = np.full(num_children, TWO_POINT_MUTATION, dtype=np.intp)
+        if self.num_cogs > len(self.cells):
+            schemes[rand >= 1 - prob_cross_breed - prob_one_point_mutation] = ONE_POINT_MUTATION
+        schemes[rand >= 1 - prob_cross_breed] = CROSS_BREED
+
+        parents = np.full((num_children, 2), -1, dtype=np.intp)
+        parents[:,0] = self.rng.integers(genomes.shape[0], size=num_children)
+        rows = np.flatnonzero(schemes == CROSS_BREED)
+        if len(rows) > 0:
+            if genomes.shape[0] < 2:
+                raise RuntimeError("Cross-breeding requires at least two genomes.")
+            others = self.rng.integers(genomes.shape[0] - 1, size=len(rows))
+            parents[rows,1] = others + (others >= parents[rows,0])
+
+        children = genomes[parents[:,0]]
+        cells = np.full((num_children, 2), -1, dtype=np.intp)
+        old_cogs = np.full(num_children, EMPTY_CELL, dtype=np.intp)
+        if len(rows) > 0:
+            weights = self.get_weights(strengths)
+            self._cross_breed(children, rows, genomes[parents[rows,0]], genomes[parents[rows,1]], weights)
+        rows = np.flatnonzero(schemes == ONE_POINT_MUTATION)
+        if len(rows) > 0:
+            self._one_point_mutation(children, rows, cells, old_cogs)
+        rows = np.flatnonzero(schemes == TWO_POINT_MUTATION)
+        if len(rows) > 0:
+            self._two_point_mutation(children, rows, cells)
+        return Offspring(children, schemes, parents, cells, old_cogs)
+
+    """
+    - Vectorized `Cog_Array.cross_breed'. At each non-empty cell, the child prefers the cog of one parent over the other
+    with odds given by `weights', see `self.get_weights'.
+    - Permutation repair: a cog can be preferred at several cells of the same child. It goes to the one that comes first
+    in a random order of the cells. The other cells take the other parent's cog if that is still unused, and otherwise a
+    random unused cog.
+    """
+    def _cross_breed(self, children, rows, genomes1, genomes2, weights):
+        cogs1 = genomes1[:, self.cells].astype(np.intp)
+        cogs2 = genomes2[:, self.cells].astype(np.intp)
+        weights1 = weights[cogs1, self.cells]
+        weights2 = weights[cogs2, self.cells]
+        total = weights1 + weights2
+        prob1 = np.where(total > 0, weights1 / np.where(total > 0, total, 1.0), 0.5)
+        take1 = self.rng.random(cogs1.shape) <= prob1
+        preferred = np.where(take1, cogs1, cogs2)
+        alternate = np.where(take1, cogs2, cogs1)
+        priority = self.rng.random(cogs1.shape)
+
+        out = np.full(cogs1.shape, EMPTY_CELL, dtype=np.intp)
+        used = np.zeros((len(rows), self.num_cogs + 1), dtype=bool)
+        done = preferred == EMPTY_CELL
+        for candidates in (preferred, alternate):
+            won = self._claim(candidates, priority, used, ~done)
+            out[won] = candidates[won]
+            used[np.nonzero(won)[0], candidates[won]] = True
+            done |= won
+        while not np.all(done):
+            active = np.flatnonzero(~np.all(done, axis=1))
+            j = np.argmax(np.where(done[active], -1.0, priority[active]), axis=1)
+            new = self._draw_unused(used[active], self.cells[j])
+            out[active, j] = new
+            placed = new != EMPTY_CELL
+            used[active[placed], new[placed]] = True
+            done[active, j] = True
+        children[rows[:,None], self.cells] = out
+
+    """
+    - Returns a boolean ndarray like `candidates': `True' where a pending cell gets its candidate cog.
+    - A candidate must be a cog that is not yet `used' in its row. If several pending cells of a row have the same
+    candidate, then the one of highest `priority' gets it.
+    """
+    def _claim(self, candidates, priority, used, pending):
+        row_indices = np.arange(candidates.shape[0])[:,None]
+        ok = pending & (candidates != EMPTY_CELL) & ~used[row_indices, candidates]
+        rows, cols = np.nonzero(ok)
+        keys = rows * used.shape[1] + candidates[rows, cols]
+        order = np.lexsort((-priority[rows, cols], keys))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = keys[order[1:]] != keys[order[:-1]]
+        won = np.zeros(candidates.shape, dtype=bool)
+        won[rows[order[first]], cols[order[first]]] = True
+        return won
+
+    """
+    - For each row of `used', draw a random unused cog for the cell of that row in `cells'. Cogs that are not excluded
+    at that cell are preferred, like `Cog_Array.move_random_cog_from_spares'.
+    - Returns an int ndarray of registry indices, or `EMPTY_CELL' where every cog is used.
+    """
+    def _draw_unused(self, used, cells):
+        num_cogs = self.num_cogs
+        keys = self.rng.random((len(cells), num_cogs)) + self.excluded[:num_cogs, cells].T + 2 * used[:, :num_cogs]
+        new = np.argmin(keys, axis=1)
+        return np.where(keys[np.arange(len(cells)), new] < 2, new, EMPTY_CELL)
+
+    """
+    Vectorized `Cog_Array.one_point_mutation': replace the cog at a random non-empty cell by a random spare.
+    """
+    def _one_point_mutation(self, children, rows, cells, old_cogs):
+        mutated = self.cells[self.rng.integers(len(self.cells), size=len(rows))]
+        used = np.zeros((len(rows), self.num_cogs + 1), dtype=bool)
+        used[np.arange(len(rows))[:,None], children[rows]] = True
+        old_cogs[rows] = children[rows, mutated]
+        children[rows, mutated] = self._draw_unused(used, mutated)
+        cells[rows,0] = mutated
+
+    """
+    Vectorized `Cog_Array.two_point_mutation': swap the cogs at two distinct random non-empty cells.
+    """
+    def _two_point_mutation(self, children, rows, cells):
+        first = self.rng.integers(len(self.cells), size=len(rows))
+        second = self.rng.integers(len(self.cells) - 1, size=len(rows))
+        second += second >= first
+        cells1 = self.cells[first]
+        cells2 = self.cells[second]
+        children[rows, cells1], children[rows, cells2] = children[rows, cells2], children[rows, cells1]
+        cells[rows,0] = cells1
+        cells[rows,1] = cells2
@@ -0,0 +1,272 @@
+"""
+Cogstruction: Optimizing cog arrays in Legends of Idleon
+    Copyright (C) 2021 Michael P. Lane
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from batch_runner import get_settings, init_worker, optimize_inventory
+from file_readers import parse_cog_datas, parse_empties_datas
+from learning_algo import Iteration_Controller
+
+MAX_LINE_BYTES = 2**24
+
+"""
+- A local optimization service. Clients connect to a Unix socket or a localhost TCP port and send one request per
+connection as a line of JSON:
+    `{"name": ..., "cog_datas": <CSV text>, "empties_datas": <CSV text>, "settings": {...}}'
+where the CSV texts are in the formats of `read_cog_datas' and `read_empties_datas', and `settings' overrides
+`DEFAULT_SETTINGS' of `batch_runner', for example the weights `inv_build_weight', `inv_flaggy_weight' and
+`inv_exp_weight'. `name' and `settings' are optional.
+- The service answers with lines of JSON, each with an `"event"':
+    - `"queued"', with the number of requests ahead of it;
+    - `"progress"', once per generation, with the `"restart"', the `"generation"' and the `"best"' objective so far;
+    - `"done"', with the fields of the `Batch_Result', including the `"cog_array"' as text, and whether it was
+    `"cached"'; or `"error"', with the `"error"'. The connection is then closed.
+- Requests are run by `processes' worker processes (default: one per CPU), which keep their boards, influence tables,
+`excludes_dict's and cog statistics in memory between requests, see `optimize_inventory'. With `cache_dirname', they are
+also stored on disk and shared by the workers. A request with new cogs only estimates the statistics of those.
+- The results of the last `max_results' requests are kept, so a repeated request is answered at once.
+- Worker processes are spawned rather than forked, so that they do not inherit the sockets of open connections.
+"""
+class Optimization_Service:
+    def __init__(self, processes = None, cache_dirname = None, max_results = 256):
+        self.processes = processes
+        self.cache_dirname = cache_dirname
+        self.max_results = max_results
+        self.num_pending = 0
+        self._results = OrderedDict()
+        self._executor = None
+        self._manager = None
+        self._progress_queue = None
+        self._subscribers = {}
+        self._next_request_id = 0
+        self._loop = None
+        self._reader = None
+        self._servers = []
+
+    async def start_unix(self, path):
+        self._start()
+        server = await asyncio.start_unix_server(self._handle, path, limit=MAX_LINE_BYTES)
+        self._servers.append(server)
+        return server
+
+    async def start_tcp(self, host = "127.0.0.1", port = 0):
+        self._start()
+        server = await asyncio.start_server(self._handle, host, port, limit=MAX_LINE_BYTES)
+        self._servers.append(server)
+        return server
+
+    """
+    - Run the request `payload' (see `Optimization_Service'), calling `send' with each event. Returns the last event.
+    """
+    async def submit(self, payload, send):
+        self._start()
+        try:
+            name, cog_datas, empties, settings = _parse_payload(payload)
+        except Exception as e:
+            event = {"event": "error", "error": "%s: %s" % (type(e).__name__, e)}
+            await send(event)
+            return event
+
+        key = _get_payload_key(name, cog_datas, empties, settings)
+        if key in self._results:
+            self._results.move_to_end(key)
+            event = dict(self._results[key], cached=True)
+            await send(event)
+            return event
+
+        request_id = self._next_request_id
+        self._next_request_id += 1
+        progress = asyncio.Queue()
+        self._subscribers[request_id] = progress
+        await send({"event": "queued", "ahead": self.num_pending})
+        self.num_pending += 1
+        future = self._loop.run_in_executor(
+            self._executor, _run_request, request_id, self._progress_queue, name, cog_datas, empties, settings
+        )
+        try:
+            while True:
+                waiter = asyncio.ensure_future(progress.get())
+                done, _ = await asyncio.wait((future, waiter), return_when=asyncio.FIRST_COMPLETED)
+                if waiter in done:
+                    await send(waiter.result())
+                else:
+                    waiter.cancel()
+                    break
+            result = future.result()
+        finally:
+            self.num_pending -= 1
+            del self._subscribers[request_id]
+
+        if result.status == "ok":
+            event = {
+                "event": "done",
+                "name": result.name,
+                "objective": result.objective,
+                "build_rate": result.build_rate,
+                "flaggy_rate": result.flaggy_rate,
+                "exp_mult": result.exp_mult,
+                "seconds": result.seconds,
+                "evaluations": result.evaluations,
+                "cog_array": result.cog_array_str,
+                "cached": False
+            }
+            self._results[key] = event
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+        else:
+            event = {"event": "error", "error": result.error}
+        await send(event)
+        return event
+
+    async def close(self):
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+        if self._executor is not None:
+            await self._loop.run_in_executor(None, self._executor.shutdown)
+            self._progress_queue.put(None)
+            await self._loop.run_in_executor(None, self._reader.join)
+            self._manager.shutdown()
+            self._executor = None
+
+    def _start(self):
+        if self._executor is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        context = multiprocessing.get_context("spawn")
+        self._manager = context.Manager()
+        self._progress_queue = self._manager.Queue()
+        self._executor = ProcessPoolExecutor(
+            self.processes, mp_context=context, initializer=init_worker, initargs=(self.cache_dirname,)
+        )
+        self._reader = threading.Thread(target=self._read_progress, daemon=True)
+        self._reader.start()
+
+    """
+    Forward the progress reported by the workers to the requests, from a thread.
+    """
+    def _read_progress(self):
+        while True:
+            item = self._progress_queue.get()
+            if item is None:
+                break
+            self._loop.call_soon_threadsafe(self._forward_progress, *item)
+
+    def _forward_progress(self, request_id, restart, generation, best):
+        if request_id in self._subscribers:
+            self._subscribers[request_id].put_nowait(
+                {"event": "progress", "restart": restart, "generation": generation, "best": best}
+            )
+
+    async def _handle(self, reader, writer):
+        async def send(event):
+            writer.write(json.dumps(event).encode() + b"\n")
+            await writer.drain()
+        try:
+            line = await reader.readline()
+            try:
+                payload = json.loads(line)
+            except ValueError as e:
+                await send({"event": "error", "error": "Invalid JSON: %s" % e})
+            else:
+                await self.submit(payload, send)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+"""
+An `Iteration_Controller' that puts the progress of request `request_id' in `queue' instead of printing it.
+"""
+class Reporting_Controller(Iteration_Controller):
+    def __init__(self, request_id, queue):
+        super().__init__()
+        self.request_id = request_id
+        self.queue = queue
+
+    def print_generation_status(self):
+        self.queue.put((
+            self.request_id, self.restart_count - 1, self.generation_count - 1, float(self.curr_pop.get_best_value())
+        ))
+
+"""
+- Send the request `payload' to the service at the Unix socket `path', or at `host' and `port', and yield the events of
+the answer, see `Optimization_Service'.
+"""
+async def request(payload, path = None, host = "127.0.0.1", port = None):
+    if path is not None:
+        reader, writer = await asyncio.open_unix_connection(path, limit=MAX_LINE_BYTES)
+    else:
+        reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE_BYTES)
+    try:
+        writer.write(json.dumps(payload).encode() + b"\n")
+        await writer.drain()
+        while True:
+            line = await reader.readline()
+            if len(line) == 0:
+                break
+            yield json.loads(line)
+    finally:
+        writer.close()
+
+def _parse_payload(payload):
+    name = str(payload.get("name", "request"))
+    cog_datas = parse_cog_datas(payload["cog_datas"].splitlines(), "cog_datas")
+    empties = parse_empties_datas(payload["empties_datas"].splitlines(), "empties_datas")
+    settings = get_settings(payload.get("settings"))
+    return name, cog_datas, empties, settings
+
+def _get_payload_key(name, cog_datas, empties, settings):
+    return hashlib.sha256(repr((
+        name,
+        [(cog_data["cog type"], cog_data["args"]) for cog_data in cog_datas],
+        sorted((coords.x, coords.y) for coords in empties),
+        sorted(settings.items())
+    )).encode()).hexdigest()
+
+def _run_request(request_id, queue, name, cog_datas, empties, settings):
+    return optimize_inventory(name, cog_datas, empties, settings, Reporting_Controller(request_id, queue))
+
+async def _serve(args):
+    service = Optimization_Service(args.processes, args.cache_dirname)
+    if args.socket is not None:
+        server = await service.start_unix(args.socket)
+    else:
+        server = await service.start_tcp(port=args.port)
+    print("Listening on %s" % ", ".join(str(sock.getsockname()) for sock in server.sockets))
+    try:
+        await server.serve_forever()
+    finally:
+        await service.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve cog array optimizations locally.")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--socket", help="The path of the Unix socket to listen on.")
+    group.add_argument("--port", type=int, help="The localhost TCP port to listen on.")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--cache-dirname", default=".cogstruction_cache")
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,150 @@
+"""
+Cogstruction: Optimizing cog arrays in Legends of Idleon
+    Copyright (C) 2021 Michael P. Lane
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+"""
+
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+from batch_evaluator import NUM_RATES
+
+TABLE_MAGIC = b"COGFIT01"
+HEADER_BYTES = 64
+MAX_PROBES = 8
+SLOT_DTYPE = np.dtype([
+    ("tag", np.uint64),
+    ("checksum", np.uint64),
+    ("data", np.float64, (1 + NUM_RATES,))
+])
+
+"""
+- A fixed-size table of objectives and rates vectors in the memory-mapped file `path', shared by every process that opens
+the same file. It has the interface of `Fitness_Memo', so it can be passed as the `memo' of a `Population'.
+- The table is an open-addressing hash table of `num_slots' slots with linear probing over at most `MAX_PROBES' slots.
+When they are all taken, the first is overwritten. The file is created, sparse, by the first process to open it, and
+kept afterwards, so that the next run can reuse it. `num_slots' is ignored if the file exists.
+- A key is hashed with BLAKE2b together with `namespace', which should identify the cog array template and the objective
+function, for example with `disk_cache.get_template_signature' and an `obj_key'. Tables with different namespaces can
+then share a file.
+- Nothing is locked. Each slot holds a checksum of its key and contents, and a slot whose checksum does not match, for
+example because another process was writing it at the same time, counts as a miss.
+- `hits' and `misses' count the lookups of this process.
+- A pickled table is reopened from `path' when unpickled, so worker processes share it rather than copies of it.
+"""
+class Shared_Fitness_Table:
+    def __init__(self, path, num_slots = 2**20, namespace = b""):
+        self.path = path
+        self.namespace = namespace if isinstance(namespace, bytes) else repr(namespace).encode()
+        self.hits = 0
+        self.misses = 0
+        if not os.path.exists(path):
+            _create_table(path, num_slots)
+        with open(path, "rb") as fh:
+            header = fh.read(HEADER_BYTES)
+        if header[:len(TABLE_MAGIC)] != TABLE_MAGIC:
+            raise Shared_Fitness_Table_Error("`%s' is not a fitness table." % path)
+        self.num_slots = int(np.frombuffer(header, dtype=np.uint64, count=1, offset=len(TABLE_MAGIC))[0])
+        self._slots = np.memmap(path, dtype=SLOT_DTYPE, mode="r+", offset=HEADER_BYTES, shape=(self.num_slots,))
+        self._tags = self._slots["tag"]
+        self._checksums = self._slots["checksum"]
+        self._data = self._slots["data"]
+
+    """
+    Returns the objective and rates vector of `key', or `None'.
+    """
+    def get(self, key):
+        tag, check = self._hash(key)
+        slot = tag % self.num_slots
+        for _ in range(MAX_PROBES):
+            slot_tag = int(self._tags[slot])
+            if slot_tag == 0:
+                break
+            if slot_tag == tag:
+                data = self._data[slot].copy()
+                if int(self._checksums[slot]) == _get_checksum(check, data):
+                    self.hits += 1
+                    return data[0], data[1:]
+                break
+            slot = (slot + 1) % self.num_slots
+        self.misses += 1
+        return None
+
+    def put(self, key, entry):
+        tag, check = self._hash(key)
+        data = np.empty(1 + NUM_RATES)
+        data[0] = entry[0]
+        data[1:] = entry[1]
+        first = slot = tag % self.num_slots
+        for _ in range(MAX_PROBES):
+            slot_tag = int(self._tags[slot])
+            if slot_tag == 0 or slot_tag == tag:
+                break
+            slot = (slot + 1) % self.num_slots
+        else:
+            slot = first
+        self._tags[slot] = 0
+        self._data[slot] = data
+        self._checksums[slot] = _get_checksum(check, data)
+        self._tags[slot] = tag
+        return self
+
+    def __contains__(self, key):
+        hits, misses = self.hits, self.misses
+        found = self.get(key) is not None
+        self.hits, self.misses = hits, misses
+        return found
+
+    def __len__(self):
+        return int(np.count_nonzero(self._tags))
+
+    def flush(self):
+        self._slots.flush()
+        return self
+
+    def __getstate__(self):
+        return {"path": self.path, "namespace": self.namespace}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], namespace=state["namespace"])
+
+    def _hash(self, key):
+        digest = hashlib.blake2b(self.namespace + b"\0" + key, digest_size=16).digest()
+        tag, check = np.frombuffer(digest, dtype=np.uint64).tolist()
+        return tag or 1, check
+
+class Shared_Fitness_Table_Error(RuntimeError):
+    pass
+
+def _get_checksum(check, data):
+    return check ^ int(np.bitwise_xor.reduce(data.view(np.uint64)))
+
+"""
+Create the file of an empty table without ever exposing a partial one, even if several processes race to create it.
+"""
+def _create_table(path, num_slots):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            header = TABLE_MAGIC + np.array([num_slots], dtype=np.uint64).tobytes()
+            fh.write(header + bytes(HEADER_BYTES - len(header)))
+            fh.truncate(HEADER_BYTES + num_slots * SLOT_DTYPE.itemsize)
+        try:
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass
+    finally:
+        os.remove(tmp_path)
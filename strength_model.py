@@ -0,0 +1,123 @@
+"""
+Cogstruction: Optimizing cog arrays in Legends of Idleon
+    Copyright (C) 2021 Michael P. Lane
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+"""
+
+import numpy as np
+
+"""
+- The strengths of every cog of `registry' (see `Cog.strengths'), held in one float ndarray `raw' of shape
+`(len(registry), total_coords)'. Row `i' belongs to the cog with registry index `i'.
+- Rows are not normalized. The strength of cog `i' at `cell' is `raw[i,cell] / totals[i]'. The divide is deferred until
+a strength is read, see `get_strength' and `get_strengths'.
+- Updates are buffered by `update_strengths' and applied all at once by `apply_updates', usually once per generation.
+- `strength_start_value' is the strength of every non-empty cell right after `instantiate'.
+- A `Strength_Model' is plain ndarrays, so it is cheap to pickle.
+"""
+class Strength_Model:
+    def __init__(self, registry, empties_set):
+        self.registry = registry
+        self.empties_set = empties_set
+        self.raw = None
+        self.totals = None
+        self.strength_start_value = None
+        self._pending = []
+
+    """
+    Set every non-empty strength to 1/N, where N is the number of non-empty coords, like `Cog.instantiate_strengths'.
+    """
+    def instantiate(self):
+        self.raw = np.zeros((len(self.registry), self.empties_set.total_coords))
+        self.raw[:, self.empties_set.cells] = 1.0
+        self.totals = np.full(len(self.registry), float(len(self.empties_set.cells)))
+        self.strength_start_value = 1 / len(self.empties_set.cells)
+        self._pending = []
+        return self
+
+    """
+    Set the unnormalized strengths to copies of `raw' and `totals', for example from a `Checkpoint'.
+    """
+    def restore(self, raw, totals, strength_start_value):
+        self.raw = np.array(raw, dtype=np.float64)
+        self.totals = np.array(totals, dtype=np.float64)
+        self.strength_start_value = strength_start_value
+        self._pending = []
+        return self
+
+    def get_strength(self, i, cell):
+        return self.raw[i,cell] / self.totals[i]
+
+    """
+    Returns the normalized strengths as a new float ndarray of shape `(len(registry), total_coords)'.
+    """
+    def get_strengths(self):
+        return self.raw / self.totals[:,None]
+
+    """
+    - Buffer the updates `strength[cog_indices[k], cells[k]] *= factors[k]'. Nothing changes until `apply_updates'.
+    - Factors that are not positive and finite are ignored, like the `ZeroDivisionError's of the original update loop.
+    """
+    def update_strengths(self, cog_indices, cells, factors):
+        self._pending.append((
+            np.asarray(cog_indices, dtype=np.intp).reshape(-1),
+            np.asarray(cells, dtype=np.intp).reshape(-1),
+            np.asarray(factors, dtype=np.float64).reshape(-1)
+        ))
+        return self
+
+    """
+    - Apply all buffered updates at once, with the same clamping as `Cog.update_strength'.
+    - Every update is applied to the strengths as they were before this call. Several factors for the same cog and cell
+    are multiplied together before `max_multiplier' is applied.
+    """
+    def apply_updates(self, max_factor = None, max_multiplier = None):
+        if len(self._pending) == 0:
+            return self
+        cog_indices, cells, factors = (np.concatenate(arrays) for arrays in zip(*self._pending))
+        self._pending = []
+        keep = np.isfinite(factors) & (factors > 0)
+        cog_indices, cells, factors = cog_indices[keep], cells[keep], factors[keep]
+        if len(factors) == 0:
+            return self
+        if max_factor:
+            factors = np.clip(factors, 1/max_factor, max_factor)
+
+        keys, inverse = np.unique(cog_indices * self.raw.shape[1] + cells, return_inverse=True)
+        factors = np.exp(np.bincount(inverse, np.log(factors), len(keys)))
+        rows, cols = np.divmod(keys, self.raw.shape[1])
+        strengths = self.raw[rows, cols] / self.totals[rows] * factors
+        if max_multiplier:
+            strengths = np.clip(
+                strengths,
+                self.strength_start_value / max_multiplier,
+                self.strength_start_value * max_multiplier
+            )
+        self.raw[rows, cols] = strengths * self.totals[rows]
+
+        rows = np.unique(rows)
+        self.totals[rows] = self.raw[rows].sum(axis=1)
+        drifted = rows[(self.totals[rows] < 1e-100) | (self.totals[rows] > 1e100)]
+        if len(drifted) > 0:
+            self.raw[drifted] /= self.totals[drifted,None]
+            self.totals[drifted] = 1.0
+        return self
+
+    """
+    Copy the normalized strengths to `cog.strengths' and `cog.strength_start_value' of every registered cog.
+    """
+    def write_to_cogs(self):
+        strengths = self.get_strengths()
+        for i,cog in enumerate(self.registry):
+            cog.strengths = strengths[i].reshape(self.empties_set.shape)
+            cog.strength_start_value = self.strength_start_value
+        return self
@@ -0,0 +1,56 @@
+import random
+import unittest
+
+import numpy as np
+
+from batch_evaluator import Batch_Evaluator
+from cog_array_stuff import Cog_Array, Cog_Registry, Empties_Set
+from cog_factory import cog_factory
+from coords import Coords
+from file_readers import read_cog_datas, read_empties_datas
+
+
+class Test_Batch_Evaluator(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(1)
+        self.cog_datas_static_filenames = [
+            "cog_datas_static1.csv",
+            "cog_datas_static2.csv",
+            "cog_datas_static3.csv",
+            "cog_datas_static4.csv"
+        ]
+        self.empties_datas_static_filenames = [
+            "empties_datas_static1.csv",
+            "empties_datas_static2.csv",
+            "empties_datas_static3.csv",
+            "empties_datas_static4.csv"
+        ]
+        self.flaggies = {Coords(0,0), Coords(5,3), Coords(6,3)}
+
+    def test_evaluate(self):
+        for cog_filename,empties_filename in zip(self.cog_datas_static_filenames,self.empties_datas_static_filenames):
+            cogs = cog_factory(read_cog_datas(cog_filename))
+            empties_set = Empties_Set(read_empties_datas(empties_filename))
+            registry = Cog_Registry(cogs)
+            evaluator = Batch_Evaluator(registry, empties_set, self.flaggies)
+            arrays = [
+                Cog_Array(empties_set, self.flaggies, None, registry).instantiate_randomly(cogs)
+                for _ in range(10)
+            ]
+            build, flaggy, exp = evaluator.evaluate(np.stack([array.genome for array in arrays]))
+            for i,array in enumerate(arrays):
+                self.assertAlmostEqual(build[i], array.get_build_rate())
+                self.assertAlmostEqual(flaggy[i], array.get_flaggy_rate())
+                self.assertAlmostEqual(exp[i], array.get_total_exp_mult())
+
+    def test_standard_obj_fxn(self):
+        cogs = cog_factory(read_cog_datas("cog_datas_static1.csv"))
+        empties_set = Empties_Set(read_empties_datas("empties_datas_static1.csv"))
+        registry = Cog_Registry(cogs)
+        evaluator = Batch_Evaluator(registry, empties_set)
+        array = Cog_Array(empties_set, None, None, registry).instantiate_randomly(cogs)
+        self.assertAlmostEqual(
+            evaluator.standard_obj_fxn(array.genome, 0.5, 0.3, 0.2)[0],
+            array.standard_obj_fxn(0.5, 0.3, 0.2)
+        )
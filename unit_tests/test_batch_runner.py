@@ -0,0 +1,71 @@
+import contextlib
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from batch_runner import Batch_Error, read_jobs, run_batch, SUMMARY_FILENAME
+
+SETTINGS = {
+    "pop_size": 30,
+    "num_mutations": 30,
+    "min_generations": 3,
+    "max_generations": 6,
+    "max_running_total_len": 2,
+    "req_running_total": 0.001
+}
+
+
+class Test_Batch_Runner(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.inventories = os.path.join(self.tmp_dir.name, "inventories")
+        for name,cog_datas,empties_datas in (
+                ("alice", "cog_datas_static1.csv", "empties_datas_static1.csv"),
+                ("bob", "cog_datas_static5.csv", "empties_datas_static1.csv"),
+                ("carol", "cog_datas_static3.csv", "empties_datas_static1.csv")
+        ):
+            directory = os.path.join(self.inventories, name)
+            os.makedirs(directory)
+            shutil.copy(cog_datas, os.path.join(directory, "cog_datas.csv"))
+            shutil.copy(empties_datas, os.path.join(directory, "empties_datas.csv"))
+        with open(os.path.join(self.inventories, "bob", "settings.json"), "w") as fh:
+            json.dump({"max_evaluations": 100}, fh)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_run_batch(self):
+        jobs = read_jobs(self.inventories, SETTINGS)
+        self.assertEqual([job.name for job in jobs], ["alice", "bob", "carol"])
+        output_dirname = os.path.join(self.tmp_dir.name, "output")
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = run_batch(jobs, output_dirname, processes=1)
+        self.assertEqual([result.status for result in results], ["ok", "ok", "error"])
+        self.assertTrue(os.path.isfile(os.path.join(output_dirname, "alice.txt")))
+        self.assertFalse(os.path.exists(os.path.join(output_dirname, "carol.txt")))
+        self.assertLess(results[1].evaluations, results[0].evaluations)
+        with open(os.path.join(output_dirname, SUMMARY_FILENAME), newline="") as fh:
+            rows = list(csv.DictReader(fh))
+        self.assertEqual([row["name"] for row in rows], ["alice", "bob", "carol"])
+        self.assertAlmostEqual(float(rows[0]["objective"]), results[0].objective)
+
+    def test_manifest(self):
+        manifest = os.path.join(self.tmp_dir.name, "manifest.json")
+        with open(manifest, "w") as fh:
+            json.dump({
+                "settings": {"pop_size": 50},
+                "jobs": [{"name": "alice", "cog_datas": "inventories/alice/cog_datas.csv",
+                          "empties_datas": "inventories/alice/empties_datas.csv", "seed": 3}]
+            }, fh)
+        job, = read_jobs(manifest, SETTINGS)
+        self.assertEqual((job.settings["pop_size"], job.settings["seed"], job.settings["num_mutations"]), (50, 3, 30))
+        self.assertTrue(os.path.isfile(job.cog_datas_filename))
+        with open(manifest, "w") as fh:
+            json.dump({"jobs": [{"name": "alice", "cog_datas": "a.csv", "empties_datas": "b.csv", "typo": 1}]}, fh)
+        with self.assertRaises(Batch_Error):
+            read_jobs(manifest)
@@ -0,0 +1,77 @@
+import contextlib
+import io
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from checkpoint import Checkpoint_Error, Checkpointer
+from cog_array_stuff import Empties_Set
+from cog_factory import cog_factory
+from file_readers import read_cog_datas, read_empties_datas
+from learning_algo import Iteration_Controller, learning_algo
+
+
+class Interrupt(Exception):
+    pass
+
+class Interrupting_Checkpointer(Checkpointer):
+    def __init__(self, path, every_generations, num_saves):
+        super().__init__(path, every_generations)
+        self.num_saves = num_saves
+
+    def save(self, *args):
+        super().save(*args)
+        self.num_saves -= 1
+        if self.num_saves == 0:
+            raise Interrupt
+
+
+class Test_Checkpointer(unittest.TestCase):
+
+    def run_algo(self, checkpointer = None, reverse = False, obj_key = None):
+        random.seed(1)
+        cogs = cog_factory(read_cog_datas("cog_datas_static1.csv"))
+        if reverse:
+            cogs = cogs[::-1]
+        empties_set = Empties_Set(read_empties_datas("empties_datas_static1.csv"))
+        controller = (Iteration_Controller()
+            .set_restart_info(2)
+            .set_generation_info(3, 6, 2, 0.001)
+            .set_mutation_info(30)
+            .set_breeding_scheme_info(0.5, 0.25, 0.25)
+        )
+        with contextlib.redirect_stdout(io.StringIO()):
+            best = learning_algo(
+                cogs, empties_set, set(), 30, lambda cog_array: cog_array.standard_obj_fxn(0.3, 0.3, 0.4), 2, 4, 16,
+                controller, lambda build, flaggy, exp: 0.3 * build + 0.3 * flaggy + 0.4 * exp,
+                np.random.default_rng(3), obj_key=obj_key, checkpointer=checkpointer
+            )
+        return best[0].genome, best[1], np.array([cog.strengths for cog in cogs])
+
+    def test_resume(self):
+        expected = self.run_algo()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "checkpoint.npz")
+            with self.assertRaises(Interrupt):
+                self.run_algo(Interrupting_Checkpointer(path, 2, 4))
+            self.assertTrue(os.path.exists(path))
+            self.assertGreater(Checkpointer(path).load().state["controller"]["restart_count"], 1)
+            resumed = self.run_algo(Checkpointer(path, 2))
+            self.assertFalse(os.path.exists(path))
+        self.assertTrue(np.array_equal(expected[0], resumed[0]))
+        self.assertEqual(expected[1], resumed[1])
+        self.assertTrue(np.array_equal(expected[2], resumed[2]))
+
+    def test_resume_mismatch(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "checkpoint.npz")
+            with self.assertRaises(Interrupt):
+                self.run_algo(Interrupting_Checkpointer(path, 2, 1), obj_key=("weights", 0.3, 0.3, 0.4))
+            with self.assertRaises(Checkpoint_Error):
+                self.run_algo(Checkpointer(path, 2), reverse=True, obj_key=("weights", 0.3, 0.3, 0.4))
+            with self.assertRaises(Checkpoint_Error):
+                self.run_algo(Checkpointer(path, 2), obj_key=("weights", 0.5, 0.3, 0.2))
+            self.assertTrue(os.path.exists(path))
@@ -1,6 +1,15 @@
+import copy
+import random
 import unittest
+from unittest import mock
 
-from cog_array_stuff import Cog_Array, Empties_Set
+import numpy as np
+
+import cog_array_stuff
+from cog_array_stuff import Cog_Array, Cog_Registry, Empties_Set, Spare_Pool, get_excludes_dict
+from cog_factory import cog_factory
+from cog_types import Cog, Col_Cog, Row_Cog, Yang_Cog
+from coords import Coords
 from file_readers import read_cog_datas, read_empties_datas
 
 
@@ -43,6 +52,77 @@ class Test_Cog_Array(unittest.TestCase):
                 with self.assertRaises(RuntimeError):
                     cog_array2.instantiate_randomly(cog_data)
 
+    def test_copy(self):
+        for cog_data,empties_data in zip(self.cog_datas_static,self.empties_datas_static):
+            cogs = cog_factory(cog_data)
+            cog_array1 = Cog_Array(empties_data, None, None, Cog_Registry(cogs)).instantiate_randomly(cogs)
+            cog_array2 = copy.copy(cog_array1)
+            self.assertEqual(cog_array1, cog_array2)
+            self.assertIs(cog_array1.registry, cog_array2.registry)
+            cog_array2.move_all_to_spares()
+            self.assertEqual(cog_array1.get_num_occupied() + cog_array1.get_num_spares(), len(cogs))
+            self.assertEqual(cog_array2.get_num_spares(), len(cogs))
+            if cog_array1.get_num_occupied() > 0:
+                self.assertNotEqual(cog_array1, cog_array2)
+
+    def test_array_and_spares_views(self):
+        for cog_data,empties_data in zip(self.cog_datas_static,self.empties_datas_static):
+            cogs = cog_factory(cog_data)
+            cog_array = Cog_Array(empties_data).instantiate_randomly(cogs)
+            placed = [cog for cog in cog_array.array.reshape(-1) if cog is not None]
+            self.assertEqual(len(placed), cog_array.get_num_occupied())
+            self.assertEqual(set(placed) | cog_array.spares, set(cogs))
+            self.assertEqual(set(placed) & cog_array.spares, set())
+            for coords,cog in cog_array:
+                self.assertIs(cog_array.array[coords.x,coords.y], cog)
+                if cog is not None:
+                    self.assertEqual(cog_array.genome[empties_data.get_cell(coords)], cog_array.registry.index(cog))
+
+    def test_mutation_rates_delta(self):
+        flaggies = {Coords(0,0), Coords(5,3), Coords(6,3)}
+        for cog_data,empties_data in zip(self.cog_datas_static,self.empties_datas_static):
+            cogs = cog_factory(cog_data)
+            if len(cogs) < 2:
+                continue
+            cog_array = Cog_Array(empties_data, flaggies).instantiate_randomly(cogs)
+            cog_array.get_rates()
+            for _ in range(50):
+                if cog_array.get_num_spares() > 0 and random.random() < 0.5:
+                    cog_array = cog_array.one_point_mutation()[0]
+                else:
+                    cog_array = cog_array.two_point_mutation()[0]
+                self.assertIsNotNone(cog_array.get_cached_rates())
+                inherited = cog_array.get_rates()
+                recomputed = copy.copy(cog_array)
+                recomputed._reset_rates()
+                self.assertTrue(np.allclose(inherited, recomputed.get_rates()))
+                self.assertAlmostEqual(cog_array.get_flaggy_rate(), recomputed.get_flaggy_rate())
+
+    def test_rates_on_custom_board(self):
+        random.seed(2)
+        num_cogs_hori, num_cogs_vert = 30, 20
+        cogs = [Row_Cog(10, 3, 0.0, 0.2, 0.1, 0.5, 0.0), Col_Cog(7, 0, 0.0, 0.4, 0.3, 0.0, 0.0)]
+        cogs += [Yang_Cog(5, 2, 0.0, 0.1, 0.1, 0.2, 0.0) for _ in range(20)]
+        cogs += [Cog(random.randint(1, 100), random.randint(0, 20), random.random()) for _ in range(300)]
+        empties_set = Empties_Set({Coords(3, 4), Coords(29, 19), Coords(10, 0)}, num_cogs_hori, num_cogs_vert)
+        flaggies = {Coords(0, 0), Coords(10, 0), Coords(12, 5)}
+        cog_array = Cog_Array(empties_set, flaggies).instantiate_randomly(cogs)
+        self.assertEqual(cog_array.array.shape, (num_cogs_hori, num_cogs_vert))
+        build = flaggy = speed = 0.0
+        for coords,cog in cog_array:
+            if cog is None:
+                continue
+            build += cog.build_rate
+            flaggy += cog.flaggy_rate
+            if hasattr(cog, "influence_offsets"):
+                for adj_coords in cog.get_influence(coords, num_cogs_hori, num_cogs_vert):
+                    speed += cog.flaggy_speed_boost * (adj_coords in flaggies) / len(flaggies)
+                    if cog_array[adj_coords] is not None:
+                        build += cog_array[adj_coords].build_rate * cog.build_rate_boost
+                        flaggy += cog_array[adj_coords].flaggy_rate * cog.flaggy_rate_boost
+        self.assertAlmostEqual(cog_array.get_build_rate(), build)
+        self.assertAlmostEqual(cog_array.get_flaggy_rate(), flaggy * (1 + speed))
+
     def test_get_random_coords(self):
         assert False
 
@@ -105,3 +185,60 @@ class Test_Cog_Array(unittest.TestCase):
 
     def test_get_num_occupied(self):
         assert False
+
+
+class Test_Empties_Set(unittest.TestCase):
+
+    def test_get_influence_table(self):
+        cogs = cog_factory(read_cog_datas("cog_datas_static1.csv"))
+        empties_set1 = Empties_Set(read_empties_datas("empties_datas_static1.csv"))
+        empties_set2 = Empties_Set(read_empties_datas("empties_datas_static1.csv"))
+        for cog in cogs:
+            if hasattr(cog, "influence_offsets"):
+                table = empties_set1.get_influence_table(type(cog))
+                self.assertIs(table, empties_set2.get_influence_table(type(cog)))
+                for cell,coords in enumerate(empties_set1.all_coords):
+                    self.assertEqual(
+                        set(table.neighbors[cell]),
+                        set(
+                            empties_set1.get_cell(adj_coords) for adj_coords in cog.get_influence(coords)
+                            if not adj_coords.is_out_of_bounds() and adj_coords not in empties_set1
+                        )
+                    )
+                    self.assertEqual(
+                        table.num_out_of_bounds[cell],
+                        sum(adj_coords.is_out_of_bounds() for adj_coords in cog.get_influence(coords))
+                    )
+
+    def test_shared_influence_tables_bounded(self):
+        with mock.patch.object(cog_array_stuff, "MAX_SHARED_INFLUENCE_TABLES", 2):
+            empties_sets = [Empties_Set({Coords(x, 0)}) for x in range(4)]
+            for empties_set in empties_sets:
+                empties_set.get_influence_table(Row_Cog)
+            self.assertLessEqual(len(cog_array_stuff._influence_tables), 2)
+            self.assertTrue(empties_sets[0].has_influence_table(Row_Cog))
+            self.assertFalse(Empties_Set({Coords(0, 0)}).has_influence_table(Row_Cog))
+            self.assertTrue(Empties_Set({Coords(3, 0)}).has_influence_table(Row_Cog))
+
+
+class Test_Spare_Pool(unittest.TestCase):
+
+    def test_draw(self):
+        random.seed(1)
+        cogs = cog_factory(read_cog_datas("cog_datas_static1.csv"))
+        empties_set = Empties_Set(read_empties_datas("empties_datas_static1.csv"))
+        registry = Cog_Registry(cogs)
+        template = Cog_Array(empties_set, None, get_excludes_dict(empties_set, cogs), registry)
+        pool = Spare_Pool(registry, empties_set, template.excludes_dict).extend(range(len(cogs)))
+        copied = pool.copy()
+        for coords in empties_set.coords_list:
+            cell = empties_set.get_cell(coords)
+            if any(not template.excludes(coords, registry.cogs[i]) for i in pool):
+                i = pool.draw(cell)
+                self.assertFalse(template.excludes(coords, registry.cogs[i]))
+                pool.remove(i)
+                self.assertNotIn(i, pool)
+        self.assertEqual(len(copied), len(cogs))
+        self.assertEqual(len(pool), len(cogs) - len(empties_set.coords_list))
+        copied.remove(0).remove(len(cogs) - 1).add(0)
+        self.assertEqual(set(copied), set(range(len(cogs) - 1)))
@@ -0,0 +1,62 @@
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from batch_evaluator import Batch_Evaluator
+from cog_array_stuff import Cog_Array, Cog_Registry, Empties_Set, get_excludes_dict
+from cog_factory import cog_factory
+from compiled_problem import Compiled_Problem, compile_problem
+from coords import Coords
+from file_readers import read_cog_datas, read_empties_datas
+from reproduction_engine import Reproduction_Engine
+
+
+class Test_Compiled_Problem(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(1)
+        self.cogs = cog_factory(read_cog_datas("cog_datas_static1.csv"))
+        self.empties_set = Empties_Set(read_empties_datas("empties_datas_static1.csv"))
+        self.flaggies = {Coords(0,0), Coords(5,3), Coords(6,3)}
+        self.registry = Cog_Registry(self.cogs)
+        excludes_dict = get_excludes_dict(self.empties_set, self.cogs)
+        self.template = Cog_Array(self.empties_set, None, excludes_dict, self.registry)
+        for cog in self.cogs:
+            cog.instantiate_strengths(self.template)
+            cog.average_obj, cog.std_obj = random.uniform(1, 10), 1.0
+        self.genomes = np.stack([
+            Cog_Array(self.empties_set, None, excludes_dict, self.registry).instantiate_randomly(self.cogs).genome
+            for _ in range(20)
+        ])
+        self.expected = Batch_Evaluator(self.registry, self.empties_set, self.flaggies).evaluate_rates(self.genomes)
+        self.problem = compile_problem(self.cogs, self.empties_set, self.flaggies)
+
+    def assert_same_problem(self, problem):
+        self.assertTrue(np.allclose(problem.get_evaluator().evaluate_rates(self.genomes), self.expected))
+        strengths = np.array([cog.strengths.reshape(-1) for cog in self.registry])
+        offspring1 = Reproduction_Engine(self.template, np.random.default_rng(7)).breed(
+            self.genomes, 50, 0.4, 0.3, strengths
+        )
+        offspring2 = problem.get_engine(np.random.default_rng(7)).breed(self.genomes, 50, 0.4, 0.3, strengths)
+        self.assertTrue(np.array_equal(offspring1.genomes, offspring2.genomes))
+        self.assertTrue(np.array_equal(
+            problem.arrays["canonical_indices"][self.genomes], self.registry.get_canonical_indices()[self.genomes]
+        ))
+
+    def test_compile(self):
+        self.assert_same_problem(self.problem)
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as dirname:
+            path = os.path.join(dirname, "problem.npz")
+            self.problem.save(path)
+            self.assert_same_problem(Compiled_Problem.load(path))
+
+    def test_publish_attach(self):
+        with self.problem.publish() as handle:
+            problem = Compiled_Problem.attach(handle)
+            self.assert_same_problem(problem)
+            self.assertFalse(problem.arrays["build_rates"].flags.writeable)
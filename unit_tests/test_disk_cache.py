@@ -0,0 +1,83 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from batch_evaluator import Batch_Evaluator
+from cog_array_stuff import Cog_Array, Cog_Registry, Empties_Set, get_excludes_dict
+from cog_factory import cog_factory
+from disk_cache import Disk_Cache, get_cached_excludes_dict, load_average_std_objs, load_influence_tables
+from file_readers import read_cog_datas, read_empties_datas
+from reproduction_engine import Reproduction_Engine
+
+
+def obj_fxn(cog_array):
+    return cog_array.standard_obj_fxn(0.3, 0.3, 0.4)
+
+def batch_obj_fxn(build_rates, flaggy_rates, exp_mults):
+    return 0.3 * build_rates + 0.3 * flaggy_rates + 0.4 * exp_mults
+
+
+class Test_Disk_Cache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = Disk_Cache(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_put(self):
+        key = self.cache.get_key("a", (1, 2.0))
+        self.assertEqual(key, self.cache.get_key("a", (1, 2.0)))
+        self.assertNotEqual(key, Disk_Cache(self.tmp_dir.name, version=2).get_key("a", (1, 2.0)))
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, {"x": [1, 2]})
+        self.assertEqual(Disk_Cache(self.tmp_dir.name).get(key), {"x": [1, 2]})
+        with open(self.cache._get_path(key), "wb") as fh:
+            fh.write(b"garbage")
+        self.assertIsNone(self.cache.get(key))
+        self.assertNotIn(key, self.cache)
+
+    def test_evict(self):
+        self.cache.max_bytes = 3000
+        keys = [self.cache.get_key(i) for i in range(5)]
+        for i,key in enumerate(keys):
+            self.cache.put(key, bytes(1000))
+            os.utime(self.cache._get_path(key), (i, i))
+            self.cache.get(keys[0])
+        self.assertIn(keys[0], self.cache)
+        self.assertNotIn(keys[1], self.cache)
+        self.assertIn(keys[4], self.cache)
+
+    def test_evict_only_when_full(self):
+        self.cache.max_bytes = 4500
+        walks = []
+        walk = os.walk
+        with mock.patch.object(os, "walk", lambda *args: walks.append(args) or walk(*args)):
+            for i in range(5):
+                self.cache.put(self.cache.get_key(i), bytes(1000))
+        self.assertEqual(len(walks), 2)
+        self.assertEqual(len(os.listdir(self.cache.directory)), 4)
+
+    def test_template_caches(self):
+        random.seed(1)
+        cogs = cog_factory(read_cog_datas("cog_datas_static1.csv"))
+        empties_set = Empties_Set(read_empties_datas("empties_datas_static1.csv"))
+        registry = Cog_Registry(cogs)
+        load_influence_tables(self.cache, empties_set, registry.get_boost_cogs())
+        excludes_dict = get_cached_excludes_dict(self.cache, empties_set, cogs)
+        self.assertEqual(excludes_dict, get_excludes_dict(empties_set, cogs))
+        self.assertEqual(get_cached_excludes_dict(self.cache, empties_set, cogs), excludes_dict)
+        template = Cog_Array(empties_set, None, excludes_dict, registry).extend_spares(cogs)
+        engine = Reproduction_Engine(template, np.random.default_rng(1))
+        evaluator = Batch_Evaluator(registry, empties_set, None)
+        load_average_std_objs(self.cache, (0.3, 0.3, 0.4), engine, obj_fxn, batch_obj_fxn, evaluator)
+        stats = [cog.get_average_std_obj() for cog in cogs]
+        for cog in cogs:
+            cog.average_obj = cog.std_obj = None
+        load_average_std_objs(self.cache, (0.3, 0.3, 0.4), engine, None)
+        self.assertEqual([cog.get_average_std_obj() for cog in cogs], stats)
@@ -0,0 +1,43 @@
+import contextlib
+import io
+import random
+import unittest
+
+import numpy as np
+
+from cog_array_stuff import Empties_Set
+from cog_factory import cog_factory
+from file_readers import read_cog_datas, read_empties_datas
+from islands import island_learning_algo, FULLY_CONNECTED, RING
+from learning_algo import Iteration_Controller
+from objectives import Standard_Objective
+
+
+class Test_Islands(unittest.TestCase):
+
+    def run_algo(self, topology, share_strengths):
+        random.seed(1)
+        cogs = cog_factory(read_cog_datas("cog_datas_static1.csv"))
+        empties_set = Empties_Set(read_empties_datas("empties_datas_static1.csv"))
+        controller = (Iteration_Controller()
+            .set_restart_info(1)
+            .set_generation_info(3, 6, 2, 0.001)
+            .set_mutation_info(30)
+            .set_breeding_scheme_info(0.5, 0.25, 0.25)
+        )
+        objective = Standard_Objective(0.3, 0.3, 0.4)
+        with contextlib.redirect_stdout(io.StringIO()):
+            best = island_learning_algo(
+                cogs, empties_set, set(), 30, objective.obj_fxn, 2, 4, 16, controller, objective.batch_obj_fxn,
+                num_islands=3, migration_interval=2, num_migrants=5, topology=topology,
+                share_strengths=share_strengths, seed=5
+            )
+        self.assertAlmostEqual(best[1], objective.obj_fxn(best[0]))
+        return best[0].genome, best[1]
+
+    def test_reproducible(self):
+        for topology,share_strengths in ((RING, False), (FULLY_CONNECTED, True)):
+            genome1, value1 = self.run_algo(topology, share_strengths)
+            genome2, value2 = self.run_algo(topology, share_strengths)
+            self.assertTrue(np.array_equal(genome1, genome2))
+            self.assertEqual(value1, value2)
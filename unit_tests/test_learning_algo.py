@@ -0,0 +1,89 @@
+import copy
+import random
+import unittest
+
+import numpy as np
+
+from cog_array_stuff import Cog_Array, Cog_Registry, Empties_Set, EMPTY_CELL
+from cog_factory import cog_factory
+from file_readers import read_cog_datas, read_empties_datas
+from learning_algo import Fitness_Memo, Population
+
+
+class Test_Population(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(1)
+        self.cogs = cog_factory(read_cog_datas("cog_datas_static1.csv"))
+        self.empties_set = Empties_Set(read_empties_datas("empties_datas_static1.csv"))
+        self.registry = Cog_Registry(self.cogs)
+        self.obj_fxn = lambda cog_array: cog_array.standard_obj_fxn(0.5, 0.3, 0.2)
+        self.arrays = [
+            Cog_Array(self.empties_set, None, None, self.registry).instantiate_randomly(self.cogs)
+            for _ in range(20)
+        ]
+
+    def test_init(self):
+        pop = Population(self.arrays, self.obj_fxn)
+        self.assertEqual(pop.get_size(), 20)
+        for i,array in enumerate(self.arrays):
+            self.assertTrue(np.array_equal(pop.genomes[i], array.genome))
+            self.assertEqual(pop.values[i], self.obj_fxn(array))
+            self.assertEqual(pop.get_array(i), array)
+
+    def test_cull(self):
+        pop = Population(self.arrays, self.obj_fxn)
+        for array in self.arrays:
+            pop.add(array.two_point_mutation()[0])
+        self.assertEqual(pop.get_size(), 40)
+        top = np.sort(pop.values)[::-1][:20]
+        pop.cull()
+        self.assertEqual(pop.get_size(), 20)
+        self.assertTrue(np.allclose(np.sort(pop.values)[::-1], top))
+        self.assertEqual(pop.get_best_value(), top[0])
+        self.assertEqual(pop.get_best()[1], top[0])
+        self.assertEqual(pop.get_percentile_value(0.5), top[10])
+
+    def test_sample(self):
+        pop = Population(self.arrays, self.obj_fxn)
+        samples = pop.sample(5)
+        self.assertEqual(len(samples), 5)
+        for array,value in samples:
+            self.assertEqual(self.obj_fxn(array), value)
+
+    def test_copy(self):
+        pop1 = Population(self.arrays, self.obj_fxn)
+        pop2 = copy.copy(pop1)
+        pop2.cull(5)
+        self.assertEqual(pop1.get_size(), 20)
+        self.assertEqual(pop2.get_size(), 5)
+
+    def test_memo(self):
+        memo = Fitness_Memo(max_size = 25)
+        pop = Population(self.arrays, self.obj_fxn, memo=memo)
+        self.assertEqual((memo.hits, memo.misses, len(memo)), (0, 20, 20))
+        values = pop.extend_genomes(np.stack([array.genome for array in self.arrays]))
+        self.assertEqual((memo.hits, memo.misses), (20, 20))
+        self.assertTrue(np.array_equal(values, pop.values[:20]))
+        for array in self.arrays[:10]:
+            pop.add(array.two_point_mutation()[0])
+        self.assertEqual(len(memo), 25)
+        self.assertNotIn(pop._get_keys(self.arrays[0].genome[None,:])[0], memo)
+
+    def test_reject_duplicates(self):
+        pop = Population(self.arrays, self.obj_fxn, reject_duplicates=True)
+        genomes = np.stack([array.genome for array in self.arrays[:5]])
+        canonical = self.registry.get_canonical_indices()
+        i = int(np.flatnonzero(canonical != np.arange(len(canonical)))[0])
+        genome = genomes[0].copy()
+        genome[np.isin(genome, (i, canonical[i]))] = EMPTY_CELL
+        genome[self.empties_set.cells[:2]] = i, canonical[i]
+        swapped = genome.copy()
+        swapped[self.empties_set.cells[:2]] = canonical[i], i
+        values = pop.extend_genomes(np.concatenate((genomes, genome[None,:], swapped[None,:])))
+        self.assertEqual(len(values), 7)
+        self.assertEqual(values[5], values[6])
+        self.assertEqual(pop.get_size(), 21)
+        self.assertEqual(pop.num_rejected, 6)
+        pop.cull(10)
+        self.assertEqual(len(pop._member_keys), 10)
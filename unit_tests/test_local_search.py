@@ -0,0 +1,105 @@
+import contextlib
+import io
+import random
+import unittest
+
+import numpy as np
+
+from cog_array_stuff import Empties_Set, EMPTY_CELL
+from cog_factory import cog_factory
+from coords import Coords
+from file_readers import read_cog_datas, read_empties_datas
+from learning_algo import Iteration_Controller, build_problem, learning_algo
+from local_search import Local_Search_Error, Swap_Local_Search
+from objectives import Standard_Objective
+
+
+class Test_Local_Search(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(1)
+        self.objective = Standard_Objective(0.3, 0.3, 0.4)
+        self.problems = []
+        for name in ["static1", "static2"]:
+            cogs = cog_factory(read_cog_datas("cog_datas_%s.csv" % name))
+            empties_set = Empties_Set(read_empties_datas("empties_datas_%s.csv" % name))
+            registry, _, evaluator, engine = build_problem(
+                cogs, empties_set, {Coords(0,0), Coords(5,3), Coords(6,3)}, self.objective.batch_obj_fxn,
+                np.random.default_rng(1)
+            )
+            search = Swap_Local_Search(evaluator, engine.cells, engine.excluded, self.objective.batch_obj_fxn)
+            self.problems.append((registry, evaluator, engine, search))
+
+    def get_neighbours(self, genome, engine, num_cogs):
+        cells = engine.cells
+        placed = set(genome[genome != EMPTY_CELL].tolist())
+        spares = [i for i in range(num_cogs) if i not in placed]
+        neighbours = []
+        for i in range(len(cells)):
+            for j in range(i + 1, len(cells)):
+                a, b = genome[cells[i]], genome[cells[j]]
+                if not engine.excluded[b, cells[i]] and not engine.excluded[a, cells[j]]:
+                    neighbour = genome.copy()
+                    neighbour[cells[i]], neighbour[cells[j]] = b, a
+                    neighbours.append(neighbour)
+            for spare in spares:
+                if not engine.excluded[spare, cells[i]]:
+                    neighbour = genome.copy()
+                    neighbour[cells[i]] = spare
+                    neighbours.append(neighbour)
+        return np.array(neighbours)
+
+    def test_local_deltas(self):
+        for registry,evaluator,engine,search in self.problems:
+            genome = engine.random_genomes(1)[0]
+            C = len(engine.cells)
+            spares = np.setdiff1d(np.arange(len(registry)), genome).astype(genome.dtype)
+            values = np.concatenate((genome[engine.cells], spares))
+            first, second = np.triu_indices(len(values), 1)
+            first, second = first[first < C], second[first < C]
+            rates = evaluator.evaluate_rates(genome)[0]
+            self.assertTrue(np.allclose(
+                search._get_local_deltas(values, first, second),
+                search._get_deltas(genome, values, rates, first, second)
+            ))
+
+    def test_polish(self):
+        for registry,evaluator,engine,search in self.problems:
+            for genome in engine.random_genomes(2):
+                polished, rates, num_moves = search.polish(genome)
+                self.assertGreater(num_moves, 0)
+                self.assertTrue(np.allclose(rates, evaluator.evaluate_rates(polished)[0]))
+                placed = polished[polished != EMPTY_CELL]
+                self.assertEqual(len(placed), len(set(placed.tolist())))
+                self.assertEqual(len(placed), np.count_nonzero(genome != EMPTY_CELL))
+                value = self.objective.evaluate_rates(rates)[0]
+                self.assertGreater(value, self.objective.evaluate_rates(evaluator.evaluate_rates(genome))[0])
+                neighbours = self.get_neighbours(polished, engine, len(registry))
+                self.assertLessEqual(
+                    self.objective.evaluate_rates(evaluator.evaluate_rates(neighbours)).max(), value * (1 + 1e-9)
+                )
+                self.assertEqual(search.polish(genome, max_moves=3)[2], 3)
+
+    def test_learning_algo(self):
+        _, evaluator, engine, _ = self.problems[0]
+        with self.assertRaises(Local_Search_Error):
+            Swap_Local_Search(None, engine.cells, engine.excluded, self.objective.batch_obj_fxn)
+        bests = []
+        for polish_top_k in [0, 5]:
+            random.seed(1)
+            cogs = cog_factory(read_cog_datas("cog_datas_static1.csv"))
+            empties_set = Empties_Set(read_empties_datas("empties_datas_static1.csv"))
+            controller = (Iteration_Controller()
+                .set_restart_info(2)
+                .set_generation_info(3, 6, 2, 0.001)
+                .set_mutation_info(30)
+                .set_breeding_scheme_info(0.5, 0.25, 0.25)
+            )
+            with contextlib.redirect_stdout(io.StringIO()):
+                best = learning_algo(
+                    cogs, empties_set, set(), 30, self.objective.obj_fxn, 2, 4, 16, controller,
+                    self.objective.batch_obj_fxn, np.random.default_rng(3), polish_top_k=polish_top_k
+                )
+            self.assertAlmostEqual(best[1], self.objective.obj_fxn(best[0]))
+            bests.append(best[1])
+        self.assertGreater(bests[1], bests[0])
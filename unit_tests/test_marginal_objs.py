@@ -0,0 +1,74 @@
+import random
+import unittest
+
+import numpy as np
+
+from batch_evaluator import Batch_Evaluator
+from cog_array_stuff import Cog_Array, Cog_Registry, Empties_Set, EMPTY_CELL, get_excludes_dict
+from cog_factory import cog_factory
+from file_readers import read_cog_datas, read_empties_datas
+from marginal_objs import get_average_std_objs, sample_marginal_components, sample_marginal_objs
+from objectives import Standard_Objective
+from reproduction_engine import Reproduction_Engine
+
+
+def obj_fxn(cog_array):
+    return cog_array.standard_obj_fxn(0.3, 0.3, 0.4)
+
+def batch_obj_fxn(build_rates, flaggy_rates, exp_mults):
+    return 0.3 * build_rates + 0.3 * flaggy_rates + 0.4 * exp_mults
+
+
+class Test_Marginal_Objs(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(1)
+        self.cogs = cog_factory(read_cog_datas("cog_datas_static1.csv"))
+        self.empties_set = Empties_Set(read_empties_datas("empties_datas_static1.csv"))
+        self.registry = Cog_Registry(self.cogs)
+        template = Cog_Array(self.empties_set, None, get_excludes_dict(self.empties_set, self.cogs), self.registry)
+        self.engine = Reproduction_Engine(template.extend_spares(self.cogs), np.random.default_rng(1))
+        self.evaluator = Batch_Evaluator(self.registry, self.empties_set, None)
+
+    def test_random_genomes_with_fixed_cogs(self):
+        fixed_cogs = np.arange(len(self.cogs))
+        fixed_cells = self.empties_set.cells[fixed_cogs % len(self.empties_set.cells)]
+        genomes = self.engine.random_genomes(len(self.cogs), fixed_cogs, fixed_cells)
+        self.assertTrue(np.array_equal(genomes[np.arange(len(self.cogs)), fixed_cells], fixed_cogs))
+        for genome in genomes:
+            placed = genome[genome != EMPTY_CELL]
+            self.assertEqual(len(placed), len(set(placed.tolist())))
+            self.assertEqual(len(placed), min(len(self.cogs), len(self.empties_set.cells)))
+
+    def test_sample_marginal_objs(self):
+        cog_indices = [0, 5, 9]
+        objs1 = sample_marginal_objs(
+            Reproduction_Engine(self.engine.template, np.random.default_rng(3)), cog_indices, 2, obj_fxn
+        )
+        objs2 = sample_marginal_objs(
+            Reproduction_Engine(self.engine.template, np.random.default_rng(3)), cog_indices, 2, obj_fxn,
+            batch_obj_fxn, self.evaluator
+        )
+        self.assertEqual(objs1.shape, (3, 2 * len(self.empties_set.cells)))
+        self.assertTrue(np.allclose(objs1, objs2))
+
+    def test_sample_marginal_components(self):
+        cog_indices = [0, 5, 9]
+        components = sample_marginal_components(
+            Reproduction_Engine(self.engine.template, np.random.default_rng(3)), cog_indices, 2, self.evaluator
+        )
+        objs = sample_marginal_objs(
+            Reproduction_Engine(self.engine.template, np.random.default_rng(3)), cog_indices, 2, obj_fxn,
+            batch_obj_fxn, self.evaluator
+        )
+        self.assertEqual(components.shape, (3, 2 * len(self.empties_set.cells), 3))
+        self.assertTrue(np.allclose(components @ Standard_Objective(0.3, 0.3, 0.4).coefficients, objs))
+
+    def test_get_average_std_objs(self):
+        average_objs, std_objs = get_average_std_objs(
+            self.engine, obj_fxn, batch_obj_fxn, self.evaluator, rel_tol=0.05, max_samples_per_coord=4
+        )
+        self.assertEqual(average_objs.shape, (len(self.cogs),))
+        for i,cog in enumerate(self.cogs):
+            self.assertEqual(cog.get_average_std_obj(), (average_objs[i], std_objs[i]))
+            self.assertGreaterEqual(std_objs[i], 0)
@@ -0,0 +1,61 @@
+import json
+import pickle
+import random
+import unittest
+
+import numpy as np
+
+from cog_array_stuff import Cog_Array, Cog_Registry, Empties_Set
+from cog_factory import cog_factory
+from file_readers import read_cog_datas, read_empties_datas
+from objectives import Callable_Objective, Objective_Error, Standard_Objective, get_objective
+
+
+class Test_Objectives(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(1)
+        cogs = cog_factory(read_cog_datas("cog_datas_static1.csv"))
+        empties_set = Empties_Set(read_empties_datas("empties_datas_static1.csv"))
+        registry = Cog_Registry(cogs)
+        self.arrays = [
+            Cog_Array(empties_set, None, None, registry).instantiate_randomly(cogs) for _ in range(10)
+        ]
+        self.rates = np.array([array.get_rates() for array in self.arrays])
+
+    def test_from_inverse_weights(self):
+        objective = Standard_Objective.from_inverse_weights(7000., 2000., 3.)
+        self.assertAlmostEqual(objective.coefficients.sum(), 1.)
+        self.assertAlmostEqual(objective.build_weight * 7000., objective.flaggy_weight * 2000.)
+        self.assertAlmostEqual(objective.flaggy_weight * 2000., objective.exp_weight * 3.)
+
+    def test_evaluate_rates(self):
+        objective = Standard_Objective(0.3, 0.3, 0.4)
+        expected = [objective.obj_fxn(array) for array in self.arrays]
+        self.assertTrue(np.allclose(objective.evaluate_rates(self.rates), expected))
+        self.assertAlmostEqual(objective.evaluate_rates(self.rates[0])[0], expected[0])
+
+    def test_serialize(self):
+        objective = Standard_Objective.from_inverse_weights(7000., 2000., 3.)
+        for copy in [
+            Standard_Objective.from_dict(json.loads(json.dumps(objective.to_dict()))),
+            pickle.loads(pickle.dumps(objective)),
+            get_objective({"inv_build_weight": 7000., "inv_flaggy_weight": 2000., "inv_exp_weight": 3.})
+        ]:
+            self.assertEqual(copy.get_key(), objective.get_key())
+            self.assertEqual(copy.inv_weights, objective.inv_weights)
+        self.assertEqual(get_objective({"build_weight": 1, "flaggy_weight": 0, "exp_weight": 0}).get_key()[1:], (1., 0., 0.))
+        with self.assertRaises(Objective_Error):
+            Standard_Objective.from_dict({"build_weight": 1.})
+
+    def test_callable(self):
+        objective = get_objective(lambda array: array.get_build_rate())
+        self.assertIsInstance(objective, Callable_Objective)
+        self.assertIsNone(objective.coefficients)
+        self.assertEqual(objective.obj_fxn(self.arrays[0]), self.arrays[0].get_build_rate())
+        with self.assertRaises(Objective_Error):
+            objective.evaluate_rates(self.rates)
+        with self.assertRaises(Objective_Error):
+            objective.to_dict()
+        objective = Callable_Objective(None, lambda build, flaggy, exp: build)
+        self.assertTrue(np.allclose(objective.evaluate_rates(self.rates), self.rates[:,0]))
@@ -0,0 +1,65 @@
+import contextlib
+import io
+import random
+import unittest
+
+import numpy as np
+
+from cog_array_stuff import Empties_Set
+from cog_factory import cog_factory
+from file_readers import read_cog_datas, read_empties_datas
+from learning_algo import Fitness_Memo, Iteration_Controller, build_problem, estimate_average_std_objs, learning_algo
+from objectives import Standard_Objective
+from parallel_offspring import Offspring_Pool
+from strength_model import Strength_Model
+
+
+class Test_Offspring_Pool(unittest.TestCase):
+
+    def run_algo(self, processes):
+        random.seed(1)
+        cogs = cog_factory(read_cog_datas("cog_datas_static1.csv"))
+        empties_set = Empties_Set(read_empties_datas("empties_datas_static1.csv"))
+        controller = (Iteration_Controller()
+            .set_restart_info(2)
+            .set_generation_info(3, 6, 2, 0.001)
+            .set_mutation_info(30)
+            .set_breeding_scheme_info(0.5, 0.25, 0.25)
+        )
+        objective = Standard_Objective(0.3, 0.3, 0.4)
+        with Offspring_Pool(
+            cogs, empties_set, set(), objective.obj_fxn, objective.batch_obj_fxn, processes, num_chunks=3
+        ) as offspring_pool, contextlib.redirect_stdout(io.StringIO()):
+            best = learning_algo(
+                cogs, empties_set, set(), 30, objective.obj_fxn, 2, 4, 16, controller, objective.batch_obj_fxn,
+                np.random.default_rng(3), offspring_pool=offspring_pool
+            )
+        self.assertAlmostEqual(best[1], objective.obj_fxn(best[0]))
+        return best[0].genome, best[1], np.array([cog.strengths for cog in cogs])
+
+    def test_reproducible(self):
+        expected = self.run_algo(1)
+        actual = self.run_algo(2)
+        for a,b in zip(expected, actual):
+            self.assertTrue(np.array_equal(a, b))
+
+    def test_num_evaluated(self):
+        random.seed(1)
+        cogs = cog_factory(read_cog_datas("cog_datas_static1.csv"))
+        empties_set = Empties_Set(read_empties_datas("empties_datas_static1.csv"))
+        objective = Standard_Objective(0.3, 0.3, 0.4)
+        estimate_average_std_objs(cogs, empties_set, set(), objective.obj_fxn, objective.batch_obj_fxn)
+        registry, _, _, engine = build_problem(cogs, empties_set, set(), objective.batch_obj_fxn)
+        genomes = engine.random_genomes(10)
+        strengths = Strength_Model(registry, empties_set).instantiate().get_strengths()
+        with Offspring_Pool(
+            cogs, empties_set, set(), objective.obj_fxn, objective.batch_obj_fxn, 1, num_chunks=2,
+            fitness_memo=Fitness_Memo()
+        ) as offspring_pool:
+            offspring, _, _, num_evaluated = offspring_pool.breed(
+                genomes, 40, 0.5, 0.25, strengths, np.random.default_rng(3)
+            )
+            self.assertGreater(num_evaluated, 0)
+            self.assertLessEqual(num_evaluated, len(offspring))
+            _, _, _, num_evaluated = offspring_pool.breed(genomes, 40, 0.5, 0.25, strengths, np.random.default_rng(3))
+            self.assertEqual(num_evaluated, 0)
@@ -0,0 +1,70 @@
+import contextlib
+import io
+import random
+import unittest
+
+import numpy as np
+
+from cog_array_stuff import Empties_Set
+from cog_factory import cog_factory
+from file_readers import read_cog_datas, read_empties_datas
+from learning_algo import Iteration_Controller
+from objectives import Standard_Objective
+from pareto import Pareto_Error, get_crowding_distances, get_pareto_ranks, pareto_learning_algo
+
+
+def dominates(a, b):
+    return np.all(a >= b) and np.any(a > b)
+
+
+class Test_Pareto(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(1)
+        self.points = self.rng.integers(0, 6, size=(60, 3)).astype(float)
+
+    def test_ranks(self):
+        ranks = get_pareto_ranks(self.points)
+        for i in range(len(self.points)):
+            dominators = [j for j in range(len(self.points)) if dominates(self.points[j], self.points[i])]
+            expected = 0 if len(dominators) == 0 else 1 + max(ranks[j] for j in dominators)
+            self.assertEqual(ranks[i], expected)
+        partial = get_pareto_ranks(self.points, 10)
+        kept = partial < partial.max()
+        self.assertGreaterEqual(np.count_nonzero(kept), 10)
+        self.assertTrue(np.array_equal(partial[kept], ranks[kept]))
+
+    def test_crowding_distances(self):
+        points = np.array([[0., 4.], [1., 3.], [3., 1.], [4., 0.], [0., 0.]])
+        distances = get_crowding_distances(points, get_pareto_ranks(points))
+        self.assertTrue(np.all(np.isinf(distances[[0, 3, 4]])))
+        self.assertAlmostEqual(distances[1], 3 / 4 + 3 / 4)
+        self.assertAlmostEqual(distances[2], 3 / 4 + 3 / 4)
+
+    def test_pareto_learning_algo(self):
+        random.seed(1)
+        cogs = cog_factory(read_cog_datas("cog_datas_static1.csv"))
+        empties_set = Empties_Set(read_empties_datas("empties_datas_static1.csv"))
+        controller = (Iteration_Controller()
+            .set_restart_info(2)
+            .set_generation_info(3, 6, 2, 0.001)
+            .set_mutation_info(30)
+            .set_breeding_scheme_info(0.5, 0.25, 0.25)
+        )
+        objective = Standard_Objective(0.3, 0.3, 0.4)
+        with self.assertRaises(Pareto_Error):
+            pareto_learning_algo(cogs, empties_set, set(), 30, objective.obj_fxn, 2, 4, 16, controller, None)
+        with contextlib.redirect_stdout(io.StringIO()):
+            front = pareto_learning_algo(
+                cogs, empties_set, set(), 30, objective.obj_fxn, 2, 4, 16, controller, objective.batch_obj_fxn,
+                np.random.default_rng(3), reject_duplicates=True
+            )
+        self.assertGreater(len(front), 0)
+        points = np.array([components for _,_,components in front])
+        self.assertTrue(np.all(np.diff(points[:,0]) <= 0))
+        for array,value,components in front:
+            self.assertAlmostEqual(value, objective.obj_fxn(array))
+            self.assertAlmostEqual(components[0], array.get_build_rate())
+            self.assertAlmostEqual(components[1], array.get_flaggy_rate())
+            self.assertAlmostEqual(components[2], array.get_total_exp_mult())
+            self.assertFalse(any(dominates(other, np.array(components)) for other in points))
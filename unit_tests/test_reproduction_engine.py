@@ -0,0 +1,76 @@
+import random
+import unittest
+
+import numpy as np
+
+from cog_array_stuff import Cog_Array, Cog_Registry, Empties_Set, EMPTY_CELL, get_excludes_dict
+from cog_factory import cog_factory
+from file_readers import read_cog_datas, read_empties_datas
+from reproduction_engine import Reproduction_Engine, CROSS_BREED, ONE_POINT_MUTATION, TWO_POINT_MUTATION
+
+
+class Test_Reproduction_Engine(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(1)
+        self.cogs = cog_factory(read_cog_datas("cog_datas_static1.csv"))
+        self.empties_set = Empties_Set(read_empties_datas("empties_datas_static1.csv"))
+        self.registry = Cog_Registry(self.cogs)
+        excludes_dict = get_excludes_dict(self.empties_set, self.cogs)
+        self.template = Cog_Array(self.empties_set, None, excludes_dict, self.registry)
+        for cog in self.cogs:
+            cog.instantiate_strengths(self.template)
+            cog.average_obj, cog.std_obj = random.uniform(1, 10), 1.0
+        self.genomes = np.stack([
+            Cog_Array(self.empties_set, None, excludes_dict, self.registry).instantiate_randomly(self.cogs).genome
+            for _ in range(10)
+        ])
+        self.engine = Reproduction_Engine(self.template, np.random.default_rng(1))
+
+    def assert_valid(self, genome):
+        placed = genome[genome != EMPTY_CELL]
+        self.assertEqual(len(placed), len(set(placed.tolist())))
+        self.assertTrue(np.all(genome[~self.empties_set.non_empty_mask] == EMPTY_CELL))
+
+    def test_breed(self):
+        offspring = self.engine.breed(self.genomes, 200, 0.4, 0.3)
+        self.assertEqual(offspring.genomes.shape, (200, self.genomes.shape[1]))
+        self.assertEqual(set(offspring.schemes.tolist()), {CROSS_BREED, ONE_POINT_MUTATION, TWO_POINT_MUTATION})
+        for i in range(len(offspring)):
+            child = offspring.genomes[i]
+            parent = self.genomes[offspring.parents[i,0]]
+            self.assert_valid(child)
+            changed = set(np.flatnonzero(child != parent).tolist())
+            if offspring.schemes[i] == CROSS_BREED:
+                other = self.genomes[offspring.parents[i,1]]
+                self.assertNotEqual(offspring.parents[i,0], offspring.parents[i,1])
+                self.assertGreater(np.count_nonzero((child == parent) | (child == other)), len(self.empties_set.cells) // 2)
+            elif offspring.schemes[i] == ONE_POINT_MUTATION:
+                cell = offspring.cells[i,0]
+                self.assertEqual(changed, {cell})
+                self.assertEqual(offspring.old_cogs[i], parent[cell])
+                self.assertNotIn(child[cell], parent)
+            else:
+                cell1, cell2 = offspring.cells[i]
+                self.assertNotEqual(cell1, cell2)
+                self.assertTrue(changed <= {cell1, cell2})
+                self.assertEqual(child[cell1], parent[cell2])
+                self.assertEqual(child[cell2], parent[cell1])
+
+    def test_breed_is_seeded(self):
+        offspring1 = Reproduction_Engine(self.template, np.random.default_rng(7)).breed(self.genomes, 50, 0.4, 0.3)
+        offspring2 = Reproduction_Engine(self.template, np.random.default_rng(7)).breed(self.genomes, 50, 0.4, 0.3)
+        self.assertTrue(np.array_equal(offspring1.genomes, offspring2.genomes))
+
+    def test_random_genomes(self):
+        genomes = self.engine.random_genomes(100)
+        self.assertEqual(genomes.shape, (100, self.empties_set.total_coords))
+        for genome in genomes:
+            self.assert_valid(genome)
+            self.assertEqual(np.count_nonzero(genome != EMPTY_CELL), min(len(self.cogs), len(self.empties_set.cells)))
+            placed = self.empties_set.cells[genome[self.empties_set.cells] != EMPTY_CELL]
+            self.assertFalse(np.any(self.engine.excluded[genome[placed], placed]))
+        self.assertTrue(np.array_equal(
+            Reproduction_Engine(self.template, np.random.default_rng(7)).random_genomes(20),
+            Reproduction_Engine(self.template, np.random.default_rng(7)).random_genomes(20)
+        ))
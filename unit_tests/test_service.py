@@ -0,0 +1,47 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from service import Optimization_Service, request
+
+SETTINGS = {
+    "pop_size": 30,
+    "num_mutations": 30,
+    "min_generations": 3,
+    "max_generations": 6,
+    "max_running_total_len": 2,
+    "req_running_total": 0.001
+}
+
+
+class Test_Optimization_Service(unittest.TestCase):
+
+    def test_request(self):
+        with open("cog_datas_static1.csv") as fh:
+            cog_datas = fh.read()
+        with open("empties_datas_static1.csv") as fh:
+            empties_datas = fh.read()
+        payload = {"name": "alice", "cog_datas": cog_datas, "empties_datas": empties_datas, "settings": SETTINGS}
+
+        async def run(path):
+            service = Optimization_Service(processes=1)
+            await service.start_unix(path)
+            try:
+                first = [event async for event in request(payload, path)]
+                second = [event async for event in request(payload, path)]
+                bad = [event async for event in request(dict(payload, settings={"typo": 1}), path)]
+            finally:
+                await service.close()
+            return first, second, bad
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            first, second, bad = asyncio.run(run(os.path.join(tmp_dir, "service.sock")))
+        self.assertEqual(first[0]["event"], "queued")
+        self.assertGreater(len([event for event in first if event["event"] == "progress"]), 0)
+        self.assertEqual(first[-1]["event"], "done")
+        self.assertFalse(first[-1]["cached"])
+        self.assertEqual(len(second), 1)
+        self.assertTrue(second[0]["cached"])
+        self.assertEqual(second[0]["objective"], first[-1]["objective"])
+        self.assertEqual([event["event"] for event in bad], ["error"])
@@ -0,0 +1,63 @@
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from cog_array_stuff import Cog_Array, Cog_Registry, Empties_Set
+from cog_factory import cog_factory
+from file_readers import read_cog_datas, read_empties_datas
+from learning_algo import Population
+from shared_fitness_table import Shared_Fitness_Table, MAX_PROBES
+
+
+class Test_Shared_Fitness_Table(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "table.bin")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_put(self):
+        table1 = Shared_Fitness_Table(self.path, 64, "a")
+        table2 = Shared_Fitness_Table(self.path, 128, "a")
+        self.assertEqual(table2.num_slots, 64)
+        for i in range(40):
+            table1.put(bytes([i]), (float(i), np.full(4, i)))
+        self.assertEqual(len(table2), 40)
+        value, rates = table2.get(bytes([7]))
+        self.assertEqual(value, 7.0)
+        self.assertTrue(np.array_equal(rates, np.full(4, 7.0)))
+        self.assertIsNone(Shared_Fitness_Table(self.path, namespace="b").get(bytes([7])))
+        self.assertEqual((table2.hits, table2.misses), (1, 0))
+
+    def test_full_table(self):
+        table = Shared_Fitness_Table(self.path, MAX_PROBES)
+        for i in range(2 * MAX_PROBES):
+            table.put(bytes([i]), (float(i), np.zeros(4)))
+        self.assertEqual(len(table), MAX_PROBES)
+        self.assertEqual(table.get(bytes([2 * MAX_PROBES - 1]))[0], 2 * MAX_PROBES - 1)
+
+    def test_torn_slot(self):
+        table = Shared_Fitness_Table(self.path, 64)
+        table.put(b"key", (1.0, np.zeros(4)))
+        slot = int(np.flatnonzero(table._tags)[0])
+        table._data[slot, 1] = 5.0
+        self.assertIsNone(table.get(b"key"))
+
+    def test_population(self):
+        random.seed(1)
+        cogs = cog_factory(read_cog_datas("cog_datas_static1.csv"))
+        registry = Cog_Registry(cogs)
+        empties_set = Empties_Set(read_empties_datas("empties_datas_static1.csv"))
+        arrays = [Cog_Array(empties_set, None, None, registry).instantiate_randomly(cogs) for _ in range(10)]
+        obj_fxn = lambda cog_array: cog_array.standard_obj_fxn(0.5, 0.3, 0.2)
+        pop1 = Population(arrays, obj_fxn, memo=Shared_Fitness_Table(self.path, 256))
+        table = Shared_Fitness_Table(self.path)
+        pop2 = Population(arrays, obj_fxn, memo=table)
+        self.assertEqual((table.hits, table.misses), (10, 0))
+        self.assertTrue(np.array_equal(pop1.values, pop2.values))
+        self.assertTrue(np.array_equal(pop1.rates, pop2.rates))
@@ -0,0 +1,47 @@
+import unittest
+
+import numpy as np
+
+from cog_array_stuff import Cog_Array, Cog_Registry, Empties_Set
+from cog_factory import cog_factory
+from file_readers import read_cog_datas, read_empties_datas
+from strength_model import Strength_Model
+
+
+class Test_Strength_Model(unittest.TestCase):
+
+    def setUp(self):
+        self.cogs = cog_factory(read_cog_datas("cog_datas_static1.csv"))
+        self.empties_set = Empties_Set(read_empties_datas("empties_datas_static1.csv"))
+        self.registry = Cog_Registry(self.cogs)
+        self.template = Cog_Array(self.empties_set, None, None, self.registry)
+        self.model = Strength_Model(self.registry, self.empties_set).instantiate()
+
+    def test_instantiate(self):
+        self.cogs[0].instantiate_strengths(self.template)
+        self.assertTrue(np.allclose(self.model.get_strengths()[0], self.cogs[0].strengths.reshape(-1)))
+        self.assertAlmostEqual(self.model.strength_start_value, self.cogs[0].strength_start_value)
+
+    def test_apply_updates(self):
+        cog = self.cogs[3]
+        cog.instantiate_strengths(self.template)
+        coords1, coords2 = self.empties_set.coords_list[:2]
+        cell1, cell2 = self.empties_set.get_cell(coords1), self.empties_set.get_cell(coords2)
+        for max_factor,max_multiplier in ((None, None), (2, None), (2, 1.5)):
+            cog.update_strength(coords1, 3.0, max_factor, max_multiplier)
+            self.model.update_strengths([3], [cell1], [3.0]).apply_updates(max_factor, max_multiplier)
+            cog.update_strength(coords2, 0.5, max_factor, max_multiplier)
+            self.model.update_strengths([3], [cell2], [0.5]).apply_updates(max_factor, max_multiplier)
+            self.assertTrue(np.allclose(self.model.get_strengths()[3], cog.strengths.reshape(-1)))
+            self.assertAlmostEqual(self.model.get_strength(3, cell1), cog.get_strength(coords1))
+
+    def test_buffered_updates(self):
+        cell = self.empties_set.cells[0]
+        before = self.model.get_strengths()
+        self.model.update_strengths([0, 0, 1], [cell, cell, cell], [2.0, 3.0, np.inf])
+        self.assertTrue(np.array_equal(self.model.get_strengths(), before))
+        self.model.apply_updates()
+        strengths = self.model.get_strengths()
+        self.assertTrue(np.allclose(strengths.sum(axis=1), 1))
+        self.assertAlmostEqual(strengths[0, cell] / strengths[0, self.empties_set.cells[1]], 6.0)
+        self.assertTrue(np.array_equal(strengths[1], before[1]))
@@ -0,0 +1,65 @@
+import contextlib
+import io
+import random
+import unittest
+
+import numpy as np
+
+from cog_array_stuff import Empties_Set
+from cog_factory import cog_factory
+from file_readers import read_cog_datas, read_empties_datas
+from learning_algo import Iteration_Controller
+from objectives import Callable_Objective, Standard_Objective
+from weight_sweep import Component_Archive, Weight_Sweep_Error, get_sweep_order, weight_sweep
+
+
+class Test_Weight_Sweep(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(1)
+        self.cogs = cog_factory(read_cog_datas("cog_datas_static1.csv"))
+        self.empties_set = Empties_Set(read_empties_datas("empties_datas_static1.csv"))
+        self.controller = (Iteration_Controller()
+            .set_restart_info(1)
+            .set_generation_info(3, 6, 2, 0.001)
+            .set_mutation_info(30)
+            .set_breeding_scheme_info(0.5, 0.25, 0.25)
+        )
+
+    def test_sweep_order(self):
+        coefficients = [[1., 0., 0.], [0., 0., 1.], [0.9, 0.1, 0.], [0., 0.2, 0.8]]
+        self.assertEqual(get_sweep_order(coefficients), [0, 2, 3, 1])
+
+    def test_archive(self):
+        archive = Component_Archive()
+        rates = np.array([2., 3., 1., 4.])
+        archive.get_memo(Standard_Objective(0.2, 0.3, 0.5)).put(b"key", (1.0, rates))
+        value, archived = archive.get_memo(Standard_Objective(1., 1., 1.)).get(b"key")
+        self.assertAlmostEqual(value, 2. + 3. * 2. + 4.)
+        self.assertTrue(np.array_equal(archived, rates))
+        self.assertIsNone(archive.get_elites(np.ones(3), 2))
+        genomes = np.array([[0, 1], [1, 0], [0, 1]], dtype=np.int16)
+        archive.add_elites(genomes, np.array([[1., 0., 0., 0.], [0., 0., 0., 1.], [1., 0., 0., 0.]]))
+        self.assertTrue(np.array_equal(archive.get_elites(np.array([0., 0., 1.]), 5), genomes[[1, 0]]))
+
+    def test_weight_sweep(self):
+        objectives = [
+            Standard_Objective(0.3, 0.3, 0.4),
+            {"build_weight": 0.5, "flaggy_weight": 0.2, "exp_weight": 0.3},
+            Standard_Objective(0.2, 0.6, 0.2)
+        ]
+        with self.assertRaises(Weight_Sweep_Error):
+            weight_sweep(
+                self.cogs, self.empties_set, set(), 30, [Callable_Objective(len)], 2, 4, 16, self.controller
+            )
+        archive = Component_Archive()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = weight_sweep(
+                self.cogs, self.empties_set, set(), 30, objectives, 2, 4, 16, self.controller,
+                num_seeds=10, rng=np.random.default_rng(3), archive=archive
+            )
+        self.assertEqual(len(results), 3)
+        self.assertGreater(archive.hits, 0)
+        for objective,(array,value) in zip(objectives, results):
+            objective = Standard_Objective.from_dict(objective) if isinstance(objective, dict) else objective
+            self.assertAlmostEqual(value, objective.obj_fxn(array))
@@ -0,0 +1,193 @@
+"""
+Cogstruction: Optimizing cog arrays in Legends of Idleon
+    Copyright (C) 2021 Michael P. Lane
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+"""
+
+import copy
+
+import numpy as np
+
+from learning_algo import Fitness_Memo, Population, build_problem, run_generation
+from marginal_objs import get_average_std_of_samples, sample_marginal_components
+from objectives import get_component_matrix, get_objective
+from strength_model import Strength_Model
+
+"""
+- A `Fitness_Memo' of rates vectors rather than of objectives, shared by the populations of every objective of a
+`weight_sweep'. `get_memo' returns a view of it for one `Standard_Objective', with the interface of `Fitness_Memo',
+that scores the archived rates vectors by a dot product with the weights of the objective, so a cog array evaluated for
+one objective is never evaluated again for another.
+- It also keeps the final populations of the sweep, the elites, so that each objective can be seeded with the elites of
+the others that it ranks best, see `get_elites'.
+- There should be one `Component_Archive' per cog array template.
+"""
+class Component_Archive(Fitness_Memo):
+    def __init__(self, max_size = 2**20):
+        super().__init__(max_size)
+        self._elite_genomes = []
+        self._elite_rates = []
+
+    def get_memo(self, objective):
+        return Weighted_Memo(self, objective.coefficients)
+
+    def add_elites(self, genomes, rates):
+        self._elite_genomes.append(np.array(genomes))
+        self._elite_rates.append(np.array(rates))
+        return self
+
+    """
+    Returns the genomes of the `k' distinct elites with the highest objective for the weights `coefficients', best
+    first, or `None' if there are none.
+    """
+    def get_elites(self, coefficients, k):
+        if len(self._elite_genomes) == 0 or k <= 0:
+            return None
+        genomes, first = np.unique(np.concatenate(self._elite_genomes), axis=0, return_index=True)
+        values = get_component_matrix(np.concatenate(self._elite_rates)[first]) @ coefficients
+        return genomes[np.argsort(-values, kind="stable")[:k]]
+
+"""
+The view of a `Component_Archive' for the weights `coefficients', see `Component_Archive.get_memo'.
+"""
+class Weighted_Memo:
+    def __init__(self, archive, coefficients):
+        self.archive = archive
+        self.coefficients = coefficients
+
+    def get(self, key):
+        rates = self.archive.get(key)
+        if rates is None:
+            return None
+        return float(get_component_matrix(rates)[0] @ self.coefficients), rates
+
+    def put(self, key, entry):
+        self.archive.put(key, entry[1])
+        return self
+
+    def __contains__(self, key):
+        return key in self.archive
+
+    def __len__(self):
+        return len(self.archive)
+
+class Weight_Sweep_Error(RuntimeError):
+    pass
+
+"""
+- Run `learning_algo' for each objective of `objectives', which are `Standard_Objective's or specs of them (see
+`get_objective'), at a fraction of the cost of separate runs. Returns a list of the best cog array and its objective
+for each objective, in the order of `objectives'. The other arguments are as in `learning_algo'.
+- The objectives are visited in a chain of nearest neighbours, by the angle between their weights, starting from the
+first one. Every cog array scored is archived with its build rate, flaggy rate and exp multiplier in a
+`Component_Archive', so it is scored for any later objective by a dot product instead of by evaluating it.
+- The statistics of `get_average_std_objs' are sampled once, as components, and re-weighted for each objective, see
+`sample_marginal_components'.
+- Each restart starts from the `num_seeds' (default: a quarter of `pop_size') archived elites that its objective ranks
+best, which come from the objectives visited before it, and random cog arrays for the rest. `sweep_controller' is the
+`Iteration_Controller' of every objective but the first (default: `controller'); a copy is used for each objective.
+Since seeded populations start close to their optimum, it can ask for fewer generations.
+- `archive' is an optional `Component_Archive' to use instead of a new one, for example to continue a sweep.
+"""
+def weight_sweep(
+        cogs,
+        empties_set,
+        flaggies,
+        pop_size,
+        objectives,
+        factor_base,
+        max_factor,
+        max_multiplier,
+        controller,
+        sweep_controller=None,
+        num_seeds=None,
+        rng=None,
+        cache=None,
+        archive=None,
+        reject_duplicates=False
+):
+    objectives = [get_objective(objective) for objective in objectives]
+    if any(objective.coefficients is None for objective in objectives):
+        raise Weight_Sweep_Error("Every objective of a weight sweep must have weights, see `Standard_Objective'.")
+    sweep_controller = controller if sweep_controller is None else sweep_controller
+    num_seeds = pop_size // 4 if num_seeds is None else num_seeds
+    archive = Component_Archive() if archive is None else archive
+
+    registry, cog_array_template, evaluator, engine = build_problem(
+        cogs, empties_set, flaggies, objectives[0].batch_obj_fxn, rng, cache
+    )
+    samples = sample_marginal_components(engine, np.arange(len(registry)), 1, evaluator)
+    strength_model = Strength_Model(registry, empties_set)
+
+    results = [None] * len(objectives)
+    for step,index in enumerate(get_sweep_order([objective.coefficients for objective in objectives])):
+        objective = objectives[index]
+        average_objs, std_objs = get_average_std_of_samples(samples @ objective.coefficients)
+        for cog,average_obj,std_obj in zip(registry, average_objs, std_objs):
+            cog.average_obj, cog.std_obj = average_obj, std_obj
+        point_controller = copy.deepcopy(controller if step == 0 else sweep_controller)
+        point_controller.print_init_info()
+        memo = archive.get_memo(objective)
+
+        bests = []
+        while point_controller.restart_loop():
+            strength_model.instantiate()
+            seeds = archive.get_elites(objective.coefficients, min(num_seeds, pop_size))
+            genomes = engine.random_genomes(pop_size - (len(seeds) if seeds is not None else 0))
+            pop = Population.from_genomes(
+                cog_array_template,
+                np.concatenate((seeds, genomes)) if seeds is not None else genomes,
+                objective.obj_fxn,
+                objective.batch_obj_fxn,
+                evaluator,
+                memo,
+                reject_duplicates
+            )
+            point_controller.set_pop(pop)
+            point_controller.print_restart_status_open()
+
+            while point_controller.generation_loop():
+                point_controller.print_generation_status()
+                run_generation(
+                    engine,
+                    pop,
+                    point_controller,
+                    strength_model,
+                    factor_base,
+                    max_factor,
+                    max_multiplier,
+                    average_objs,
+                    std_objs
+                )
+            strength_model.write_to_cogs()
+            point_controller.print_restart_status_close()
+
+            archive.add_elites(pop.genomes, pop.rates)
+            bests.append(pop.get_best())
+        results[index] = max(bests, key=lambda t:t[1])
+    return results
+
+"""
+Returns the order in which `weight_sweep' visits the weight vectors `coefficients': from the first, always to the
+nearest one by angle that is not visited yet.
+"""
+def get_sweep_order(coefficients):
+    directions = np.array(coefficients, dtype=np.float64)
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    order = [0]
+    remaining = np.ones(len(directions), dtype=bool)
+    remaining[0] = False
+    while np.any(remaining):
+        similarities = np.where(remaining, directions @ directions[order[-1]], -np.inf)
+        order.append(int(np.argmax(similarities)))
+        remaining[order[-1]] = False
+    return order